@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from pose_resampling import resample_poses, uniform_timeline
+from pose_transforms import pose_arrays, reanchor_poses
+from stage_cache import CACHE_DIR, DEFAULT_MAX_BYTES, StageCache
+from timestamp_association import NS_PER_UNIT, to_ns
+from trajectory_metrics import absolute_trajectory_error, error_statistics, relative_pose_error
+
+# Evaluates every gt/pr take under a data directory in a process pool and writes one
+# summary table. Each take goes through the same steps as max_file.py: overlap window,
+# common timeline resampling, first-pose anchoring, then ATE/RPE. With a StageCache
+# (stage_cache.py) every step's arrays are kept on disk, so re-runs only redo the steps
+# whose input files or parameters changed.
+GT_FILE = 'gt_odometry.csv'
+PR_FILE = 'pr_odometry.csv'
+
+
+def discover_takes(root):
+    """Every directory under root holding a gt_odometry.csv/pr_odometry.csv pair."""
+    root = Path(root)
+    return sorted(gt.parent for gt in root.rglob(GT_FILE) if (gt.parent / PR_FILE).exists())
+
+
+def load_take(gt_path, pr_path):
+    """Stage 1: parse the gt/pr CSVs into time-sorted stamps, positions and quaternions."""
+    arrays = {}
+    for prefix, path in (('gt', gt_path), ('pr', pr_path)):
+        odometry = pd.read_csv(path).sort_values('sec')
+        arrays[prefix + '_stamps_ns'] = to_ns(odometry['sec'].to_numpy())
+        arrays[prefix + '_positions'], arrays[prefix + '_quaternions'] = pose_arrays(odometry)
+    return arrays
+
+
+def align_take(loaded, rate_hz=10.0):
+    """Stage 2: both streams resampled onto a common timeline over their overlap."""
+    start_ns = max(loaded['gt_stamps_ns'][0], loaded['pr_stamps_ns'][0])
+    end_ns = min(loaded['gt_stamps_ns'][-1], loaded['pr_stamps_ns'][-1])
+    if end_ns <= start_ns:
+        raise ValueError('gt and pr recordings do not overlap in time')
+    timeline_ns = uniform_timeline(start_ns, end_ns, rate_hz=rate_hz)
+    arrays = {'timeline_ns': timeline_ns}
+    for prefix in ('gt', 'pr'):
+        positions, quaternions, _ = resample_poses(loaded[prefix + '_stamps_ns'], loaded[prefix + '_positions'],
+                                                   loaded[prefix + '_quaternions'], timeline_ns)
+        arrays[prefix + '_positions'], arrays[prefix + '_quaternions'] = positions, quaternions
+    return arrays
+
+
+def anchor_take(aligned):
+    """Stage 3: both streams expressed relative to their first pose."""
+    arrays = {'timeline_ns': aligned['timeline_ns']}
+    for prefix in ('gt', 'pr'):
+        arrays[prefix + '_positions'], arrays[prefix + '_quaternions'] = reanchor_poses(
+            aligned[prefix + '_positions'], aligned[prefix + '_quaternions'])
+    return arrays
+
+
+def take_errors(anchored, rpe_deltas=(1, 10)):
+    """Stage 4: per-pose ATE (anchored, SE3, Sim3) and RPE errors, plus the timeline duration."""
+    gt_positions, pr_positions = anchored['gt_positions'], anchored['pr_positions']
+    timeline_ns = anchored['timeline_ns']
+    arrays = {'duration_s': float(timeline_ns[-1] - timeline_ns[0]) / NS_PER_UNIT['s']}
+    arrays['anchored'], _ = absolute_trajectory_error(gt_positions, pr_positions, alignment=None)
+    arrays['ate_se3'], _ = absolute_trajectory_error(gt_positions, pr_positions, alignment='se3')
+    arrays['ate_sim3'], (_, _, arrays['sim3_scale']) = absolute_trajectory_error(gt_positions, pr_positions,
+                                                                                 alignment='sim3')
+    rpe = relative_pose_error(gt_positions, anchored['gt_quaternions'], pr_positions, anchored['pr_quaternions'],
+                              deltas=rpe_deltas)
+    for delta, errors in rpe.items():
+        arrays['rpe_%s_translation' % delta] = errors['translation']
+        arrays['rpe_%s_rotation' % delta] = errors['rotation']
+    return arrays
+
+
+def take_stages(take_dir, cache, rate_hz=10.0):
+    """The load -> align -> anchor stages of a take declared on a StageCache (nothing runs yet)."""
+    take_dir = Path(take_dir)
+    loaded = cache.stage('load', load_take, inputs=[take_dir / GT_FILE, take_dir / PR_FILE])
+    aligned = cache.stage('align', align_take, inputs=[loaded], params={'rate_hz': rate_hz})
+    anchored = cache.stage('anchor', anchor_take, inputs=[aligned])
+    return loaded, aligned, anchored
+
+
+def prepare_take(take_dir, rate_hz=10.0, cache=None):
+    """Load a take and return its gt/pr poses on a common timeline, anchored to the first pose.
+
+    Returns (arrays, timings) where arrays holds 'timeline_ns' plus gt_/pr_ positions and
+    quaternions. With a StageCache, stages whose inputs and parameters are unchanged are
+    read back from disk instead (their timing is then the read time, or 0 when skipped).
+    """
+    take_dir = Path(take_dir)
+    if cache is not None:
+        loaded, aligned, anchored = take_stages(take_dir, cache, rate_hz)
+        arrays = dict(anchored.arrays)
+        timings = {'t_load': loaded.seconds, 't_resample': aligned.seconds, 't_anchor': anchored.seconds}
+        return arrays, timings
+
+    timings = {}
+    started = time.perf_counter()
+    loaded = load_take(take_dir / GT_FILE, take_dir / PR_FILE)
+    timings['t_load'] = time.perf_counter() - started
+
+    stage = time.perf_counter()
+    aligned = align_take(loaded, rate_hz=rate_hz)
+    timings['t_resample'] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    arrays = anchor_take(aligned)
+    timings['t_anchor'] = time.perf_counter() - stage
+    return arrays, timings
+
+
+def evaluate_take(take_dir, rate_hz=10.0, rpe_deltas=(1, 10), cache=None):
+    """Metrics and stage timings for one take directory, as a flat dict."""
+    started = time.perf_counter()
+    if cache is not None:
+        loaded, aligned, anchored = take_stages(take_dir, cache, rate_hz)
+        errors_stage = cache.stage('errors', take_errors, inputs=[anchored], params={'rpe_deltas': list(rpe_deltas)})
+        errors = errors_stage.arrays
+        timings = {'t_load': loaded.seconds, 't_resample': aligned.seconds, 't_anchor': anchored.seconds,
+                   't_metrics': errors_stage.seconds}
+    else:
+        arrays, timings = prepare_take(take_dir, rate_hz=rate_hz)
+        stage = time.perf_counter()
+        errors = take_errors(arrays, rpe_deltas)
+        timings['t_metrics'] = time.perf_counter() - stage
+
+    result = {
+        'take': str(take_dir),
+        'n_poses': len(errors['anchored']),
+        'duration_s': float(errors['duration_s']),
+        'mean_error_anchored': error_statistics(errors['anchored'])['mean'],
+        'ate_se3_rmse': error_statistics(errors['ate_se3'])['rmse'],
+        'ate_se3_max': error_statistics(errors['ate_se3'])['max'],
+        'ate_sim3_rmse': error_statistics(errors['ate_sim3'])['rmse'],
+        'sim3_scale': float(errors['sim3_scale']),
+    }
+    for delta in rpe_deltas:
+        result['rpe_%s_trans_rmse' % delta] = error_statistics(errors['rpe_%s_translation' % delta])['rmse']
+        result['rpe_%s_rot_rmse_deg' % delta] = error_statistics(errors['rpe_%s_rotation' % delta])['rmse']
+    result.update(timings)
+    result['t_total'] = time.perf_counter() - started
+    return result
+
+
+def _evaluate_safely(take_dir, rate_hz, rpe_deltas, cache=None):
+    """Run evaluate_take, turning failures into an 'error' row so one bad take doesn't stop the batch."""
+    try:
+        return evaluate_take(take_dir, rate_hz=rate_hz, rpe_deltas=rpe_deltas, cache=cache)
+    except Exception as exc:
+        return {'take': str(take_dir), 'error': '%s: %s' % (type(exc).__name__, exc),
+                'traceback': traceback.format_exc()}
+
+
+def evaluate_takes(take_dirs, workers=None, rate_hz=10.0, rpe_deltas=(1, 10), cache=None):
+    """Evaluate takes in a process pool; rows come back in the order of take_dirs."""
+    take_dirs = [Path(d) for d in take_dirs]
+    if workers == 1 or len(take_dirs) <= 1:
+        return [_evaluate_safely(d, rate_hz, rpe_deltas, cache) for d in take_dirs]
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_evaluate_safely, d, rate_hz, rpe_deltas, cache): i for i, d in enumerate(take_dirs)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return [results[i] for i in range(len(take_dirs))]
+
+
+def write_summary(rows, output):
+    """Write rows to CSV or JSON depending on the file extension."""
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if output.suffix == '.json':
+        with open(output, 'w') as file:
+            json.dump(rows, file, indent=2)
+    else:
+        pd.DataFrame([{k: v for k, v in row.items() if k != 'traceback'} for row in rows]).to_csv(output, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate every gt/pr take under a directory.')
+    parser.add_argument('root', nargs='?', default='isaacVslam', help='directory searched for takes')
+    parser.add_argument('--output', default='evaluation_summary.csv', help='summary file (.csv or .json)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--rate', type=float, default=10.0, help='common resampling rate in Hz')
+    parser.add_argument('--rpe-deltas', type=int, nargs='+', default=[1, 10], help='RPE frame deltas')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='where stage outputs are kept between runs')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / 2 ** 20,
+                        help='stage cache size limit in MiB (least recently used outputs go first)')
+    parser.add_argument('--no-cache', action='store_true', help='recompute every stage')
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else StageCache(args.cache_dir, int(args.cache_size * 2 ** 20))
+    take_dirs = discover_takes(args.root)
+    print(f"Found {len(take_dirs)} takes under {args.root}")
+    started = time.perf_counter()
+    rows = evaluate_takes(take_dirs, workers=args.workers, rate_hz=args.rate, rpe_deltas=tuple(args.rpe_deltas),
+                          cache=cache)
+    write_summary(rows, args.output)
+
+    for row in rows:
+        if 'error' in row:
+            print(f"{row['take']}: FAILED ({row['error']})")
+        else:
+            print(f"{row['take']}: ATE {row['ate_se3_rmse']:.3f} m over {row['n_poses']} poses "
+                  f"in {row['t_total']:.2f} s")
+    print(f"Wrote {args.output} in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+from functools import lru_cache
+
+import numpy as np
+
+from pose_transforms import quat_multiply, quat_conjugate, matrix_to_quat
+
+# Axis-convention registry. Every frame is named by what its x, y and z axes point at:
+#   F/B forward/back, L/R left/right, U/D up/down, and N/E as aliases for F/R
+#   (Motive's Y-up global frame is used as NUE / FUR in the wall and OptiTrack scripts).
+# Conversions between any two frames and length units are folded into one 4x4 matrix
+# that is built once per (source, target) pair and applied to whole arrays.
+AXIS_DIRECTIONS = {
+    'F': (1, 0, 0), 'B': (-1, 0, 0),
+    'L': (0, 1, 0), 'R': (0, -1, 0),
+    'U': (0, 0, 1), 'D': (0, 0, -1),
+    'N': (1, 0, 0), 'S': (-1, 0, 0),
+    'E': (0, -1, 0), 'W': (0, 1, 0),
+}
+
+FRAMES = {
+    'FLU': 'FLU',            # ROS body frame (REP 103)
+    'FRD': 'FRD',            # PX4 body frame
+    'FUR': 'FUR',            # OptiTrack drone export as used in max_file_3.py
+    'RUB': 'RUB',            # Open3D / OpenGL view frame used for the walls
+    'NUE': 'NUE',            # Motive global frame as used in shimonWallCode.py
+    'NED': 'NED',
+    'ENU': 'ENU',
+    'camera_link': 'FLU',    # ROS camera body frame
+    'camera_optical': 'RDF',  # ROS optical frame (z out of the lens)
+}
+
+UNITS = {'m': 1.0, 'cm': 0.01, 'mm': 0.001, 'meters': 1.0, 'centimeters': 0.01, 'millimeters': 0.001}
+
+
+def register_frame(name, axes):
+    """Add a named frame given its axis letters, e.g. register_frame('optitrack', 'FUR')."""
+    frame_basis(axes)  # validates the letters and handedness
+    FRAMES[name] = axes
+    frame_transform.cache_clear()
+
+
+def unit_scale(source_units, target_units='m'):
+    """Factor converting lengths from source_units to target_units (accepts Motive names)."""
+    return UNITS[source_units.lower()] / UNITS[target_units.lower()]
+
+
+def frame_basis(axes):
+    """3x3 matrix mapping FLU coordinates into a frame given by axis letters."""
+    axes = FRAMES.get(axes, axes)
+    if len(axes) != 3 or any(a not in AXIS_DIRECTIONS for a in axes):
+        raise ValueError('Unknown frame %r' % (axes,))
+    basis = np.array([AXIS_DIRECTIONS[a] for a in axes], dtype=np.float64)
+    if not np.isclose(np.linalg.det(basis), 1.0):
+        raise ValueError('Frame %r is not a right-handed set of axes' % (axes,))
+    return basis
+
+
+@lru_cache(maxsize=None)
+def frame_transform(source, target, source_units='m', target_units='m'):
+    """Cached 4x4 matrix taking homogeneous points from source frame/units to target frame/units."""
+    rotation = frame_basis(target) @ frame_basis(source).T
+    T = np.eye(4)
+    T[:3, :3] = unit_scale(source_units, target_units) * rotation
+    T.setflags(write=False)
+    return T
+
+
+def chain_transform(*steps):
+    """Single 4x4 matrix for a chain of (frame, units) steps, e.g. ('NUE', 'm'), ('RUB', 'mm')."""
+    T = np.eye(4)
+    for (source, source_units), (target, target_units) in zip(steps[:-1], steps[1:]):
+        T = frame_transform(source, target, source_units, target_units) @ T
+    return T
+
+
+def convert_points(points, source, target, source_units='m', target_units='m', origin=None):
+    """Convert Nx3 points (or one 3-vector) between frames/units in one pass.
+
+    `origin`, given in the source frame, is subtracted first, so trajectories can be made
+    relative to their first sample in the same matrix product.
+    """
+    T = frame_transform(source, target, source_units, target_units)
+    points = np.asarray(points, dtype=np.float64)
+    linear = T[:3, :3]
+    offset = T[:3, 3]
+    if origin is not None:
+        offset = offset - linear @ np.asarray(origin, dtype=np.float64)
+    return points @ linear.T + offset
+
+
+def convert_homogeneous(points, T):
+    """Apply a 4x4 transform to Nx4 homogeneous points."""
+    return np.asarray(points, dtype=np.float64) @ np.asarray(T).T
+
+
+@lru_cache(maxsize=None)
+def _frame_quaternion(source, target):
+    q = matrix_to_quat(frame_basis(target) @ frame_basis(source).T)
+    q.setflags(write=False)
+    return q
+
+
+def convert_quaternions(quaternions, source, target):
+    """Re-express Nx4 (x, y, z, w) orientations from the source frame in the target frame."""
+    q = _frame_quaternion(source, target)
+    return quat_multiply(quat_multiply(q, quaternions), quat_conjugate(q))
+
+
+def convert_poses(positions, quaternions, source, target, source_units='m', target_units='m', origin=None):
+    """Convert positions and orientations together; see convert_points for `origin`."""
+    return (convert_points(positions, source, target, source_units, target_units, origin),
+            convert_quaternions(quaternions, source, target))
@@ -0,0 +1,234 @@
+import argparse
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from coordinate_frames import convert_points, unit_scale
+from pose_resampling import resample_poses
+from pose_transforms import pose_arrays, quat_rotate
+from timestamp_association import NS_PER_UNIT, associate, read_csv_stamps_ns
+
+# 3D positions of 2D person detections (training-network/batch_inference.py output) from
+# the depth frame recorded with each colour frame (13_06_30_375467.png ->
+# 13_06_30_375467_d.png, next to it or, in a split dataset, under depth/<split>). Per
+# box, depth is sampled on a fixed grid over its central part, invalid pixels are masked
+# and a percentile of the rest is taken, all boxes of a batch at once; the box centre is
+# back-projected with the pinhole intrinsics into the camera optical frame (RDF), moved
+# into the drone body frame and then into the world frame with the drone pose
+# interpolated at the frame time.
+DEPTH_SUFFIX = '_d'
+FRAME_TIME = re.compile(r'(\d{2})_(\d{2})_(\d{2})_(\d{6})')
+
+
+def frame_stamps_ns(names, date, utc_offset_hours=0.0):
+    """int64 epoch ns of frames named HH_MM_SS_micro..., captured on `date` (YYYY-MM-DD) in local time.
+
+    Names that don't carry a time of day give -1.
+    """
+    midnight = np.datetime64(date, 'ns').astype(np.int64) - int(round(utc_offset_hours * 3600 * NS_PER_UNIT['s']))
+    stamps = np.full(len(names), -1, dtype=np.int64)
+    for index, name in enumerate(names):
+        match = FRAME_TIME.search(Path(str(name)).name)
+        if match:
+            hours, minutes, seconds, micro = (int(group) for group in match.groups())
+            stamps[index] = midnight + ((hours * 60 + minutes) * 60 + seconds) * NS_PER_UNIT['s'] + micro * 1000
+    return stamps
+
+
+def depth_path(image_path):
+    """Depth frame recorded with a colour frame.
+
+    Frames of a split dataset (images/<split>) have theirs under depth/<split>, where
+    training-network/data_preparation.py links them; elsewhere it sits next to the frame.
+    """
+    image_path = Path(image_path)
+    name = image_path.stem + DEPTH_SUFFIX + image_path.suffix
+    parts = list(image_path.parent.parts)
+    for index in range(len(parts) - 1, -1, -1):
+        if parts[index] == 'images':
+            parts[index] = 'depth'
+            linked = Path(*parts) / name
+            if linked.is_file():
+                return linked
+            break
+    return image_path.with_name(name)
+
+
+def load_depth_frames(paths, workers=8):
+    """(F, H, W) uint16 stack of depth images (decoded on a thread pool); missing files are all zero."""
+    import cv2
+
+    def read(path):
+        return cv2.imread(str(path), cv2.IMREAD_ANYDEPTH) if Path(path).is_file() else None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        frames = list(pool.map(read, paths))
+    shape = next((frame.shape for frame in frames if frame is not None), (0, 0))
+    stack = np.zeros((len(frames),) + shape, dtype=np.uint16)
+    for index, frame in enumerate(frames):
+        if frame is not None and frame.shape == shape:
+            stack[index] = frame
+    return stack
+
+
+def masked_percentile(values, valid, q):
+    """Row-wise q-th percentile (linear interpolation) of values[valid]; NaN for rows with nothing valid."""
+    values = np.where(valid, values, np.inf)
+    values.sort(axis=1)
+    count = valid.sum(axis=1)
+    position = (q / 100.0) * np.maximum(count - 1, 0)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(count - 1, 0))
+    low = np.take_along_axis(values, lower[:, None], axis=1)[:, 0]
+    high = np.take_along_axis(values, upper[:, None], axis=1)[:, 0]
+    with np.errstate(invalid='ignore'):  # rows with nothing valid hold inf - inf
+        result = low + (position - lower) * (high - low)
+    return np.where(count > 0, result, np.nan)
+
+
+def box_depths(depth, frame_index, boxes, grid=16, shrink=0.5, percentile=50.0, depth_scale=0.001,
+               min_depth=0.1, max_depth=10.0):
+    """Robust depth in metres inside every box; NaN where no pixel in range was found.
+
+    `depth` is an (F, H, W) raw depth stack, `frame_index` the row of each box in it and
+    `boxes` (N, 4) xyxy pixel boxes of the colour frame (rescaled if the depth frames have
+    another size). A grid x grid lattice over the central `shrink` fraction of each box is
+    sampled, which keeps most of the background at the box edges out.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    n_frames, height, width = depth.shape
+    centre = (boxes[:, :2] + boxes[:, 2:]) / 2
+    half = (boxes[:, 2:] - boxes[:, :2]) * (shrink / 2)
+    steps = (np.arange(grid) + 0.5) / grid * 2 - 1  # cell centres in [-1, 1]
+    u = centre[:, None, None, 0] + steps[None, None, :] * half[:, None, None, 0]
+    v = centre[:, None, None, 1] + steps[None, :, None] * half[:, None, None, 1]
+    u, v = np.broadcast_arrays(u, v)
+    columns = np.clip(np.floor(u).astype(np.int64), 0, width - 1).reshape(len(boxes), -1)
+    rows = np.clip(np.floor(v).astype(np.int64), 0, height - 1).reshape(len(boxes), -1)
+    samples = depth[np.asarray(frame_index)[:, None], rows, columns].astype(np.float64) * depth_scale
+    valid = (samples >= min_depth) & (samples <= max_depth)
+    return masked_percentile(samples, valid, percentile)
+
+
+def back_project(u, v, z, intrinsics):
+    """(N, 3) points in the camera optical frame (x right, y down, z forward) from pixels and depth."""
+    fx, fy, cx, cy = intrinsics
+    z = np.asarray(z, dtype=np.float64)
+    return np.column_stack(((np.asarray(u) - cx) / fx * z, (np.asarray(v) - cy) / fy * z, z))
+
+
+def camera_to_world(points, positions, quaternions, body_frame='FLU', mount_rotation=None,
+                    mount_translation=None):
+    """Optical-frame points to the world frame of the poses, one pose per point.
+
+    The optical axes are first renamed into `body_frame` (the axis convention of the pose's
+    body), then the camera mount (rotation quaternion and translation in the body frame,
+    identity by default) and finally the body pose are applied.
+    """
+    body = convert_points(points, 'camera_optical', body_frame)
+    if mount_rotation is not None:
+        body = quat_rotate(np.asarray(mount_rotation, dtype=np.float64), body)
+    if mount_translation is not None:
+        body = body + np.asarray(mount_translation, dtype=np.float64)
+    return quat_rotate(quaternions, body) + positions
+
+
+def lift_detections(detections, pose_stamps_ns, positions, quaternions, intrinsics, date, utc_offset_hours=0.0,
+                    tolerance_s=0.1, body_frame='FLU', mount_rotation=None, mount_translation=None,
+                    chunk_frames=256, workers=8, **depth_options):
+    """World positions of every detection of a batch_inference .npz (as loaded with np.load).
+
+    Frames are processed in chunks of `chunk_frames`: their depth images are loaded together
+    and all boxes of the chunk go through box_depths / back_project / camera_to_world as arrays.
+    Returns a dict of per-detection columns: 'frame_id', 'stamp_ns', 'depth', 'camera'
+    (optical-frame point), 'world' and 'valid' (depth found and a pose within tolerance).
+    """
+    sources = [str(path) for path in detections['sources']]
+    frame_source = np.asarray(detections['source'])
+    frame_ids = np.asarray(detections['frame_id'])
+    boxes = np.asarray(detections['box'], dtype=np.float64)
+    n_frames = len(frame_source)
+
+    stamps = frame_stamps_ns([sources[index] for index in frame_source], date, utc_offset_hours)
+    nearest = associate(stamps, pose_stamps_ns, int(tolerance_s * NS_PER_UNIT['s']))
+    frame_positions, frame_quaternions, inside = resample_poses(pose_stamps_ns, positions, quaternions, stamps)
+    has_pose = inside & (nearest >= 0) & (stamps >= 0)
+
+    depth = np.full(len(boxes), np.nan)
+    order = np.argsort(frame_ids, kind='stable')
+    bounds = np.searchsorted(frame_ids[order], np.arange(0, n_frames + chunk_frames, chunk_frames))
+    for chunk, first_frame in enumerate(range(0, n_frames, chunk_frames)):
+        rows = order[bounds[chunk]:bounds[chunk + 1]]
+        if not len(rows):
+            continue
+        chunk_ids = np.arange(first_frame, min(first_frame + chunk_frames, n_frames))
+        stack = load_depth_frames([depth_path(sources[frame_source[i]]) for i in chunk_ids], workers)
+        if not stack.size:
+            continue
+        scale = np.array([stack.shape[2] / detections['width'][frame_ids[rows]],
+                          stack.shape[1] / detections['height'][frame_ids[rows]]]).T
+        depth[rows] = box_depths(stack, frame_ids[rows] - first_frame, boxes[rows] * np.tile(scale, 2),
+                                 **depth_options)
+
+    centre = (boxes[:, :2] + boxes[:, 2:]) / 2
+    camera = back_project(centre[:, 0], centre[:, 1], depth, intrinsics)
+    world = camera_to_world(camera, frame_positions[frame_ids], frame_quaternions[frame_ids], body_frame,
+                            mount_rotation, mount_translation)
+    return {
+        'frame_id': frame_ids,
+        'stamp_ns': stamps[frame_ids],
+        'depth': depth,
+        'camera': camera,
+        'world': world,
+        'valid': np.isfinite(depth) & has_pose[frame_ids],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lift 2D person detections to 3D world positions with the depth frames.')
+    parser.add_argument('detections', help='.npz written by training-network/batch_inference.py')
+    parser.add_argument('poses', help='drone odometry CSV (sec, pos_x, pos_y, pos_z, x, y, z, w)')
+    parser.add_argument('--intrinsics', type=float, nargs=4, required=True, metavar=('FX', 'FY', 'CX', 'CY'),
+                        help='pinhole intrinsics of the colour camera in pixels (depth aligned to it)')
+    parser.add_argument('--date', required=True, help='capture date YYYY-MM-DD (frame names only carry the time)')
+    parser.add_argument('--utc-offset', type=float, default=0.0, help='hours between the frame clock and UTC')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='max gap to the nearest pose sample in seconds')
+    parser.add_argument('--pose-units', default='m', help='length units of the pose positions')
+    parser.add_argument('--body-frame', default='FLU', help='axis convention of the drone body in the poses')
+    parser.add_argument('--percentile', type=float, default=50.0, help='depth percentile inside each box')
+    parser.add_argument('--depth-scale', type=float, default=0.001, help='metres per raw depth unit')
+    parser.add_argument('--output', default='detections_3d.csv', help='CSV with one row per detection')
+    args = parser.parse_args()
+
+    stamps = read_csv_stamps_ns(args.poses)
+    order = np.argsort(stamps, kind='stable')
+    positions, quaternions = pose_arrays(pd.read_csv(args.poses).iloc[order])
+    stamps = stamps[order]
+    positions = positions * unit_scale(args.pose_units, 'm')
+    with np.load(args.detections) as data:
+        detections = {key: data[key] for key in data.files}
+
+    lifted = lift_detections(detections, stamps, positions, quaternions, args.intrinsics, args.date,
+                             args.utc_offset, args.tolerance, args.body_frame, percentile=args.percentile,
+                             depth_scale=args.depth_scale)
+    frame_ids = lifted['frame_id']
+    table = pd.DataFrame({
+        'sec': lifted['stamp_ns'] / NS_PER_UNIT['s'],
+        'source': detections['sources'][detections['source'][frame_ids]],
+        'frame': detections['frame'][frame_ids],
+        'score': detections['score'],
+        'depth': lifted['depth'],
+        'x': lifted['world'][:, 0],
+        'y': lifted['world'][:, 1],
+        'z': lifted['world'][:, 2],
+        'valid': lifted['valid'],
+    })
+    table.to_csv(args.output, index=False)
+    print(f"{int(lifted['valid'].sum())} of {len(table)} detections placed in the world frame -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
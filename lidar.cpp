@@ -1,5 +1,7 @@
 #include <iostream>
 #include <vector>
+#include <tuple>
+#include <cstdint>
 #include <cmath>
 #include <algorithm>
 #include <limits>
@@ -10,16 +12,19 @@
 #define CUDA_AVAILABLE false
 #endif
 
-// Function to process LIDAR data
-std::vector<float> lidar_process2(const std::vector<std::tuple<float, float, float>>& lidar_data, float vertical_limit, int segments = 72, float maximum = 6.0, bool norm = true) {
+// Shared loop of lidar_process2: get_point(k, x, y, z) loads point k, so the same code
+// runs over a tuple vector or straight over a float buffer without copying it.
+// Writes `segments` values to `segmented`.
+template <typename GetPoint>
+void lidar_process_points(int64_t n_points, GetPoint get_point, float vertical_limit, int segments, float maximum,
+                          bool norm, float* segmented) {
     int i = 0;
-    std::vector<float> segmented(segments, maximum);
-    
-    for (const auto& point : lidar_data) {
-        float x = std::get<0>(point);
-        float y = std::get<1>(point);
-        float z = std::get<2>(point);
-        
+    std::fill(segmented, segmented + segments, maximum);
+
+    for (int64_t k = 0; k < n_points; ++k) {
+        float x, y, z;
+        get_point(k, x, y, z);
+
         if (z > vertical_limit || z < -vertical_limit) {
             continue;
         }
@@ -27,7 +32,7 @@ std::vector<float> lidar_process2(const std::vector<std::tuple<float, float, flo
         if (i % 4 != 0) {
             continue;
         }
-        
+
         float dis = std::sqrt(x * x + y * y);
         float ang = std::atan2(y, x) * 180.0 / M_PI;
         int bucket = static_cast<int>(std::floor(ang / (360.0 / segments)));
@@ -35,18 +40,91 @@ std::vector<float> lidar_process2(const std::vector<std::tuple<float, float, flo
             bucket += segments / 2;
         }
         bucket = bucket % segments;
+        // x >= 0, y < 0 gives a negative bucket; wrap it instead of indexing before the buffer
+        if (bucket < 0) {
+            bucket += segments;
+        }
         segmented[bucket] = std::min(segmented[bucket], dis);
     }
-    
+
     if (norm) {
-        for (auto& val : segmented) {
-            val = std::clamp(val / maximum, 0.0f, 1.0f);
+        for (int s = 0; s < segments; ++s) {
+            segmented[s] = std::clamp(segmented[s] / maximum, 0.0f, 1.0f);
         }
     }
-    
+}
+
+// Function to process LIDAR data
+std::vector<float> lidar_process2(const std::vector<std::tuple<float, float, float>>& lidar_data, float vertical_limit, int segments = 72, float maximum = 6.0, bool norm = true) {
+    std::vector<float> segmented(segments, maximum);
+    auto get_point = [&lidar_data](int64_t k, float& x, float& y, float& z) {
+        x = std::get<0>(lidar_data[k]);
+        y = std::get<1>(lidar_data[k]);
+        z = std::get<2>(lidar_data[k]);
+    };
+    lidar_process_points(static_cast<int64_t>(lidar_data.size()), get_point, vertical_limit, segments, maximum, norm,
+                         segmented.data());
     return segmented;
 }
 
+// C entry points for lidar_binding.py. Points are contiguous float32 x, y, z triplets and
+// results are written to a caller-provided float32 buffer of n_scans * segments values.
+// Return 0 on success, -1 for invalid arguments.
+extern "C" {
+
+int lidar_cuda_available() {
+    return CUDA_AVAILABLE ? 1 : 0;
+}
+
+int lidar_process_scan(const float* points, int64_t n_points, float vertical_limit, int segments, float maximum,
+                       int norm, float* out) {
+    if (segments <= 0 || n_points < 0) {
+        return -1;
+    }
+    auto get_point = [points](int64_t k, float& x, float& y, float& z) {
+        x = points[3 * k];
+        y = points[3 * k + 1];
+        z = points[3 * k + 2];
+    };
+    lidar_process_points(n_points, get_point, vertical_limit, segments, maximum, norm != 0, out);
+    return 0;
+}
+
+// n_scans scans of points_per_scan points each, i.e. a (n_scans, points_per_scan, 3) array
+int lidar_process_batch(const float* points, int64_t n_scans, int64_t points_per_scan, float vertical_limit,
+                        int segments, float maximum, int norm, float* out) {
+    if (segments <= 0 || n_scans < 0 || points_per_scan < 0) {
+        return -1;
+    }
+    for (int64_t s = 0; s < n_scans; ++s) {
+        lidar_process_scan(points + 3 * s * points_per_scan, points_per_scan, vertical_limit, segments, maximum, norm,
+                           out + s * segments);
+    }
+    return 0;
+}
+
+// Scans of different sizes stored one after another; lengths[s] points belong to scan s
+int lidar_process_ragged(const float* points, const int64_t* lengths, int64_t n_scans, float vertical_limit,
+                         int segments, float maximum, int norm, float* out) {
+    if (segments <= 0 || n_scans < 0) {
+        return -1;
+    }
+    int64_t offset = 0;
+    for (int64_t s = 0; s < n_scans; ++s) {
+        if (lengths[s] < 0) {
+            return -1;
+        }
+        lidar_process_scan(points + 3 * offset, lengths[s], vertical_limit, segments, maximum, norm,
+                           out + s * segments);
+        offset += lengths[s];
+    }
+    return 0;
+}
+
+}  // extern "C"
+
+// Built with -DLIDAR_NO_MAIN for the shared library used from Python
+#ifndef LIDAR_NO_MAIN
 int main() {
     std::vector<std::tuple<float, float, float>> lidar_data = {
         // Example data: (x, y, z)
@@ -57,15 +135,16 @@ int main() {
     int segments = 72;
     float maximum = 6.0;
     bool norm = true;
-    
+
     std::vector<float> lidar = lidar_process2(lidar_data, vertical_limit, segments, maximum, norm);
-    
+
     // Displaying the processed lidar data
     std::cout << "Processed LIDAR data: ";
     for (const auto& val : lidar) {
         std::cout << val << " ";
     }
     std::cout << std::endl;
-    
+
     return 0;
 }
+#endif
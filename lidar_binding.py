@@ -0,0 +1,137 @@
+import ctypes
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from lidar_segmentation import MAXIMUM, SEGMENTS
+
+# ctypes binding for the C entry points of lidar.cpp. Point arrays are passed as
+# pointers to their own float32 buffers (no per-point conversion) and results are
+# written into a float32 array owned by the caller. ctypes drops the GIL for the
+# duration of each call, so batches can be split over a thread pool.
+SOURCE = Path(__file__).with_name('lidar.cpp')
+LIBRARY_SUFFIX = {'darwin': '.dylib', 'win32': '.dll'}.get(sys.platform, '.so')
+LIBRARY = SOURCE.with_name('liblidar' + LIBRARY_SUFFIX)
+
+# CPU build; pass nvcc as the compiler (with its own flags) for a CUDA build of the same file
+BUILD_FLAGS = ['-O3', '-std=c++17', '-shared', '-fPIC', '-DLIDAR_NO_MAIN']
+
+_points = np.ctypeslib.ndpointer(dtype=np.float32, flags='C_CONTIGUOUS')
+_lengths = np.ctypeslib.ndpointer(dtype=np.int64, flags='C_CONTIGUOUS')
+_output = np.ctypeslib.ndpointer(dtype=np.float32, flags=('C_CONTIGUOUS', 'WRITEABLE'))
+_SIGNATURES = {
+    'lidar_cuda_available': [],
+    'lidar_process_scan': [_points, ctypes.c_int64, ctypes.c_float, ctypes.c_int, ctypes.c_float, ctypes.c_int,
+                           _output],
+    'lidar_process_batch': [_points, ctypes.c_int64, ctypes.c_int64, ctypes.c_float, ctypes.c_int, ctypes.c_float,
+                            ctypes.c_int, _output],
+    'lidar_process_ragged': [_points, _lengths, ctypes.c_int64, ctypes.c_float, ctypes.c_int, ctypes.c_float,
+                             ctypes.c_int, _output],
+}
+
+
+def build_library(source=SOURCE, output=LIBRARY, compiler='g++', flags=BUILD_FLAGS):
+    """Compile lidar.cpp into a shared library and return its path."""
+    command = [compiler, *flags, str(source), '-o', str(output)]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError('Building %s failed:\n%s\n%s' % (output, ' '.join(command), result.stderr))
+    return Path(output)
+
+
+@lru_cache(maxsize=None)
+def load_library(path=None, build=True):
+    """Load the shared library, (re)building it from lidar.cpp first when missing or stale."""
+    path = LIBRARY if path is None else Path(path)
+    if build and path == LIBRARY and (not path.exists() or path.stat().st_mtime < SOURCE.stat().st_mtime):
+        build_library(output=path)
+    library = ctypes.CDLL(str(path))
+    for name, argtypes in _SIGNATURES.items():
+        function = getattr(library, name)
+        function.argtypes = argtypes
+        function.restype = ctypes.c_int
+    return library
+
+
+def cuda_available(library=None):
+    """Whether the loaded library was compiled with CUDA support."""
+    return bool((library or load_library()).lidar_cuda_available())
+
+
+def _as_points(points):
+    """float32 C-contiguous view of the points; only copies when the input isn't already one."""
+    points = np.ascontiguousarray(points, dtype=np.float32)
+    if points.shape[-1] != 3:
+        raise ValueError('Expected points with x, y, z in the last axis, got shape %s' % (points.shape,))
+    return points
+
+
+def _output_array(out, shape):
+    if out is None:
+        return np.empty(shape, dtype=np.float32)
+    if out.shape != shape or out.dtype != np.float32 or not out.flags.c_contiguous:
+        raise ValueError('out must be a C-contiguous float32 array of shape %s' % (shape,))
+    return out
+
+
+def _check(status):
+    if status != 0:
+        raise ValueError('lidar.cpp rejected the arguments (status %d)' % status)
+
+
+def lidar_process(points, vertical_limit, segments=SEGMENTS, maximum=MAXIMUM, norm=True, out=None, library=None):
+    """lidar_process2 on one (N, 3) scan or a (scans, N, 3) batch; returns (segments,) or (scans, segments)."""
+    library = library or load_library()
+    points = _as_points(points)
+    if points.ndim == 2:
+        out = _output_array(out, (segments,))
+        _check(library.lidar_process_scan(points, len(points), vertical_limit, segments, maximum, int(norm), out))
+        return out
+    n_scans, n_points = points.shape[:2]
+    out = _output_array(out, (n_scans, segments))
+    _check(library.lidar_process_batch(points, n_scans, n_points, vertical_limit, segments, maximum, int(norm), out))
+    return out
+
+
+def lidar_process_ragged(points, lengths, vertical_limit, segments=SEGMENTS, maximum=MAXIMUM, norm=True, out=None,
+                         library=None):
+    """Scans of different sizes concatenated into one (N, 3) array; returns (len(lengths), segments)."""
+    library = library or load_library()
+    points = _as_points(points).reshape(-1, 3)
+    lengths = np.ascontiguousarray(lengths, dtype=np.int64)
+    if lengths.sum() != len(points):
+        raise ValueError('Scan lengths add up to %d but %d points were given' % (lengths.sum(), len(points)))
+    out = _output_array(out, (len(lengths), segments))
+    _check(library.lidar_process_ragged(points, lengths, len(lengths), vertical_limit, segments, maximum, int(norm),
+                                        out))
+    return out
+
+
+def lidar_process_threaded(scans, vertical_limit, segments=SEGMENTS, maximum=MAXIMUM, norm=True, out=None,
+                           workers=None, chunk_scans=256):
+    """lidar_process over a (scans, N, 3) batch split into chunks run on a thread pool."""
+    library = load_library()
+    scans = _as_points(scans)
+    out = _output_array(out, (len(scans), segments))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(lidar_process, scans[start:start + chunk_scans], vertical_limit, segments, maximum,
+                               norm, out[start:start + chunk_scans], library)
+                   for start in range(0, len(scans), chunk_scans)]
+        for future in futures:
+            future.result()
+    return out
+
+
+if __name__ == '__main__':
+    # Same example as main() in lidar.cpp, through the shared library
+    lidar_data = np.array([
+        # Example data: (x, y, z)
+        [1.0, 2.0, 0.5],
+        [2.0, 1.0, 0.2],
+    ])
+    lidar = lidar_process(lidar_data, vertical_limit=1.0, segments=72, maximum=6.0, norm=True)
+    print("Processed LIDAR data: " + "".join("%g " % val for val in lidar))
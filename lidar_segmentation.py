@@ -0,0 +1,90 @@
+import numpy as np
+
+# NumPy version of lidar_process2 in lidar.cpp, applied to many scans in one call.
+# Per scan: points with |z| > vertical_limit are dropped, every 4th remaining point is
+# kept, and each kept point lowers the minimum horizontal distance of its angular
+# bucket (72 x 5 degrees by default); buckets start at `maximum` and are optionally
+# normalized by it. Arithmetic follows the C++ (float32 data, angle in degrees rounded
+# to float, bucket from floor(angle / width)), including its bucket mapping: points with
+# x < 0 and y != 0 are shifted by half a turn. Where the C++ index comes out negative
+# (x >= 0, y < 0, and part of x < 0, y < 0 for odd segment counts) it writes out of
+# bounds; here it wraps with Python's modulo instead.
+# Points within an ulp of a bucket edge (but not on it) may still land on the other side
+# of it than with a given libm's atan2f.
+SEGMENTS = 72
+MAXIMUM = 6.0
+
+
+def _segment_flat(points, lengths, vertical_limit, segments, maximum, norm):
+    """Core of segment_scans for concatenated scans of the given lengths."""
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    n_scans = len(lengths)
+    x, y, z = points[:, 0], points[:, 1], points[:, 2]
+    limit = np.float32(vertical_limit)
+
+    # Running count of points inside the vertical limit, restarted for every scan
+    # (NaN z passes the limit test in the C++ too)
+    inside = ~((z > limit) | (z < -limit))
+    count = np.cumsum(inside, dtype=np.int64)
+    starts = np.cumsum(lengths) - lengths
+    before = np.concatenate(([0], count))[starts]
+    count -= np.repeat(before, lengths)
+    keep = inside & (count % 4 == 0) & np.isfinite(x) & np.isfinite(y)
+
+    scan = np.repeat(np.arange(n_scans), lengths)[keep]
+    x, y = x[keep], y[keep]
+    distance = np.sqrt(x * x + y * y)
+    # atan2f as a correctly rounded float; numpy's float32 arctan2 can be an ulp off, which
+    # moves points lying exactly on a bucket edge (x == y, axis points) to the next bucket
+    atan2f = np.arctan2(y.astype(np.float64), x.astype(np.float64)).astype(np.float32)
+    angle = (atan2f.astype(np.float64) * 180.0 / np.pi).astype(np.float32)
+    bucket = np.floor(angle.astype(np.float64) / (360.0 / segments)).astype(np.int64)
+    bucket += np.where((x < 0) & (y != 0), segments // 2, 0)
+    bucket %= segments
+
+    segmented = np.full((n_scans, segments), maximum, dtype=np.float32)
+    np.minimum.at(segmented.reshape(-1), scan * segments + bucket, distance)
+    if norm:
+        segmented = np.clip(segmented / np.float32(maximum), 0.0, 1.0)
+    return segmented
+
+
+def segment_scans(scans, vertical_limit, segments=SEGMENTS, maximum=MAXIMUM, norm=True):
+    """Bucketed minimum distances of a (scans, points, 3) batch; returns (scans, segments) float32.
+
+    Row i equals lidar_process2(scans[i], vertical_limit, segments, maximum, norm).
+    Points with non-finite x or y are ignored after they have been counted.
+    """
+    scans = np.asarray(scans, dtype=np.float32)
+    if scans.ndim == 2:
+        return segment_scans(scans[None], vertical_limit, segments, maximum, norm)[0]
+    n_scans, n_points = scans.shape[:2]
+    return _segment_flat(scans.reshape(-1, 3), np.full(n_scans, n_points), vertical_limit, segments,
+                         maximum, norm)
+
+
+def segment_ragged(points, lengths, vertical_limit, segments=SEGMENTS, maximum=MAXIMUM, norm=True):
+    """segment_scans for scans of different sizes, given as Nx3 points concatenated scan after scan."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if lengths.sum() != len(points):
+        raise ValueError('Scan lengths add up to %d but %d points were given' % (lengths.sum(), len(points)))
+    return _segment_flat(points, lengths, vertical_limit, segments, maximum, norm)
+
+
+if __name__ == '__main__':
+    # Same example as main() in lidar.cpp
+    lidar_data = np.array([
+        # Example data: (x, y, z)
+        [1.0, 2.0, 0.5],
+        [2.0, 1.0, 0.2],
+    ])
+    vertical_limit = 1.0
+    segments = 72
+    maximum = 6.0
+    norm = True
+
+    lidar = segment_scans(lidar_data, vertical_limit, segments, maximum, norm)
+
+    # Displaying the processed lidar data
+    print("Processed LIDAR data: " + "".join("%g " % val for val in lidar))
@@ -0,0 +1,271 @@
+import argparse
+import asyncio
+import socket
+import time
+
+import numpy as np
+
+from online_evaluation import OnlineEvaluator
+from timestamp_association import NS_PER_UNIT
+
+# Live pose ingestion over local UDP or TCP. Senders (the OptiTrack bridge, the VSLAM
+# node, or replay_server.py as a stand-in) pack poses as fixed 80-byte records (RECORD);
+# a datagram or TCP write carries any number of them and is decoded with one
+# np.frombuffer. Every batch is stamped once on arrival and copied into a preallocated
+# ring buffer per stream, so the network side never allocates per sample and never waits
+# for the evaluation. A consumer task drains the rings at a fixed interval into
+# online_evaluation.OnlineEvaluator (association, whole-run and windowed ATE) and reports
+# throughput and latency: sent -> received is the transport, received -> evaluated the
+# time a sample spent buffered. Records carry a per-stream sequence number, so datagrams
+# dropped on the way (UDP gives no other sign of them) are counted too.
+STREAMS = ('gt', 'pr')
+END_OF_STREAM = 255  # stream id of the record a sender writes when it is done
+RECORD = np.dtype([
+    ('stream', 'u1'),
+    ('padding', 'V3'),
+    ('sequence', '<u4'),       # per-stream send counter
+    ('stamp_ns', '<i8'),       # sample time on the recording clock
+    ('sent_ns', '<i8'),        # sender wall clock (time.time_ns) at send
+    ('position', '<f8', (3,)),
+    ('quaternion', '<f8', (4,)),  # x, y, z, w
+])
+
+
+def encode_records(stream_ids, stamps_ns, positions, quaternions, sequence=0, sent_ns=0):
+    """Structured RECORD array of poses (turn into bytes with .tobytes())."""
+    records = np.zeros(len(stamps_ns), dtype=RECORD)
+    records['stream'] = stream_ids
+    records['sequence'] = sequence
+    records['stamp_ns'] = stamps_ns
+    records['sent_ns'] = sent_ns
+    records['position'] = positions
+    records['quaternion'] = quaternions
+    return records
+
+
+def end_record():
+    records = np.zeros(1, dtype=RECORD)
+    records['stream'] = END_OF_STREAM
+    return records
+
+
+class PoseRingBuffer:
+    """Fixed-capacity buffer of timestamped poses; writers overwrite the oldest samples.
+
+    Readers keep a cursor (the total count they have read up to) and get back everything
+    written since, minus what was overwritten before they came back (reported as overrun).
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.stamps = np.zeros(capacity, dtype=np.int64)
+        self.sent = np.zeros(capacity, dtype=np.int64)
+        self.received = np.zeros(capacity, dtype=np.int64)
+        self.positions = np.zeros((capacity, 3))
+        self.quaternions = np.zeros((capacity, 4))
+        self.written = 0  # samples written in total; the newest is at (written - 1) % capacity
+
+    def write(self, records, received_ns):
+        """Append a RECORD array, all received at received_ns."""
+        n = len(records)
+        if n > self.capacity:
+            self.written += n - self.capacity
+            records = records[-self.capacity:]
+            n = self.capacity
+        slots = (self.written + np.arange(n)) % self.capacity
+        self.stamps[slots] = records['stamp_ns']
+        self.sent[slots] = records['sent_ns']
+        self.received[slots] = received_ns
+        self.positions[slots] = records['position']
+        self.quaternions[slots] = records['quaternion']
+        self.written += n
+
+    def read_since(self, cursor):
+        """(new cursor, dict of the samples written after `cursor`, number of samples lost to overwriting)."""
+        start = max(cursor, self.written - self.capacity)
+        slots = np.arange(start, self.written) % self.capacity
+        samples = {
+            'stamp_ns': self.stamps[slots],
+            'sent_ns': self.sent[slots],
+            'received_ns': self.received[slots],
+            'position': self.positions[slots],
+            'quaternion': self.quaternions[slots],
+        }
+        return self.written, samples, start - cursor
+
+
+class Ingestion:
+    """Ring buffers of all streams plus the counters the network handlers update."""
+
+    def __init__(self, capacity=1 << 16, streams=STREAMS):
+        self.streams = streams
+        self.rings = {name: PoseRingBuffer(capacity) for name in streams}
+        self.received = {name: 0 for name in streams}
+        self.expected = {name: 0 for name in streams}  # highest sequence number seen + 1
+        self.records = 0
+        self.malformed = 0   # bytes that were not a whole number of records (UDP)
+        self.unknown = 0     # records of stream ids outside `streams`
+        self.ended = asyncio.Event()
+
+    def feed(self, data, received_ns=None):
+        """Decode whole records from bytes and put them in the rings; returns the number of records."""
+        received_ns = time.time_ns() if received_ns is None else received_ns
+        records = np.frombuffer(data, dtype=RECORD)
+        self.records += len(records)
+        if (records['stream'] == END_OF_STREAM).any():
+            self.ended.set()
+        for stream_id, name in enumerate(self.streams):
+            selected = records[records['stream'] == stream_id]
+            if len(selected):
+                self.rings[name].write(selected, received_ns)
+                self.received[name] += len(selected)
+                self.expected[name] = max(self.expected[name], int(selected['sequence'].max()) + 1)
+        self.unknown += int(((records['stream'] >= len(self.streams)) & (records['stream'] != END_OF_STREAM)).sum())
+        return len(records)
+
+    def missing(self):
+        """Records that were sent but never arrived (or haven't yet), over all streams."""
+        return sum(self.expected[name] - self.received[name] for name in self.streams)
+
+
+class DatagramIngestion(asyncio.DatagramProtocol):
+    def __init__(self, ingestion):
+        self.ingestion = ingestion
+
+    def datagram_received(self, data, address):
+        whole = len(data) - len(data) % RECORD.itemsize
+        if whole != len(data):
+            self.ingestion.malformed += len(data) - whole
+        self.ingestion.feed(data[:whole])
+
+
+def stream_handler(ingestion, read_size=1 << 16):
+    """asyncio.start_server callback that decodes a TCP byte stream record by record."""
+
+    async def handle(reader, writer):
+        remainder = b''
+        try:
+            while data := await reader.read(read_size):
+                data = remainder + data
+                whole = len(data) - len(data) % RECORD.itemsize
+                if whole:
+                    ingestion.feed(data[:whole])
+                remainder = data[whole:]
+        finally:
+            writer.close()
+
+    return handle
+
+
+class LiveMonitor:
+    """Drains the rings into an OnlineEvaluator and keeps throughput and latency figures."""
+
+    def __init__(self, ingestion, evaluator):
+        self.ingestion = ingestion
+        self.evaluator = evaluator
+        self.cursors = {name: 0 for name in ingestion.streams}
+        self.overrun = 0
+        self.samples = 0
+        self.transport_ns = np.empty(0, dtype=np.int64)  # sent -> received of the last drain
+        self.buffered_ns = np.empty(0, dtype=np.int64)   # received -> evaluated of the last drain
+
+    def drain(self):
+        """Move everything new from the rings into the evaluator; returns the number of samples."""
+        transport, buffered, count = [], [], 0
+        for name in self.ingestion.streams:
+            self.cursors[name], samples, lost = self.ingestion.rings[name].read_since(self.cursors[name])
+            self.overrun += lost
+            if not len(samples['stamp_ns']):
+                continue
+            # Datagrams can overtake each other; the evaluator wants each batch in time order
+            order = np.argsort(samples['stamp_ns'], kind='stable')
+            arrays = (samples['stamp_ns'][order], samples['position'][order], samples['quaternion'][order])
+            if name == 'gt':
+                self.evaluator.add_gt(*arrays)
+            else:
+                self.evaluator.add_pr(*arrays)
+            transport.append(samples['received_ns'] - samples['sent_ns'])
+            buffered.append(time.time_ns() - samples['received_ns'])
+            count += len(order)
+        self.samples += count
+        if count:
+            self.transport_ns, self.buffered_ns = np.concatenate(transport), np.concatenate(buffered)
+        return count
+
+    def report(self, elapsed_s, new_samples, with_scale=False):
+        row = self.evaluator.summary(with_scale)
+        ms = NS_PER_UNIT['ms']
+        latency = ''
+        if len(self.transport_ns):
+            latency = (f" | transport p50 {np.percentile(self.transport_ns, 50) / ms:.2f} ms, "
+                       f"p99 {np.percentile(self.transport_ns, 99) / ms:.2f} ms"
+                       f" | buffered p50 {np.percentile(self.buffered_ns, 50) / ms:.2f} ms")
+        print(f"{new_samples / max(elapsed_s, 1e-9):8.0f} samples/s | {self.samples} in, "
+              f"{self.ingestion.missing()} missed, {self.overrun} overrun"
+              f"{latency} | {row['n_pairs']} pairs, ATE {row['ate_rmse']:.3f} m, "
+              f"window ATE {row['window_ate_rmse']:.3f} m, drift {row['window_drift_percent']:.2f} %", flush=True)
+        return row
+
+
+async def monitor(live, interval=1.0, with_scale=False, stop_at_end=False):
+    """Drain and report every `interval` seconds; returns the final summary once the senders are done."""
+    last = time.perf_counter()
+    while True:
+        try:
+            await asyncio.wait_for(live.ingestion.ended.wait(), interval) if stop_at_end else await asyncio.sleep(interval)
+        except asyncio.TimeoutError:
+            pass
+        now = time.perf_counter()
+        new_samples = live.drain()
+        ended = stop_at_end and live.ingestion.ended.is_set()
+        if ended:
+            live.evaluator.flush()
+        row = live.report(now - last, new_samples, with_scale)
+        last = now
+        if ended:
+            return row
+
+
+async def serve(host='127.0.0.1', port=9870, transport='udp', capacity=1 << 16, tolerance_s=0.05, window=600,
+                interval=1.0, with_scale=False, stop_at_end=False, receive_buffer=1 << 22):
+    """Listen for pose records and evaluate them until cancelled (or the end record with stop_at_end)."""
+    ingestion = Ingestion(capacity)
+    live = LiveMonitor(ingestion, OnlineEvaluator(tolerance_s, window))
+    loop = asyncio.get_running_loop()
+    if transport == 'udp':
+        # A large receive buffer rides out the moments the loop is busy evaluating
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+        sock.bind((host, port))
+        endpoint, _ = await loop.create_datagram_endpoint(lambda: DatagramIngestion(ingestion), sock=sock)
+    else:
+        endpoint = await asyncio.start_server(stream_handler(ingestion), host, port)
+    print(f"Listening for {'/'.join(ingestion.streams)} poses on {transport}://{host}:{port}", flush=True)
+    try:
+        return await monitor(live, interval, with_scale, stop_at_end)
+    finally:
+        endpoint.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest live gt/pr pose streams over UDP or TCP and evaluate them as they arrive.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=9870, help='port to listen on')
+    parser.add_argument('--transport', choices=['udp', 'tcp'], default='udp')
+    parser.add_argument('--capacity', type=int, default=1 << 16, help='samples held per stream ring buffer')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='max gt/pr time gap in seconds')
+    parser.add_argument('--window', type=int, default=600, help='pairs in the sliding window')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between evaluation updates')
+    parser.add_argument('--sim3', action='store_true', help='align with scale')
+    parser.add_argument('--until-end', action='store_true', help='exit after the sender signals the end of its streams')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.transport, args.capacity, args.tolerance, args.window,
+                          args.interval, args.sim3, args.until_end))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import numpy as np
+
+# Robust static position estimates for survey markers. Marker blocks are arrays of shape
+# (frames, markers, 3); occluded samples are NaN. Samples far from a marker's median
+# position (by a MAD test on the distance) are treated as swaps/ghosts and ignored.
+
+# Scales a MAD to a standard deviation for normally distributed data
+MAD_TO_SIGMA = 1.4826
+
+
+def _distance_gate(block, centre, threshold):
+    """Inlier mask from a MAD test on each sample's distance to its marker's centre."""
+    distance = np.linalg.norm(block - centre[None], axis=-1)
+    with np.errstate(invalid='ignore'):
+        median = np.nanmedian(distance, axis=0)
+        spread = MAD_TO_SIGMA * np.nanmedian(np.abs(distance - median[None]), axis=0)
+    # A perfectly still marker has zero spread; keep every sample at the median distance
+    spread = np.where(spread > 0, spread, np.finfo(np.float64).eps)
+    return np.isfinite(distance) & (distance - median[None] <= threshold * spread[None])
+
+
+def _trimmed_mean(values, trim):
+    """Mean along axis 0 after dropping the lowest/highest `trim` fraction of valid values."""
+    ordered = np.sort(values, axis=0)  # NaNs sort last
+    count = np.sum(np.isfinite(values), axis=0)
+    cut = np.floor(trim * count).astype(np.int64)
+    rank = np.arange(len(values)).reshape((-1,) + (1,) * (values.ndim - 1))
+    keep = (rank >= cut[None]) & (rank < (count - cut)[None])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(keep, ordered, 0.0).sum(axis=0) / keep.sum(axis=0)
+
+
+def robust_marker_centres(block, method='median', trim=0.1, threshold=3.5):
+    """Robust centre and jitter of every marker in a (frames, markers, 3) block.
+
+    method is 'median' or 'trimmed' (mean after trimming `trim` of each tail). Returns a
+    dict with 'centre' (M, 3), 'jitter' (M,) RMS distance of inliers from the centre,
+    'inliers' (M,) sample counts and 'mask' (F, M) of the samples that were used.
+    """
+    block = np.asarray(block, dtype=np.float64)
+    if block.ndim == 2:
+        block = block.reshape(len(block), -1, 3)
+    with np.errstate(invalid='ignore'):
+        initial = np.nanmedian(block, axis=0)
+    mask = _distance_gate(block, initial, threshold)
+    gated = np.where(mask[..., None], block, np.nan)
+
+    with np.errstate(invalid='ignore'):
+        if method == 'median':
+            centre = np.nanmedian(gated, axis=0)
+        elif method == 'trimmed':
+            centre = _trimmed_mean(gated, trim)
+        else:
+            raise ValueError("method must be 'median' or 'trimmed', got %r" % (method,))
+        squared = np.sum((gated - centre[None]) ** 2, axis=-1)
+        jitter = np.sqrt(np.nanmean(squared, axis=0))
+    return {'centre': centre, 'jitter': jitter, 'inliers': mask.sum(axis=0), 'mask': mask}
+
+
+class StreamingMarkerEstimator:
+    """Marker centres accumulated chunk by chunk, for captures too long to load at once.
+
+    Each chunk is gated against its own median and reduced to that median plus inlier
+    sums, so memory is O(chunks x markers) rather than O(frames). result() takes the
+    median of the chunk medians, drops chunks that sit far from it (a swap that lasted
+    a whole chunk) and merges the remaining sums.
+    """
+
+    def __init__(self, threshold=3.5):
+        self.threshold = threshold
+        self._medians = []
+        self._counts = []
+        self._sums = []
+        self._squares = []
+
+    def update(self, block):
+        """Add a (frames, markers, 3) chunk."""
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim == 2:
+            block = block.reshape(len(block), -1, 3)
+        with np.errstate(invalid='ignore'):
+            median = np.nanmedian(block, axis=0)
+        mask = _distance_gate(block, median, self.threshold)
+        values = np.where(mask[..., None], block, 0.0)
+        self._medians.append(median)
+        self._counts.append(mask.sum(axis=0))
+        self._sums.append(values.sum(axis=0))
+        self._squares.append(np.einsum('fmi,fmi->m', values, values))
+
+    def result(self):
+        """Current estimate in the same layout as robust_marker_centres (without 'mask')."""
+        if not self._medians:
+            raise ValueError('No samples have been added')
+        medians = np.stack(self._medians)
+        counts = np.stack(self._counts)
+        sums = np.stack(self._sums)
+        squares = np.stack(self._squares)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts[..., None]
+            chunk_jitter = np.sqrt(squares / counts - np.sum(means ** 2, axis=-1))
+            centre = np.nanmedian(medians, axis=0)
+            distance = np.linalg.norm(medians - centre[None], axis=-1)
+            median = np.nanmedian(distance, axis=0)
+            spread = MAD_TO_SIGMA * np.nanmedian(np.abs(distance - median[None]), axis=0)
+            # Chunk medians of a still marker agree to within its sample jitter
+            spread = np.fmax(spread, np.nanmedian(chunk_jitter, axis=0))
+        spread = np.where(spread > 0, spread, np.finfo(np.float64).eps)
+        keep = np.isfinite(distance) & (distance - median[None] <= self.threshold * spread[None])
+
+        count = np.where(keep, counts, 0).sum(axis=0)
+        total = np.where(keep[..., None], sums, 0.0).sum(axis=0)
+        square = np.where(keep, squares, 0.0).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            centre = total / count[:, None]
+            # Mean squared distance to the merged mean; clip rounding below zero
+            jitter = np.sqrt(np.maximum(square / count - np.sum(centre ** 2, axis=-1), 0.0))
+        return {'centre': centre, 'jitter': jitter, 'inliers': count}
+
+
+def stream_marker_centres(chunks, threshold=3.5):
+    """Run StreamingMarkerEstimator over an iterable of (frames, markers, 3) chunks."""
+    estimator = StreamingMarkerEstimator(threshold=threshold)
+    for chunk in chunks:
+        estimator.update(chunk)
+    return estimator.result()
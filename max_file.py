@@ -1,9 +1,12 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.spatial.transform import Rotation as R
 from pathlib import Path
 from mpl_toolkits.mplot3d import Axes3D
+from pose_resampling import resample_odometry, uniform_timeline
+from pose_transforms import POSITION_COLUMNS, QUATERNION_COLUMNS, pose_arrays, reanchor_poses
+from timestamp_association import to_ns
+from trajectory_metrics import absolute_trajectory_error, error_statistics, relative_pose_error
 
 # Load the data
 data_path = Path("isaacVslam/take_1_new/take_1/")
@@ -16,73 +19,37 @@ end_time = min(gt_odometry.iloc[-1]["sec"], pr_odometry.iloc[-1]["sec"])
 gt_odometry = gt_odometry[gt_odometry['sec'].between(start_time, end_time)]
 pr_odometry = pr_odometry[pr_odometry['sec'].between(start_time, end_time)]
 
-# Convert 'sec' to TimedeltaIndex and resample the data
-gt_odometry['sec'] = pd.to_timedelta(gt_odometry['sec'] - gt_odometry['sec'].iloc[0], unit='s')
-pr_odometry['sec'] = pd.to_timedelta(pr_odometry['sec'] - pr_odometry['sec'].iloc[0], unit='s')
+# Resample both datasets onto a common 100ms timeline (linear positions, SLERP orientations)
+overlap_start = max(gt_odometry['sec'].iloc[0], pr_odometry['sec'].iloc[0])
+overlap_end = min(gt_odometry['sec'].iloc[-1], pr_odometry['sec'].iloc[-1])
+timeline_ns = uniform_timeline(to_ns(overlap_start), to_ns(overlap_end), rate_hz=10)
+gt_odometry = resample_odometry(gt_odometry, timeline_ns)
+pr_odometry = resample_odometry(pr_odometry, timeline_ns)
 
-# Resample the data based on time (100ms intervals)
-gt_odometry = gt_odometry.set_index('sec').resample('100ms').first().interpolate().reset_index()
-pr_odometry = pr_odometry.set_index('sec').resample('100ms').first().interpolate().reset_index()
+# Re-anchor both datasets to their first pose (T0^-1 @ Tn for every row at once)
+pr_positions, pr_quaternions = reanchor_poses(*pose_arrays(pr_odometry))
+pr_odometry[POSITION_COLUMNS] = pr_positions
+pr_odometry[QUATERNION_COLUMNS] = pr_quaternions
 
-# Apply the transformation to both datasets
-def apply_transformation(row, T0_inv):
-    r = R.from_quat([row['x'], row['y'], row['z'], row['w']])
-    t = np.array([row['pos_x'], row['pos_y'], row['pos_z']])
-
-    Tn = np.eye(4)
-    Tn[:3, :3] = r.as_matrix()
-    Tn[:3, 3] = t
-
-    Tn_transformed = np.matmul(T0_inv, Tn)
-    transformed_pos = Tn_transformed[:3, 3]
-    transformed_rot = R.from_matrix(Tn_transformed[:3, :3])
-
-    return pd.Series({
-        'sec': row["sec"],  # Convert back to seconds for the final DataFrame
-        'pos_x': transformed_pos[0],
-        'pos_y': transformed_pos[1],
-        'pos_z': transformed_pos[2],
-        'x': transformed_rot.as_quat()[0],
-        'y': transformed_rot.as_quat()[1],
-        'z': transformed_rot.as_quat()[2],
-        'w': transformed_rot.as_quat()[3]
-    })
-
-# Apply the transformation to the prediction data
-first_row_pred = pr_odometry.iloc[0]
-r_pred = R.from_quat([first_row_pred['x'], first_row_pred['y'], first_row_pred['z'], first_row_pred['w']])
-t_pred = np.array([first_row_pred['pos_x'], first_row_pred['pos_y'], first_row_pred['pos_z']])
-
-T0_pred = np.eye(4)
-T0_pred[:3, :3] = r_pred.as_matrix()
-T0_pred[:3, 3] = t_pred
-T0_pred_inv = np.linalg.inv(T0_pred)
-
-pr_odometry = pr_odometry.apply(apply_transformation, axis=1, T0_inv=T0_pred_inv)
-
-# Apply the transformation to the ground truth data
-first_row_gt = gt_odometry.iloc[0]
-r_gt = R.from_quat([first_row_gt['x'], first_row_gt['y'], first_row_gt['z'], first_row_gt['w']])
-t_gt = np.array([first_row_gt['pos_x'], first_row_gt['pos_y'], first_row_gt['pos_z']])
-
-T0_gt = np.eye(4)
-T0_gt[:3, :3] = r_gt.as_matrix()
-T0_gt[:3, 3] = t_gt
-T0_gt_inv = np.linalg.inv(T0_gt)
-
-gt_odometry = gt_odometry.apply(apply_transformation, axis=1, T0_inv=T0_gt_inv)
+gt_positions, gt_quaternions = reanchor_poses(*pose_arrays(gt_odometry))
+gt_odometry[POSITION_COLUMNS] = gt_positions
+gt_odometry[QUATERNION_COLUMNS] = gt_quaternions
 
 # Calculate Euclidean distances between ground truth and prediction for all points
-d_error = []
-for gt_row, pr_row in zip(gt_odometry.iterrows(), pr_odometry.iterrows()):
-    delta_x = gt_row[1]['pos_x'] - pr_row[1]['pos_x']
-    delta_y = gt_row[1]['pos_y'] - pr_row[1]['pos_y']
-    delta_z = gt_row[1]['pos_z'] - pr_row[1]['pos_z']
-    distance = np.sqrt(delta_x**2 + delta_y**2 + delta_z**2)
-    d_error.append(distance)
+n_poses = min(len(gt_odometry), len(pr_odometry))
+d_error, _ = absolute_trajectory_error(gt_positions[:n_poses], pr_positions[:n_poses], alignment=None)
 
 print(f"Average distance error: {np.mean(d_error):.2f} m")
 
+# Umeyama-aligned ATE and RPE on the same associated poses
+ate, alignment = absolute_trajectory_error(gt_positions[:n_poses], pr_positions[:n_poses], alignment='se3')
+print(f"ATE (SE3 aligned) RMSE: {error_statistics(ate)['rmse']:.3f} m")
+rpe = relative_pose_error(gt_positions[:n_poses], gt_quaternions[:n_poses],
+                          pr_positions[:n_poses], pr_quaternions[:n_poses], deltas=(1, 10))
+for delta, errors in rpe.items():
+    print(f"RPE ({delta} frames) RMSE: {error_statistics(errors['translation'])['rmse']:.3f} m, "
+          f"{error_statistics(errors['rotation'])['rmse']:.2f} deg")
+
 # Plot the results
 fig = plt.figure(figsize=(14, 7))
 
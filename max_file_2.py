@@ -1,14 +1,14 @@
 import pandas as pd
 import matplotlib.pyplot as plt
+from coordinate_frames import convert_points
+from motive_csv import motive_dataframe, read_motive_csv
+from timestamp_association import NS_PER_UNIT, associate, read_csv_stamps_ns, to_ns
 
-# Step 1: Define column names for the optitrack data
-optitrack_columns = [
-    'Frame', 'Time (Seconds)', 'X', 'Y', 'Z', 'Rotation_W', 'pos_x', 'pos_y', 'pos_z'
-]
-
-# Step 2: Load the CSV files, skipping the first 7 lines for optitrack_recording.csv
+# Step 1: Load the odometry CSV and the drone rigid body from the Motive export
+# (Frame, Time (Seconds), quaternion x, y, z, w and pos_x, pos_y, pos_z)
 odometry_df = pd.read_csv('odometry.csv')
-optitrack_df = pd.read_csv('optitrack_recording.csv', skiprows=7, names=optitrack_columns)
+optitrack_take = read_motive_csv('optitrack_recording.csv', bodies=['drone'])
+optitrack_df = motive_dataframe(optitrack_take, 'drone')
 
 # Check the sample time (Assume it's in seconds)
 sample_time_odometry = odometry_df['sec'].diff().mean()
@@ -53,51 +53,25 @@ plt.tight_layout()
 plt.show()
 
 # Step 4: Transform coordinates from FUR (Forward, Up, Right) to FLU (Forward, Left, Up)
-optitrack_df['FLU_x'] = optitrack_df['X']
-optitrack_df['FLU_y'] = optitrack_df['Y'] * -1  # Multiply Y by -1
-optitrack_df['FLU_z'] = optitrack_df['Z']
-
-optitrack_df['FLU_pos_x'] = optitrack_df['pos_x']
-optitrack_df['FLU_pos_y'] = optitrack_df['pos_y'] * -1  # Multiply pos_y by -1
-optitrack_df['FLU_pos_z'] = optitrack_df['pos_z']
-
 # Step 5: Putting into the relative frame (relative to the first point)
-relative_frame_origin = optitrack_df[['FLU_x', 'FLU_y', 'FLU_z']].iloc[0]
-optitrack_df['FLU_x'] -= relative_frame_origin['FLU_x']
-optitrack_df['FLU_y'] -= relative_frame_origin['FLU_y']
-optitrack_df['FLU_z'] -= relative_frame_origin['FLU_z']
-
-relative_frame_origin_prime = optitrack_df[['FLU_pos_x', 'FLU_pos_y', 'FLU_pos_z']].iloc[0]
-optitrack_df['FLU_pos_x'] -= relative_frame_origin_prime['FLU_pos_x']
-optitrack_df['FLU_pos_y'] -= relative_frame_origin_prime['FLU_pos_y']
-optitrack_df['FLU_pos_z'] -= relative_frame_origin_prime['FLU_pos_z']
-
-# Step 6: Convert the time columns to datetime format
-odometry_df['Time'] = pd.to_datetime(odometry_df['sec'], unit='s')
-initial_odometry_time = odometry_df['Time'].iloc[0]
-optitrack_df['Time'] = pd.to_timedelta(optitrack_df['Time (Seconds)'], unit='s') + initial_odometry_time
-
-# Remove duplicates from both dataframes to avoid reindexing issues
-optitrack_df = optitrack_df.drop_duplicates(subset='Time')
-odometry_df = odometry_df.drop_duplicates(subset='Time')
-
-# Ensure there are no duplicate timestamps after merging
-optitrack_resampled = optitrack_df.set_index('Time')
-optitrack_resampled = optitrack_resampled[~optitrack_resampled.index.duplicated(keep='first')]
-
-odometry_df = odometry_df.set_index('Time')
-odometry_df = odometry_df[~odometry_df.index.duplicated(keep='first')]
+optitrack_positions = optitrack_df[['pos_x', 'pos_y', 'pos_z']].to_numpy()
+optitrack_df[['FLU_pos_x', 'FLU_pos_y', 'FLU_pos_z']] = convert_points(
+    optitrack_positions, 'FUR', 'FLU', origin=optitrack_positions[0])
 
-# Step 7: Resampling the optitrack data to have the same timestamps as the odometry data
-optitrack_resampled = optitrack_resampled.reindex(
-    odometry_df.index, method='nearest', tolerance=pd.Timedelta('100ms')
-).reset_index()
+# Step 6: Convert both time columns to int64 nanoseconds relative to the start of each recording
+odometry_ns = read_csv_stamps_ns('odometry.csv')
+odometry_ns -= odometry_ns[0]
+optitrack_ns = to_ns(optitrack_df['Time (Seconds)'].to_numpy())
 
-# Step 8: Combine the dataframes
-combined_dataframes = pd.concat([odometry_df.reset_index(), optitrack_resampled.reset_index()], axis=1)
+# Step 7: Match every odometry sample to the nearest optitrack sample within 100ms
+optitrack_index = associate(odometry_ns, optitrack_ns, tolerance_ns=100 * NS_PER_UNIT['ms'])
+matched = optitrack_index >= 0
 
-# Step 9: Drop rows where merge could not find a match within the tolerance
-combined_dataframes = combined_dataframes.dropna()
+# Step 8: Combine the matched rows
+combined_dataframes = pd.concat([
+    odometry_df[matched].reset_index(drop=True),
+    optitrack_df.iloc[optitrack_index[matched]].reset_index(drop=True),
+], axis=1)
 
 # Function to plot specific columns from odometry data
 def plot_odometry(ax, label):
@@ -111,7 +85,7 @@ def plot_optitrack(ax, x_label, y_label):
     ax.scatter([0], [0], color='green', marker='x', s=100, label='Start Point (0, 0)')
     ax.scatter([combined_dataframes[x_label].iloc[-1]], [combined_dataframes[y_label].iloc[-1]], color='red', marker='x', s=100, label='End Point')
 
-# Step 10: Plot the data with specified adjustments
+# Step 9: Plot the data with specified adjustments
 fig, axs = plt.subplots(2, 1, figsize=(15, 10))
 
 # Optitrack Data - pos_x vs pos_y
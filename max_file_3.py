@@ -1,14 +1,13 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
+from coordinate_frames import convert_points, unit_scale
+from motive_csv import motive_dataframe, read_motive_csv
 
-# Step 1: Define column names for the optitrack data
-optitrack_columns = [
-    'Frame', 'Time (Seconds)', 'Quaternion_X', 'Quaternion_Y', 'Quaternion_Z', 'Quaternion_W', 'X', 'Y', 'Z'
-]
-
-# Load the CSV files, skipping the first 7 lines for optitrack_recording.csv
-optitrack_df = pd.read_csv('optitrack_20240717_0.csv', skiprows=7, names=optitrack_columns)
+# Load the drone rigid body from the Motive export
+# (Frame, Time (Seconds), quaternion x, y, z, w and pos_x, pos_y, pos_z)
+optitrack_take = read_motive_csv('optitrack_20240717_0.csv', bodies=['drone'])
+optitrack_df = motive_dataframe(optitrack_take, 'drone')
 
 # Debugging: Print the first few rows of the optitrack data
 print("Optitrack Data (first few rows):")
@@ -22,21 +21,19 @@ if 'Time (Seconds)' not in optitrack_df.columns:
 sample_time_optitrack = optitrack_df['Time (Seconds)'].diff().mean()
 print(f'Sample time for optitrack: {sample_time_optitrack} seconds')
 
-# Shift Optitrack data to make the starting point (0, 0, 0)
-optitrack_df['X'] -= optitrack_df['X'].iloc[0]
-optitrack_df['Y'] -= optitrack_df['Y'].iloc[0]
-optitrack_df['Z'] -= optitrack_df['Z'].iloc[0]
-
-# Convert optitrack data from mm to meters
-optitrack_df[['X', 'Y', 'Z']] = optitrack_df[['X', 'Y', 'Z']] / 1000.0
+# Shift Optitrack data to make the starting point (0, 0, 0) and convert it to meters
+# using the length units from the export header
+length_units = optitrack_take['metadata']['Length Units']
+optitrack_positions = optitrack_df[['pos_x', 'pos_y', 'pos_z']].to_numpy()
+optitrack_df[['pos_x', 'pos_y', 'pos_z']] = (optitrack_positions - optitrack_positions[0]) * unit_scale(length_units, 'm')
 
 # Plotting the initial data
 # fig, ax = plt.subplots(1, 1)
 
 # # Optitrack Data - Initial
-# ax.plot(optitrack_df['X'], optitrack_df['Z'], label='Optitrack', linestyle='-', marker='x', markersize=5)
-# ax.scatter([optitrack_df['X'].iloc[0]], [optitrack_df['Z'].iloc[0]], color='green', marker='x', s=100, label='Start Point')
-# ax.scatter([optitrack_df['X'].iloc[-1]], [optitrack_df['Z'].iloc[-1]], color='red', marker='x', s=100, label='End Point')
+# ax.plot(optitrack_df['pos_x'], optitrack_df['pos_z'], label='Optitrack', linestyle='-', marker='x', markersize=5)
+# ax.scatter([optitrack_df['pos_x'].iloc[0]], [optitrack_df['pos_z'].iloc[0]], color='green', marker='x', s=100, label='Start Point')
+# ax.scatter([optitrack_df['pos_x'].iloc[-1]], [optitrack_df['pos_z'].iloc[-1]], color='red', marker='x', s=100, label='End Point')
 # ax.set_title('Optitrack - Initial Data')
 # ax.set_xlabel('X Coordinate')
 # ax.set_ylabel('Z Coordinate')
@@ -49,21 +46,9 @@ optitrack_df[['X', 'Y', 'Z']] = optitrack_df[['X', 'Y', 'Z']] / 1000.0
 # - X (FUR) -> X (FLU): Remains the same.
 # - Y (FUR) -> Z (FLU): The Z coordinate in FUR becomes the Y coordinate in FLU.
 # - Z (FUR) -> -Y (FLU): The Y coordinate in FUR becomes the negative Z coordinate in FLU.
-
-optitrack_df['FLU_x'] = optitrack_df['X']  # X remains the same
-optitrack_df['FLU_y'] = optitrack_df['Z'] * -1  # Z becomes Y
-optitrack_df['FLU_z'] = optitrack_df['Y']  # Y becomes -Z
-
-# Step 5: Putting into the relative frame (relative to the first point)
-relative_frame_origin_optitrack = optitrack_df[['FLU_x', 'FLU_y', 'FLU_z']].iloc[0]
-optitrack_df.loc[:, 'FLU_x'] -= relative_frame_origin_optitrack['FLU_x']
-optitrack_df.loc[:, 'FLU_y'] -= relative_frame_origin_optitrack['FLU_y']
-optitrack_df.loc[:, 'FLU_z'] -= relative_frame_origin_optitrack['FLU_z']
-
-# Set start points for Optitrack at (0, 0, 0)
-optitrack_df.loc[0, 'FLU_x'] = 0
-optitrack_df.loc[0, 'FLU_y'] = 0
-optitrack_df.loc[0, 'FLU_z'] = 0
+# Step 5: Putting into the relative frame (relative to the first point), in one matrix product
+optitrack_df[['FLU_x', 'FLU_y', 'FLU_z']] = convert_points(
+    optitrack_positions, 'FUR', 'FLU', source_units=length_units, target_units='m', origin=optitrack_positions[0])
 
 # Step 6: Convert the time columns to datetime format
 initial_optitrack_time = pd.to_datetime(optitrack_df['Time (Seconds)'].iloc[0], unit='s')
@@ -86,9 +71,9 @@ def plot_optitrack(ax, label):
 
 # Optitrack Data - Initial X vs Z
 fig, ax = plt.subplots(1, 1)
-ax.plot(optitrack_df['X'], optitrack_df['Z'], label='Optitrack', linestyle='-', marker='x', markersize=5)
-ax.scatter([optitrack_df['X'].iloc[0]], [optitrack_df['Z'].iloc[0]], color='green', marker='x', s=100, label='Start Point')
-ax.scatter([optitrack_df['X'].iloc[-1]], [optitrack_df['Z'].iloc[-1]], color='red', marker='x', s=100, label='End Point')
+ax.plot(optitrack_df['pos_x'], optitrack_df['pos_z'], label='Optitrack', linestyle='-', marker='x', markersize=5)
+ax.scatter([optitrack_df['pos_x'].iloc[0]], [optitrack_df['pos_z'].iloc[0]], color='green', marker='x', s=100, label='Start Point')
+ax.scatter([optitrack_df['pos_x'].iloc[-1]], [optitrack_df['pos_z'].iloc[-1]], color='red', marker='x', s=100, label='End Point')
 ax.set_title('Optitrack - Initial Data')
 ax.set_xlabel('X Coordinate')
 ax.set_ylabel('Z Coordinate')
@@ -97,9 +82,9 @@ plt.tight_layout()
 
 # Optitrack Data - Top Down View (X vs Y)
 fig, ax = plt.subplots(1, 1)
-ax.plot(optitrack_df['X'], optitrack_df['Y'], label='Optitrack', linestyle='-', marker='x', markersize=5)
-ax.scatter([optitrack_df['X'].iloc[0]], [optitrack_df['Y'].iloc[0]], color='green', marker='x', s=100, label='Start Point')
-ax.scatter([optitrack_df['X'].iloc[-1]], [optitrack_df['Y'].iloc[-1]], color='red', marker='x', s=100, label='End Point')
+ax.plot(optitrack_df['pos_x'], optitrack_df['pos_y'], label='Optitrack', linestyle='-', marker='x', markersize=5)
+ax.scatter([optitrack_df['pos_x'].iloc[0]], [optitrack_df['pos_y'].iloc[0]], color='green', marker='x', s=100, label='Start Point')
+ax.scatter([optitrack_df['pos_x'].iloc[-1]], [optitrack_df['pos_y'].iloc[-1]], color='red', marker='x', s=100, label='End Point')
 ax.set_title('Top Down View - Optitrack')
 ax.set_xlabel('X Coordinate')
 ax.set_ylabel('Y Coordinate')
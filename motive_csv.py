@@ -0,0 +1,216 @@
+import csv
+from datetime import datetime
+from fnmatch import fnmatch
+
+import numpy as np
+import pandas as pd
+
+# Reader for OptiTrack Motive CSV exports (optitrack_*.csv, wall_data*.csv).
+#
+# Layout of an export:
+#   row 0   key,value pairs (Format Version, Capture Frame Rate, Length Units, ...)
+#   row 1   blank
+#   rows    ',Type,...', ',Name,...', ',ID,...' and ',,Rotation/Position,...'
+#   row     'Frame,Time (Seconds),X,Y,Z,...' axis labels
+#   rest    one row per frame; occluded samples are empty cells
+# The header block is parsed once into a column map so only the requested rigid bodies
+# and markers are read from the data rows.
+HEADER_TYPES = {
+    'Format Version': str,
+    'Take Name': str,
+    'Capture Frame Rate': float,
+    'Export Frame Rate': float,
+    'Capture Start Time': str,
+    'Capture Start Frame': int,
+    'Total Frames in Take': int,
+    'Total Exported Frames': int,
+    'Rotation Type': str,
+    'Length Units': str,
+    'Coordinate Space': str,
+}
+
+CAPTURE_TIME_FORMAT = '%Y-%m-%d %I.%M.%S.%f %p'
+
+# Position columns as x, y, z and quaternion columns as x, y, z, w (scipy order)
+POSITION_AXES = ['X', 'Y', 'Z']
+ROTATION_AXES = ['X', 'Y', 'Z', 'W']
+# Exports with 'Rotation Type' set to an Euler order (XYZ, ZYX, ...) have three angle
+# columns in degrees instead of a quaternion; they are returned as 'euler'
+EULER_AXES = ['X', 'Y', 'Z']
+
+
+def _parse_metadata(row):
+    """Turn the first export row of alternating keys and values into a dict."""
+    metadata = {}
+    for key, value in zip(row[0::2], row[1::2]):
+        if not key:
+            continue
+        cast = HEADER_TYPES.get(key, str)
+        try:
+            metadata[key] = cast(value)
+        except ValueError:
+            metadata[key] = value
+    start = metadata.get('Capture Start Time')
+    if isinstance(start, str):
+        try:
+            metadata['Capture Start Time'] = datetime.strptime(start, CAPTURE_TIME_FORMAT)
+        except ValueError:
+            pass
+    return metadata
+
+
+def read_motive_header(path):
+    """Parse the header block of a Motive export.
+
+    Returns (metadata, columns, data_start) where columns maps (type, name) to
+    {kind: {axis: column index}} and data_start is the first data row.
+    """
+    with open(path, newline='') as file:
+        reader = csv.reader(file)
+        metadata = _parse_metadata(next(reader))
+        header_rows = {}
+        data_start = 1
+        for row in reader:
+            data_start += 1
+            if not row:
+                continue
+            if row[0] == 'Frame':
+                header_rows['Axis'] = row
+                break
+            label = row[1] if len(row) > 1 else ''
+            header_rows[label or 'Kind'] = row
+
+    if 'Axis' not in header_rows:
+        raise ValueError('%s does not look like a Motive CSV export' % path)
+    axis_row = header_rows['Axis']
+    types = header_rows.get('Type', [''] * len(axis_row))
+    names = header_rows.get('Name', [''] * len(axis_row))
+    ids = header_rows.get('ID', [''] * len(axis_row))
+    kinds = header_rows.get('Kind', [''] * len(axis_row))
+
+    columns = {}
+    entity_ids = {}
+    for index in range(2, len(axis_row)):
+        key = (types[index], names[index])
+        kind = kinds[index].lower()
+        columns.setdefault(key, {}).setdefault(kind, {})[axis_row[index].upper()] = index
+        entity_ids[key] = ids[index] if index < len(ids) else ''
+    metadata['ids'] = entity_ids
+    return metadata, columns, data_start
+
+
+def _select(columns, kind_type, patterns):
+    """Names of entities of one Motive type matching any of the glob patterns, in file order."""
+    names = [name for (entity_type, name) in columns if entity_type == kind_type]
+    if patterns is None:
+        return names
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return [name for name in names if any(fnmatch(name, pattern) for pattern in patterns)]
+
+
+def _wanted_columns(columns, bodies, markers, rotation_type='Quaternion'):
+    """Column indices for every requested body/marker quantity, keyed by (group, name, kind)."""
+    wanted = {}
+    quaternion = rotation_type.lower() == 'quaternion'
+    for name in _select(columns, 'Rigid Body', bodies):
+        kinds = columns[('Rigid Body', name)]
+        wanted[('body', name, 'position')] = [kinds['position'][a] for a in POSITION_AXES]
+        if 'rotation' in kinds:
+            axes = ROTATION_AXES if quaternion else EULER_AXES
+            missing = [a for a in axes if a not in kinds['rotation']]
+            if missing:
+                raise ValueError('Rigid body %r has no rotation %s column(s) for Rotation Type %r'
+                                 % (name, '/'.join(missing), rotation_type))
+            wanted[('body', name, 'rotation' if quaternion else 'euler')] = [kinds['rotation'][a] for a in axes]
+    for marker_type in ('Marker', 'Rigid Body Marker'):
+        for name in _select(columns, marker_type, markers):
+            if ('marker', name, 'position') not in wanted:
+                wanted[('marker', name, 'position')] = [columns[(marker_type, name)]['position'][a]
+                                                        for a in POSITION_AXES]
+    return wanted
+
+
+def _split_table(table, usecols, wanted, metadata, dtype):
+    """Slice a data block read with `usecols` into the result dict layout."""
+    data = table.to_numpy(dtype=dtype)
+    position = {index: i for i, index in enumerate(usecols)}
+    result = {
+        'metadata': metadata,
+        'frame': table[0].to_numpy(dtype=np.int64),
+        'time': table[1].to_numpy(dtype=np.float64),
+        'bodies': {},
+        'markers': {},
+    }
+    for (group, name, kind), indices in wanted.items():
+        block = np.ascontiguousarray(data[:, [position[i] for i in indices]])
+        if group == 'body':
+            result['bodies'].setdefault(name, {})[kind] = block
+        else:
+            result['markers'][name] = block
+    return result
+
+
+def _read_data(path, bodies, markers, dtype, chunk_frames=None):
+    """Shared setup for the whole-file and chunked readers."""
+    metadata, columns, data_start = read_motive_header(path)
+    wanted = _wanted_columns(columns, bodies, markers, metadata.get('Rotation Type', 'Quaternion'))
+    usecols = sorted({0, 1} | {index for indices in wanted.values() for index in indices})
+    # Time always as float64: float32 would lose milliseconds after ~2 minutes
+    dtypes = {index: dtype for index in usecols if index > 1}
+    dtypes[1] = np.float64
+    reader = pd.read_csv(path, skiprows=data_start, header=None, usecols=usecols, engine='c',
+                         dtype=dtypes, na_values=[''], chunksize=chunk_frames)
+    return metadata, wanted, usecols, reader
+
+
+def read_motive_csv(path, bodies=None, markers=(), dtype=np.float64):
+    """Read selected rigid bodies and markers from a Motive export.
+
+    `bodies` / `markers` are lists of names or glob patterns (e.g. 'wall_1:*'); None
+    selects all of that type. Returns a dict with 'metadata', 'frame', 'time',
+    'bodies' {name: {'position': (N, 3), 'rotation': (N, 4) x/y/z/w}} and
+    'markers' {name: (N, 3)}. Occluded samples are NaN. Exports with Euler rotations give
+    'euler' (N, 3) angles in degrees (X, Y, Z columns, order in metadata['Rotation Type'])
+    instead of 'rotation'.
+    """
+    metadata, wanted, usecols, table = _read_data(path, bodies, markers, dtype)
+    return _split_table(table, usecols, wanted, metadata, dtype)
+
+
+def iter_motive_csv(path, bodies=None, markers=(), dtype=np.float64, chunk_frames=10000):
+    """Like read_motive_csv but yields the capture in blocks of chunk_frames frames."""
+    metadata, wanted, usecols, reader = _read_data(path, bodies, markers, dtype, chunk_frames)
+    with reader:
+        for table in reader:
+            yield _split_table(table, usecols, wanted, metadata, dtype)
+
+
+def body_markers(take, body):
+    """(frames, markers, 3) stack of the markers belonging to a rigid body ('body:Marker NNN')."""
+    names = [name for name in take['markers'] if name.split(':')[0] == body]
+    if not names:
+        return np.empty((len(take['time']), 0, 3))
+    return np.stack([take['markers'][name] for name in names], axis=1)
+
+
+def motive_dataframe(take, body):
+    """One rigid body as a DataFrame using the odometry column names (pos_x.., x, y, z, w)."""
+    frame = pd.DataFrame({'Frame': take['frame'], 'Time (Seconds)': take['time']})
+    pose = take['bodies'][body]
+    if 'rotation' in pose:
+        frame[['x', 'y', 'z', 'w']] = pose['rotation']
+    elif 'euler' in pose:
+        frame[['rot_x', 'rot_y', 'rot_z']] = pose['euler']
+    frame[['pos_x', 'pos_y', 'pos_z']] = pose['position']
+    return frame
+
+
+def body_quaternions(take, body):
+    """(N, 4) x/y/z/w rotations of a rigid body; ValueError for exports without quaternions."""
+    pose = take['bodies'][body]
+    if 'rotation' not in pose:
+        rotation_type = take['metadata'].get('Rotation Type', 'unknown')
+        raise ValueError('Rigid body %r was exported with %s rotations; re-export with Rotation Type Quaternion'
+                         % (body, rotation_type))
+    return pose['rotation']
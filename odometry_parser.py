@@ -0,0 +1,277 @@
+import numpy as np
+import pandas as pd
+
+# Parser for `ros2 topic echo` YAML dumps such as isaacVslam/take_2/slam_odometry.txt.
+# Messages are separated by '---' lines and every message of a given type has the same
+# line layout, so instead of walking the file line by line we locate all line boundaries
+# with NumPy, work out the layout once from a template message and then gather every
+# field of every message in a chunk with a single fancy-indexing operation.
+
+# Message shapes found in the repo:
+# - 'odometry':     nav_msgs/Odometry (slam_odometry.txt)
+# - 'pose_stamped': geometry_msgs/PoseStamped (tracking_odometry.txt)
+# - 'vehicle':      px4_msgs/VehicleOdometry (vehicle_odometry.txt)
+POSE_FIELDS = ['pos_x', 'pos_y', 'pos_z', 'x', 'y', 'z', 'w']
+
+MESSAGE_PATHS = {
+    'odometry': {
+        'sec': 'header.stamp.sec',
+        'nanosec': 'header.stamp.nanosec',
+        'pos_x': 'pose.pose.position.x',
+        'pos_y': 'pose.pose.position.y',
+        'pos_z': 'pose.pose.position.z',
+        'x': 'pose.pose.orientation.x',
+        'y': 'pose.pose.orientation.y',
+        'z': 'pose.pose.orientation.z',
+        'w': 'pose.pose.orientation.w',
+    },
+    'pose_stamped': {
+        'sec': 'header.stamp.sec',
+        'nanosec': 'header.stamp.nanosec',
+        'pos_x': 'pose.position.x',
+        'pos_y': 'pose.position.y',
+        'pos_z': 'pose.position.z',
+        'x': 'pose.orientation.x',
+        'y': 'pose.orientation.y',
+        'z': 'pose.orientation.z',
+        'w': 'pose.orientation.w',
+    },
+    'vehicle': {
+        # PX4 stamps are microseconds, split into sec/nanosec after parsing
+        'timestamp': 'timestamp',
+        'pos_x': 'position[0]',
+        'pos_y': 'position[1]',
+        'pos_z': 'position[2]',
+        # PX4 quaternions are stored as [w, x, y, z]
+        'w': 'q[0]',
+        'x': 'q[1]',
+        'y': 'q[2]',
+        'z': 'q[3]',
+    },
+}
+
+# Covariance blocks, only gathered when asked for
+COVARIANCE_PATHS = {
+    'odometry': {'covariance': ['pose.covariance[%d]' % i for i in range(36)]},
+    'pose_stamped': {},
+    'vehicle': {
+        'position_variance': ['position_variance[%d]' % i for i in range(3)],
+        'orientation_variance': ['orientation_variance[%d]' % i for i in range(3)],
+    },
+}
+
+INTEGER_FIELDS = ('sec', 'nanosec', 'timestamp')
+
+
+def odometry_dtype(kind, covariance=False):
+    """Structured dtype produced by the parser for a message kind."""
+    fields = [('sec', np.int64), ('nanosec', np.int64)]
+    fields += [(name, np.float64) for name in POSE_FIELDS]
+    if covariance:
+        for name, paths in COVARIANCE_PATHS[kind].items():
+            fields.append((name, np.float64, (len(paths),)))
+    return np.dtype(fields)
+
+
+def stamp_ns(data):
+    """Combine the sec/nanosec fields into int64 nanoseconds."""
+    return data['sec'].astype(np.int64) * 1_000_000_000 + data['nanosec'].astype(np.int64)
+
+
+def to_dataframe(data):
+    """Flatten a parsed array into the sec/pos_x/.../w layout used by the CSV files."""
+    frame = pd.DataFrame({'sec': data['sec'] + data['nanosec'] * 1e-9})
+    for name in POSE_FIELDS:
+        frame[name] = data[name]
+    return frame
+
+
+def _message_template(lines):
+    """Map each key path of one message to (line offset, value column, key prefix)."""
+    template = {}
+    stack = []
+    list_index = {}
+    for offset, line in enumerate(lines):
+        stripped = line.lstrip(b' ')
+        if not stripped:
+            continue
+        indent = len(line) - len(stripped)
+        if stripped.startswith(b'- '):
+            # ros2 prints list items at the same indent as their key
+            while stack and stack[-1][0] > indent:
+                stack.pop()
+            parent = '.'.join(key for _, key in stack)
+            index = list_index.get(parent, 0)
+            list_index[parent] = index + 1
+            column = indent + 2
+            template['%s[%d]' % (parent, index)] = (offset, column, line[:column])
+            continue
+        key, sep, value = stripped.partition(b':')
+        if not sep:
+            continue
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        path = '.'.join([k for _, k in stack] + [key.decode()])
+        if value.strip():
+            column = indent + len(key) + 2
+            template[path] = (offset, column, line[:column])
+        else:
+            stack.append((indent, key.decode()))
+    return template
+
+
+def detect_message_kind(template):
+    """Work out the message type from the keys of a template message."""
+    if 'pose.pose.position.x' in template:
+        return 'odometry'
+    if 'pose.position.x' in template:
+        return 'pose_stamped'
+    if 'timestamp' in template and 'q[0]' in template:
+        return 'vehicle'
+    raise ValueError('Unrecognised odometry message layout: %s' % sorted(template)[:8])
+
+
+def _gather(buffer, starts, ends):
+    """Copy variable-length byte ranges into one fixed-width 'S' array."""
+    lengths = ends - starts
+    width = max(int(lengths.max()), 1) if len(lengths) else 1
+    columns = np.arange(width)
+    index = np.minimum(starts[:, None] + columns, len(buffer) - 1)
+    block = np.where(columns < lengths[:, None], buffer[index], 0).astype(np.uint8)
+    return block.view('S%d' % width).ravel()
+
+
+def _line_bounds(buffer):
+    """Start and end offsets of every line in a byte buffer, CR/LF aware."""
+    newlines = np.flatnonzero(buffer == ord('\n'))
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(buffer)]))
+    has_cr = (ends > starts) & (buffer[np.maximum(ends - 1, 0)] == ord('\r'))
+    ends = ends - has_cr
+    return starts, ends
+
+
+def _fill_messages(out, buffer, starts, ends, first_lines, template, paths, cov_paths):
+    """Fill `out` for messages sharing `template`; return a mask of rows that matched."""
+    valid = np.ones(len(first_lines), dtype=bool)
+    columns = {}
+    for name, path in list(paths.items()) + [(p, p) for ps in cov_paths.values() for p in ps]:
+        if path not in template:
+            raise ValueError('Field %s missing from message layout' % path)
+        offset, column, prefix = template[path]
+        line = first_lines + offset
+        # Every message with this line count should carry the same key on this line
+        valid &= _gather(buffer, starts[line], np.minimum(starts[line] + column, ends[line])) == prefix
+        columns[name] = _gather(buffer, starts[line] + column, ends[line])
+
+    for name in paths:
+        if name in INTEGER_FIELDS:
+            values = np.where(valid, columns[name], b'0').astype(np.int64)
+        else:
+            values = np.where(valid, columns[name], b'nan').astype(np.float64)
+        if name == 'timestamp':
+            out['sec'] = values // 1_000_000
+            out['nanosec'] = (values % 1_000_000) * 1000
+        else:
+            out[name] = values
+    for name, cov in cov_paths.items():
+        block = np.stack([np.where(valid, columns[p], b'nan').astype(np.float64) for p in cov], axis=1)
+        out[name] = block
+    return valid
+
+
+def _parse_block(buffer, kind, covariance, templates):
+    """Parse every complete message in a byte block into a structured array."""
+    starts, ends = _line_bounds(buffer)
+    lengths = ends - starts
+    first_bytes = buffer[np.minimum(starts, len(buffer) - 1)]
+    separator = (lengths == 3) & (first_bytes == ord('-')) & (
+        buffer[np.minimum(starts + 2, len(buffer) - 1)] == ord('-'))
+    sep_lines = np.flatnonzero(separator)
+
+    # Message j spans lines [begin[j], sep_lines[j]); drop empty trailing/leading slices
+    begin = np.concatenate(([0], sep_lines[:-1] + 1))
+    line_counts = sep_lines - begin
+    keep = line_counts > 0
+    begin, line_counts = begin[keep], line_counts[keep]
+
+    if kind is None:
+        if not len(begin):
+            return kind, None
+        first = [bytes(buffer[s:e]) for s, e in zip(starts[begin[0]:begin[0] + line_counts[0]],
+                                                     ends[begin[0]:begin[0] + line_counts[0]])]
+        kind = detect_message_kind(_message_template(first))
+
+    paths = MESSAGE_PATHS[kind]
+    cov_paths = COVARIANCE_PATHS[kind] if covariance else {}
+    out = np.empty(len(begin), dtype=odometry_dtype(kind, covariance))
+    parsed = np.zeros(len(begin), dtype=bool)
+
+    # Messages of the same length share a layout; build its template from one sample
+    for count in np.unique(line_counts):
+        count = int(count)
+        pending = np.flatnonzero(line_counts == count)
+        template = templates.get(count)
+        while len(pending):
+            fresh = template is None
+            if fresh:
+                sample = begin[pending[0]]
+                template = _message_template(
+                    [bytes(buffer[s:e]) for s, e in zip(starts[sample:sample + count], ends[sample:sample + count])])
+            block = np.empty(len(pending), dtype=out.dtype)
+            valid = _fill_messages(block, buffer, starts, ends, begin[pending], template, paths, cov_paths)
+            if fresh and not valid[0]:
+                raise ValueError('Could not parse message starting at byte %d' % starts[begin[pending[0]]])
+            out[pending[valid]] = block[valid]
+            parsed[pending[valid]] = True
+            templates[count] = template
+            # Same line count but a different layout: rebuild from the first mismatch
+            pending = pending[~valid]
+            template = None
+    return kind, out[parsed]
+
+
+def iter_odometry_chunks(path, kind=None, covariance=False, chunk_bytes=1 << 24):
+    """Yield structured arrays of parsed messages, reading the dump in large blocks.
+
+    `kind` is one of 'odometry', 'pose_stamped' or 'vehicle' and is detected from the
+    first message when omitted. Covariance/variance lists are skipped unless
+    `covariance` is set.
+    """
+    templates = {}
+    remainder = b''
+    with open(path, 'rb') as file:
+        while True:
+            data = file.read(chunk_bytes)
+            block = remainder + data
+            if not data:
+                # Flush the last message, which may not be followed by '---'
+                if block.strip():
+                    block = block.rstrip(b'\r\n') + b'\n---\n'
+                else:
+                    break
+                remainder = b''
+            else:
+                cut = block.rfind(b'\n---')
+                if cut < 0:
+                    remainder = block
+                    continue
+                cut = block.find(b'\n', cut + 1)
+                if cut < 0:
+                    remainder = block
+                    continue
+                block, remainder = block[:cut + 1], block[cut + 1:]
+            buffer = np.frombuffer(block, dtype=np.uint8)
+            kind, chunk = _parse_block(buffer, kind, covariance, templates)
+            if chunk is not None and len(chunk):
+                yield chunk
+            if not data:
+                break
+
+
+def read_odometry(path, kind=None, covariance=False, chunk_bytes=1 << 24):
+    """Parse a whole dump into one structured array."""
+    chunks = list(iter_odometry_chunks(path, kind=kind, covariance=covariance, chunk_bytes=chunk_bytes))
+    if not chunks:
+        return np.empty(0, dtype=odometry_dtype(kind or 'pose_stamped', covariance))
+    return np.concatenate(chunks)
@@ -0,0 +1,300 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from batch_evaluation import GT_FILE, PR_FILE
+from pose_transforms import quat_conjugate, quat_normalize, quat_rotate
+from timestamp_association import NS_PER_UNIT, associate, decimal_seconds_to_ns
+from trajectory_metrics import _umeyama_from_moments
+
+# Live ATE for a gt/pr pair that is still being recorded. New CSV rows are read as they
+# are appended, pr samples are associated with the nearest gt sample once no closer one
+# can still arrive, and each associated pair updates running moments (means,
+# cross-covariance, variances) in O(1). The Umeyama alignment comes from those moments
+# (trajectory_metrics._umeyama_from_moments) and the ATE RMSE follows in closed form:
+#   rmse^2 = var_gt + s^2 var_pr - 2 s trace(R^T cov)
+# A ring buffer of the last `window` pairs carries a second set of moments (samples
+# leaving the window are subtracted) for windowed ATE and drift.
+
+
+class RunningMoments:
+    """Count, means and co-moments of paired 3D samples, with O(1) add/remove per pair.
+
+    Batches are merged with Chan et al.'s parallel update, which stays accurate without
+    keeping raw sums of large coordinates.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean_source = np.zeros(3)
+        self.mean_target = np.zeros(3)
+        self.comoment = np.zeros((3, 3))  # sum (target - mean) (source - mean)^T
+        self.square_source = 0.0          # sum |source - mean|^2
+        self.square_target = 0.0
+
+    @staticmethod
+    def _batch(source, target):
+        source = np.asarray(source, dtype=np.float64).reshape(-1, 3)
+        target = np.asarray(target, dtype=np.float64).reshape(-1, 3)
+        mean_source, mean_target = source.mean(axis=0), target.mean(axis=0)
+        source_c, target_c = source - mean_source, target - mean_target
+        return (len(source), mean_source, mean_target, target_c.T @ source_c,
+                float(np.einsum('ij,ij->', source_c, source_c)), float(np.einsum('ij,ij->', target_c, target_c)))
+
+    def add(self, source, target):
+        """Include source/target pairs (one pair or N x 3 arrays)."""
+        if not len(np.reshape(source, (-1, 3))):
+            return
+        n_b, mean_s_b, mean_t_b, comoment_b, square_s_b, square_t_b = self._batch(source, target)
+        n_a, n = self.n, self.n + n_b
+        delta_s, delta_t = mean_s_b - self.mean_source, mean_t_b - self.mean_target
+        weight = n_a * n_b / n
+        self.mean_source = self.mean_source + delta_s * n_b / n
+        self.mean_target = self.mean_target + delta_t * n_b / n
+        self.comoment = self.comoment + comoment_b + np.outer(delta_t, delta_s) * weight
+        self.square_source += square_s_b + delta_s @ delta_s * weight
+        self.square_target += square_t_b + delta_t @ delta_t * weight
+        self.n = n
+
+    def remove(self, source, target):
+        """Take out pairs that were added before (the inverse of add)."""
+        n_b, mean_s_b, mean_t_b, comoment_b, square_s_b, square_t_b = self._batch(source, target)
+        n = self.n
+        n_a = n - n_b
+        if n_a <= 0:
+            self.__init__()
+            return
+        mean_s_a = (n * self.mean_source - n_b * mean_s_b) / n_a
+        mean_t_a = (n * self.mean_target - n_b * mean_t_b) / n_a
+        delta_s, delta_t = mean_s_b - mean_s_a, mean_t_b - mean_t_a
+        weight = n_a * n_b / n
+        self.comoment = self.comoment - comoment_b - np.outer(delta_t, delta_s) * weight
+        self.square_source -= square_s_b + delta_s @ delta_s * weight
+        self.square_target -= square_t_b + delta_t @ delta_t * weight
+        self.mean_source, self.mean_target, self.n = mean_s_a, mean_t_a, n_a
+
+    def alignment(self, with_scale=False):
+        """(rotation, translation, scale) mapping source onto target, as umeyama_alignment would return."""
+        if self.n < 3:
+            raise ValueError('Umeyama alignment needs at least 3 pairs')
+        return _umeyama_from_moments(self.mean_source, self.mean_target, self.comoment / self.n,
+                                     self.square_source / self.n, with_scale)
+
+    def rmse(self, with_scale=False):
+        """ATE RMSE after the alignment, from the moments alone; also returns the alignment."""
+        rotation, translation, scale = self.alignment(with_scale)
+        squared = (self.square_target + scale ** 2 * self.square_source
+                   - 2 * scale * np.trace(rotation.T @ self.comoment)) / self.n
+        return float(np.sqrt(max(squared, 0.0))), (rotation, translation, scale)
+
+
+class SlidingWindow:
+    """Last `size` associated pairs in a ring buffer, with their RunningMoments."""
+
+    def __init__(self, size):
+        self.size = size
+        self.source = np.zeros((size, 3))
+        self.target = np.zeros((size, 3))
+        self.stamps = np.zeros(size, dtype=np.int64)
+        self.steps = np.zeros(size)  # gt distance from the previous pair
+        self.count = 0               # pairs seen in total; the newest is at (count - 1) % size
+        self.moments = RunningMoments()
+        self.path = 0.0              # sum of steps inside the window
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def push(self, stamp, source, target):
+        """Append one pair, dropping the oldest once the window is full."""
+        slot = self.count % self.size
+        step = float(np.linalg.norm(target - self.target[(self.count - 1) % self.size])) if self.count else 0.0
+        if self.count >= self.size:
+            self.moments.remove(self.source[slot], self.target[slot])
+            self.path -= self.steps[(slot + 1) % self.size]  # the new oldest pair's step leaves the path
+        self.source[slot], self.target[slot], self.stamps[slot], self.steps[slot] = source, target, stamp, step
+        self.moments.add(source, target)
+        self.path += step if self.count else 0.0
+        self.count += 1
+        if self.count % self.size == 0:
+            self._refresh()
+
+    def _refresh(self):
+        # Rebuild the moments from the buffer once per window length so add/remove rounding can't build up
+        order = self.ordered()
+        self.moments = RunningMoments()
+        self.moments.add(self.source[order], self.target[order])
+        self.path = float(self.steps[order[1:]].sum())
+
+    def ordered(self):
+        """Buffer slots from oldest to newest."""
+        n = len(self)
+        return (np.arange(self.count - n, self.count)) % self.size
+
+    def oldest(self):
+        return (self.count - len(self)) % self.size
+
+    def newest(self):
+        return (self.count - 1) % self.size
+
+
+class CsvTail:
+    """Reads the complete rows appended to an odometry CSV (sec, pos_x, pos_y, pos_z, x, y, z, w) since the last poll."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.offset = 0
+        self.columns = None
+
+    def poll(self):
+        """(stamps_ns, positions, quaternions) of the new rows; empty arrays when nothing was appended."""
+        empty = (np.empty(0, dtype=np.int64), np.empty((0, 3)), np.empty((0, 4)))
+        if not self.path.exists():
+            return empty
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        # Only whole lines; a row being written stays for the next poll
+        end = chunk.rfind(b'\n') + 1
+        if end == 0:
+            return empty
+        self.offset += end
+        lines = chunk[:end].decode().splitlines()
+        if self.columns is None:
+            self.columns = lines[0].strip().split(',')
+            lines = lines[1:]
+        lines = [line for line in lines if line.strip()]
+        if not lines:
+            return empty
+        fields = np.array([line.split(',') for line in lines], dtype=str)
+        column = {name: index for index, name in enumerate(self.columns)}
+        stamps = decimal_seconds_to_ns(fields[:, column['sec']])
+        positions = fields[:, [column[name] for name in ('pos_x', 'pos_y', 'pos_z')]].astype(np.float64)
+        quaternions = fields[:, [column[name] for name in ('x', 'y', 'z', 'w')]].astype(np.float64)
+        return stamps, positions, quaternions
+
+
+class OnlineEvaluator:
+    """Associates incoming gt/pr samples and keeps whole-run and windowed ATE up to date."""
+
+    def __init__(self, tolerance_s=0.05, window=600, max_gt_buffer=10000):
+        self.tolerance_ns = int(tolerance_s * NS_PER_UNIT['s'])
+        self.max_gt_buffer = max_gt_buffer
+        self.gt_stamps = np.empty(0, dtype=np.int64)
+        self.gt_positions = np.empty((0, 3))
+        self.gt_quaternions = np.empty((0, 4))
+        self.pending = (np.empty(0, dtype=np.int64), np.empty((0, 3)), np.empty((0, 4)))
+        self.moments = RunningMoments()
+        self.window = SlidingWindow(window)
+        self.anchors = None          # first associated gt/pr poses, for the anchored error
+        self.anchored_sum = 0.0
+        self.dropped = 0             # pr samples without a gt sample within tolerance
+
+    def add_gt(self, stamps, positions, quaternions):
+        self.gt_stamps = np.concatenate((self.gt_stamps, stamps))
+        self.gt_positions = np.concatenate((self.gt_positions, positions))
+        self.gt_quaternions = np.concatenate((self.gt_quaternions, quaternions))
+        self._associate()
+
+    def add_pr(self, stamps, positions, quaternions):
+        self.pending = tuple(np.concatenate(pair) for pair in zip(self.pending, (stamps, positions, quaternions)))
+        self._associate()
+
+    def _associate(self, flush=False):
+        stamps, positions, quaternions = self.pending
+        if not len(stamps) or not len(self.gt_stamps):
+            return
+        # A pr sample is settled once gt has moved past it by more than the tolerance
+        settled = stamps + self.tolerance_ns < self.gt_stamps[-1] if not flush else np.ones(len(stamps), dtype=bool)
+        if not settled.any():
+            return
+        match = associate(stamps[settled], self.gt_stamps, self.tolerance_ns)
+        found = match >= 0
+        self.dropped += int((~found).sum())
+        self._update(stamps[settled][found], self.gt_positions[match[found]], self.gt_quaternions[match[found]],
+                     positions[settled][found], quaternions[settled][found])
+        self.pending = (stamps[~settled], positions[~settled], quaternions[~settled])
+
+        # gt older than anything that can still be matched is no longer needed
+        horizon = (self.pending[0].min() if len(self.pending[0]) else stamps.max()) - self.tolerance_ns
+        keep = max(np.searchsorted(self.gt_stamps, horizon, side='left') - 1, len(self.gt_stamps) - self.max_gt_buffer, 0)
+        self.gt_stamps = self.gt_stamps[keep:]
+        self.gt_positions = self.gt_positions[keep:]
+        self.gt_quaternions = self.gt_quaternions[keep:]
+
+    def _update(self, stamps, gt_positions, gt_quaternions, pr_positions, pr_quaternions):
+        if not len(stamps):
+            return
+        order = np.argsort(stamps, kind='stable')
+        stamps, gt_positions, pr_positions = stamps[order], gt_positions[order], pr_positions[order]
+        gt_quaternions, pr_quaternions = gt_quaternions[order], pr_quaternions[order]
+        if self.anchors is None:
+            self.anchors = (gt_positions[0], quat_normalize(gt_quaternions[0]),
+                            pr_positions[0], quat_normalize(pr_quaternions[0]))
+        gt_origin, gt_rotation, pr_origin, pr_rotation = self.anchors
+        # Both streams relative to their first pose, as in batch_evaluation's anchoring
+        gt_anchored = quat_rotate(quat_conjugate(gt_rotation), gt_positions - gt_origin)
+        pr_anchored = quat_rotate(quat_conjugate(pr_rotation), pr_positions - pr_origin)
+        self.anchored_sum += float(np.linalg.norm(gt_anchored - pr_anchored, axis=1).sum())
+        self.moments.add(pr_anchored, gt_anchored)
+        for stamp, source, target in zip(stamps, pr_anchored, gt_anchored):
+            self.window.push(stamp, source, target)
+
+    def flush(self):
+        """Associate every pending pr sample with what gt is there (at the end of a recording)."""
+        self._associate(flush=True)
+
+    def summary(self, with_scale=False):
+        """Current numbers as a flat dict (NaN until there are enough pairs)."""
+        result = {'n_pairs': self.moments.n, 'dropped': self.dropped, 'pending': len(self.pending[0]),
+                  'mean_error_anchored': self.anchored_sum / self.moments.n if self.moments.n else np.nan,
+                  'ate_rmse': np.nan, 'scale': np.nan, 'window_pairs': len(self.window),
+                  'window_ate_rmse': np.nan, 'window_drift': np.nan, 'window_drift_percent': np.nan}
+        if self.moments.n >= 3:
+            result['ate_rmse'], (_, _, result['scale']) = self.moments.rmse(with_scale)
+        if len(self.window) >= 3:
+            window_rmse, (rotation, _, scale) = self.window.moments.rmse(with_scale)
+            result['window_ate_rmse'] = window_rmse
+            # End-to-end displacement error across the window after its own alignment
+            first, last = self.window.oldest(), self.window.newest()
+            gt_delta = self.window.target[last] - self.window.target[first]
+            pr_delta = scale * rotation @ (self.window.source[last] - self.window.source[first])
+            result['window_drift'] = float(np.linalg.norm(gt_delta - pr_delta))
+            if self.window.path > 0:
+                result['window_drift_percent'] = float(100.0 * result['window_drift'] / self.window.path)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Live ATE of a gt/pr recording that is still being written.')
+    parser.add_argument('take', help=f'take directory with {GT_FILE} and {PR_FILE}')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='max gt/pr time gap in seconds')
+    parser.add_argument('--window', type=int, default=600, help='pairs in the sliding window')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between polls')
+    parser.add_argument('--sim3', action='store_true', help='align with scale')
+    parser.add_argument('--once', action='store_true', help='process what is there and exit')
+    args = parser.parse_args()
+
+    take = Path(args.take)
+    gt_tail, pr_tail = CsvTail(take / GT_FILE), CsvTail(take / PR_FILE)
+    evaluator = OnlineEvaluator(args.tolerance, args.window)
+    try:
+        while True:
+            evaluator.add_gt(*gt_tail.poll())
+            evaluator.add_pr(*pr_tail.poll())
+            if args.once:
+                evaluator.flush()
+            row = evaluator.summary(with_scale=args.sim3)
+            print(f"{row['n_pairs']} pairs | ATE {row['ate_rmse']:.3f} m | anchored {row['mean_error_anchored']:.3f} m | "
+                  f"window ({row['window_pairs']}) ATE {row['window_ate_rmse']:.3f} m, "
+                  f"drift {row['window_drift']:.3f} m ({row['window_drift_percent']:.2f} %)", flush=True)
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
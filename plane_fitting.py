@@ -0,0 +1,198 @@
+import argparse
+
+import numpy as np
+from scipy.spatial import ConvexHull, QhullError
+
+from coordinate_frames import frame_basis, unit_scale
+from marker_estimation import robust_marker_centres
+from motive_csv import read_motive_csv
+
+# Plane extraction from surveyed markers. Every marker of a Motive export is reduced to
+# one robust position, then planes (walls, floor) are peeled off one at a time with
+# RANSAC: each round scores a whole batch of three-point hypotheses against all points
+# in one matrix product, refines the winner with an SVD fit and removes its inliers.
+# Planes are n . x + d = 0 with unit normal n.
+
+
+def marker_cloud(path, markers=None, units='m'):
+    """(names, Nx3 robust marker positions in `units`) for the markers of a Motive export.
+
+    `markers` are names or glob patterns as in read_motive_csv; None takes every marker.
+    Markers that were never seen are dropped.
+    """
+    take = read_motive_csv(path, bodies=[], markers=markers)
+    names = list(take['markers'])
+    if not names:
+        return names, np.empty((0, 3))
+    block = np.stack([take['markers'][name] for name in names], axis=1)
+    centres = robust_marker_centres(block)['centre']
+    centres *= unit_scale(take['metadata'].get('Length Units', 'Meters'), units)
+    seen = np.isfinite(centres).all(axis=1)
+    return [name for name, keep in zip(names, seen) if keep], centres[seen]
+
+
+def fit_plane(points):
+    """Least-squares plane through Nx3 points: (normal, offset, rms distance)."""
+    points = np.asarray(points, dtype=np.float64)
+    centroid = points.mean(axis=0)
+    _, singular, vh = np.linalg.svd(points - centroid, full_matrices=False)
+    normal = vh[-1]
+    rms = singular[-1] / np.sqrt(len(points)) if len(singular) == 3 else 0.0
+    return normal, -normal @ centroid, float(rms)
+
+
+def plane_hypotheses(points, n_hypotheses, rng):
+    """(normals (H, 3), offsets (H,)) of planes through random point triples; degenerate triples dropped."""
+    triples = points[rng.integers(0, len(points), size=(n_hypotheses, 3))]
+    normals = np.cross(triples[:, 1] - triples[:, 0], triples[:, 2] - triples[:, 0])
+    length = np.linalg.norm(normals, axis=1)
+    scale = np.linalg.norm(triples[:, 1:] - triples[:, :1], axis=-1).max(axis=1)
+    # Collinear or repeated samples span (almost) no area relative to their size
+    usable = length > 1e-9 * np.maximum(scale, 1e-12) ** 2
+    normals = normals[usable] / length[usable, None]
+    return normals, -np.einsum('ij,ij->i', normals, triples[usable, 0])
+
+
+def score_hypotheses(points, normals, offsets, threshold, chunk_size=65536):
+    """Inlier count of every hypothesis, scored in chunks of points with one matrix product each."""
+    counts = np.zeros(len(normals), dtype=np.int64)
+    for start in range(0, len(points), chunk_size):
+        distance = np.abs(points[start:start + chunk_size] @ normals.T + offsets)
+        counts += np.count_nonzero(distance <= threshold, axis=0)
+    return counts
+
+
+def plane_polygon(points, normal, offset):
+    """Convex outline (K, 3) of points projected onto a plane, in counter-clockwise order about the normal."""
+    u = np.cross(normal, [1.0, 0.0, 0.0])
+    if np.linalg.norm(u) < 0.5:
+        u = np.cross(normal, [0.0, 1.0, 0.0])
+    u /= np.linalg.norm(u)
+    v = np.cross(normal, u)
+    projected = points - np.outer(points @ normal + offset, normal)
+    flat = np.column_stack((projected @ u, projected @ v))
+    try:
+        hull = ConvexHull(flat)
+    except QhullError:
+        # Collinear inliers: the outline degenerates to the extreme points along the line
+        along = flat @ (flat[-1] - flat[0]) if len(flat) > 1 else np.zeros(1)
+        return projected[[np.argmin(along), np.argmax(along)]], 0.0
+    return projected[hull.vertices], float(hull.volume)
+
+
+def plane_kinds(normals, up, tolerance_deg=20.0):
+    """'floor' for horizontal planes, 'wall' for vertical ones, otherwise 'other', for (H, 3) normals."""
+    cosine = np.abs(np.asarray(normals, dtype=np.float64).reshape(-1, 3) @ up)
+    return np.select([cosine >= np.cos(np.radians(tolerance_deg)), cosine <= np.sin(np.radians(tolerance_deg))],
+                     ['floor', 'wall'], 'other')
+
+
+def classify_plane(normal, up, tolerance_deg=20.0):
+    """plane_kinds for a single normal."""
+    return str(plane_kinds(normal, up, tolerance_deg)[0])
+
+
+def extract_planes(points, threshold=0.03, min_inliers=4, max_planes=10, n_hypotheses=512, refine_steps=2,
+                   up=(0.0, 1.0, 0.0), kinds=None, seed=0):
+    """Segment Nx3 points into planes with sequential batched RANSAC.
+
+    Returns a list of dicts with 'normal', 'offset', 'rms', 'inliers' (indices into
+    points), 'polygon' (K, 3), 'area' and 'kind' ('wall' / 'floor' / 'other' relative
+    to `up`), in the order they were found. Points on no plane are left out. `kinds` restricts the
+    orientations searched for, e.g. ('wall',) when marker rows at a common height would
+    otherwise win as horizontal planes.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    up = np.asarray(up, dtype=np.float64) / np.linalg.norm(up)
+    rng = np.random.default_rng(seed)
+    remaining = np.arange(len(points))
+    planes = []
+    while len(planes) < max_planes and len(remaining) >= max(min_inliers, 3):
+        candidates = points[remaining]
+        normals, offsets = plane_hypotheses(candidates, n_hypotheses, rng)
+        if kinds is not None:
+            allowed = np.isin(plane_kinds(normals, up), kinds)
+            normals, offsets = normals[allowed], offsets[allowed]
+        if not len(normals):
+            break
+        counts = score_hypotheses(candidates, normals, offsets, threshold)
+        best = np.argmax(counts)
+        if counts[best] < min_inliers:
+            break
+
+        sampled = (normals[best], offsets[best])
+        normal, offset = sampled
+        inliers = np.flatnonzero(np.abs(candidates @ normal + offset) <= threshold)
+        sampled_inliers = inliers
+        for _ in range(refine_steps):
+            normal, offset, _ = fit_plane(candidates[inliers])
+            refined = np.flatnonzero(np.abs(candidates @ normal + offset) <= threshold)
+            if len(refined) < 3 or np.array_equal(refined, inliers):
+                break
+            inliers = refined
+        normal, offset, rms = fit_plane(candidates[inliers])
+        if kinds is not None and classify_plane(normal, up) not in kinds:
+            # The refit tilted out of the requested orientation; keep the sampled plane instead
+            (normal, offset), inliers = sampled, sampled_inliers
+            rms = float(np.sqrt(np.mean((candidates[inliers] @ normal + offset) ** 2)))
+        # Point normals towards +up (floors) or away from the origin (walls) for a stable sign
+        reference = up if abs(normal @ up) > 0.5 else -candidates[inliers].mean(axis=0)
+        if normal @ reference < 0:
+            normal, offset = -normal, -offset
+        polygon, area = plane_polygon(candidates[inliers], normal, offset)
+        planes.append({
+            'normal': normal,
+            'offset': offset,
+            'rms': rms,
+            'inliers': remaining[inliers],
+            'polygon': polygon,
+            'area': area,
+            'kind': classify_plane(normal, up),
+        })
+        remaining = np.delete(remaining, inliers)
+    return planes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit wall and floor planes to the markers of a Motive export.')
+    parser.add_argument('path', nargs='?', default='wall_data_2.csv', help='Motive CSV export')
+    parser.add_argument('--markers', nargs='+', help='marker names or glob patterns (default: all)')
+    parser.add_argument('--threshold', type=float, default=0.03, help='inlier distance in metres')
+    parser.add_argument('--min-inliers', type=int, default=4, help='smallest plane accepted')
+    parser.add_argument('--max-planes', type=int, default=10, help='stop after this many planes')
+    parser.add_argument('--kinds', nargs='+', choices=['wall', 'floor', 'other'],
+                        help='only look for planes of these orientations (default: any)')
+    parser.add_argument('--frame', default='NUE', help='axis convention of the export, used to find "up"')
+    parser.add_argument('--show', action='store_true', help='open an Open3D window with the result')
+    args = parser.parse_args()
+
+    names, points = marker_cloud(args.path, markers=args.markers)
+    up = frame_basis(args.frame) @ np.array([0.0, 0.0, 1.0])
+    planes = extract_planes(points, threshold=args.threshold, min_inliers=args.min_inliers,
+                            max_planes=args.max_planes, up=up, kinds=args.kinds)
+    print(f"{len(planes)} planes from {len(points)} markers")
+    for index, plane in enumerate(planes):
+        print(f"  plane {index} ({plane['kind']}): normal {np.round(plane['normal'], 3)} offset {plane['offset']:.3f} "
+              f"{len(plane['inliers'])} markers, rms {plane['rms'] * 1000:.1f} mm, area {plane['area']:.2f} m^2")
+    unassigned = len(points) - sum(len(p['inliers']) for p in planes)
+    print(f"  {unassigned} markers on no plane")
+
+    if args.show:
+        from wall_scene import SceneBuilder
+
+        colors = np.full((len(points), 3), 0.5)
+        palette = np.random.default_rng(1).uniform(0.2, 1.0, size=(len(planes), 3))
+        scene = SceneBuilder()
+        for plane, color in zip(planes, palette):
+            colors[plane['inliers']] = color
+            polygon = plane['polygon']
+            if len(polygon) >= 3:
+                fan = np.column_stack((np.zeros(len(polygon) - 2), np.arange(1, len(polygon) - 1),
+                                       np.arange(2, len(polygon))))
+                scene.add_mesh(polygon, fan, color=0.5 + 0.5 * color)
+        scene.add_markers(points, colors, radius=0.02)
+        scene.show(window_name='Planes')
+
+
+if __name__ == '__main__':
+    main()
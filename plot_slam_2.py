@@ -9,6 +9,8 @@ from scipy.interpolate import CubicSpline
 import warnings
 
 from pathlib import Path
+from coordinate_frames import convert_poses
+from pose_transforms import POSITION_COLUMNS, QUATERNION_COLUMNS, pose_arrays
 
 
 data_path = Path("isaacVslam/take_1_new/take_1/")
@@ -19,7 +21,9 @@ pr_odometry = pd.read_csv(data_path/ "pr_odometry.csv")
 # Call R from Q, then load from 1st row
 
 ## modify pr to be in the drone coordinate frame 
-pr_odometry[["pos_y", "pos_z", "y", "z"]] = -1 * pr_odometry[["pos_y", "pos_z", "y", "z"]]
+pr_positions, pr_quaternions = convert_poses(*pose_arrays(pr_odometry), 'FLU', 'FRD')
+pr_odometry[POSITION_COLUMNS] = pr_positions
+pr_odometry[QUATERNION_COLUMNS] = pr_quaternions
 
 start_time = max(gt_odometry.iloc[0]["sec"],pr_odometry.iloc[0]["sec"])
 end_time = min(gt_odometry.iloc[-1]["sec"],pr_odometry.iloc[-1]["sec"])
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from pose_transforms import POSITION_COLUMNS, QUATERNION_COLUMNS, pose_arrays, quat_normalize
+from timestamp_association import NS_PER_UNIT, to_ns
+
+# Resampling of pose streams onto an arbitrary int64-nanosecond timeline: positions are
+# interpolated linearly and orientations with SLERP, all targets in one batched call.
+
+
+def uniform_timeline(start_ns, end_ns, rate_hz):
+    """Evenly spaced int64 stamps from start_ns to end_ns (inclusive) at rate_hz."""
+    step = NS_PER_UNIT['s'] / float(rate_hz)
+    count = int(np.floor((end_ns - start_ns) / step)) + 1
+    return start_ns + np.rint(np.arange(max(count, 0)) * step).astype(np.int64)
+
+
+def slerp(q0, q1, alpha):
+    """Spherical linear interpolation between row-wise quaternion pairs."""
+    q0 = quat_normalize(q0)
+    q1 = quat_normalize(q1)
+    alpha = np.asarray(alpha, dtype=np.float64)[..., None]
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    # Take the short way round
+    q1 = np.where(dot < 0, -q1, q1)
+    dot = np.abs(dot)
+
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    # Nearly parallel quaternions fall back to normalised lerp
+    close = sin_theta < 1e-6
+    safe = np.where(close, 1.0, sin_theta)
+    w0 = np.where(close, 1.0 - alpha, np.sin((1.0 - alpha) * theta) / safe)
+    w1 = np.where(close, alpha, np.sin(alpha * theta) / safe)
+    return quat_normalize(w0 * q0 + w1 * q1)
+
+
+def interpolation_weights(stamps_ns, target_ns):
+    """Bracketing sample index and blend factor for every target stamp.
+
+    Returns (index, alpha, inside) where the target lies between stamps[index] and
+    stamps[index + 1]; `inside` is False for targets outside the source time range.
+    """
+    stamps_ns = np.asarray(stamps_ns, dtype=np.int64)
+    target_ns = np.asarray(target_ns, dtype=np.int64)
+    if len(stamps_ns) < 2:
+        raise ValueError('Need at least two samples to interpolate')
+    index = np.clip(np.searchsorted(stamps_ns, target_ns, side='right') - 1, 0, len(stamps_ns) - 2)
+    span = (stamps_ns[index + 1] - stamps_ns[index]).astype(np.float64)
+    offset = (target_ns - stamps_ns[index]).astype(np.float64)
+    alpha = np.clip(np.divide(offset, span, out=np.zeros_like(offset), where=span > 0), 0.0, 1.0)
+    inside = (target_ns >= stamps_ns[0]) & (target_ns <= stamps_ns[-1])
+    return index, alpha, inside
+
+
+def resample_poses(stamps_ns, positions, quaternions, target_ns):
+    """Interpolate a pose stream at target_ns.
+
+    Returns (positions, quaternions, inside); targets outside the source range are
+    clamped to the end samples and flagged False in `inside`.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    quaternions = np.asarray(quaternions, dtype=np.float64)
+    index, alpha, inside = interpolation_weights(stamps_ns, target_ns)
+
+    new_positions = positions[index] + alpha[:, None] * (positions[index + 1] - positions[index])
+    new_quaternions = slerp(quaternions[index], quaternions[index + 1], alpha)
+    return new_positions, new_quaternions, inside
+
+
+def resample_odometry(df, target_ns, time_column='sec'):
+    """Resample an odometry DataFrame (sec/pos_x/.../w columns) onto target_ns.
+
+    The returned frame keeps the same column names, with `sec` in float seconds and
+    rows outside the source time range dropped.
+    """
+    df = df.sort_values(time_column)
+    stamps_ns = to_ns(df[time_column].to_numpy())
+    positions, quaternions = pose_arrays(df)
+    new_positions, new_quaternions, inside = resample_poses(stamps_ns, positions, quaternions, target_ns)
+    target_ns = np.asarray(target_ns, dtype=np.int64)[inside]
+
+    resampled = pd.DataFrame({time_column: target_ns / NS_PER_UNIT['s']})
+    resampled[POSITION_COLUMNS] = new_positions[inside]
+    resampled[QUATERNION_COLUMNS] = new_quaternions[inside]
+    return resampled
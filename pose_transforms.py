@@ -0,0 +1,111 @@
+import numpy as np
+
+# Batched pose maths on plain arrays. Positions are Nx3, quaternions are Nx4 in the
+# scipy (x, y, z, w) order used by the pr/gt odometry CSV columns.
+POSITION_COLUMNS = ['pos_x', 'pos_y', 'pos_z']
+QUATERNION_COLUMNS = ['x', 'y', 'z', 'w']
+
+
+def pose_arrays(df):
+    """Pull Nx3 positions and Nx4 (x, y, z, w) quaternions out of an odometry DataFrame."""
+    positions = df[POSITION_COLUMNS].to_numpy(dtype=np.float64)
+    quaternions = df[QUATERNION_COLUMNS].to_numpy(dtype=np.float64)
+    return positions, quaternions
+
+
+def quat_normalize(q):
+    """Scale quaternions to unit length."""
+    q = np.asarray(q, dtype=np.float64)
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def quat_conjugate(q):
+    """Inverse rotation of unit quaternions."""
+    q = np.asarray(q, dtype=np.float64)
+    return np.concatenate((-q[..., :3], q[..., 3:]), axis=-1)
+
+
+def quat_multiply(q1, q2):
+    """Hamilton product q1 * q2, broadcasting over leading dimensions."""
+    q1 = np.asarray(q1, dtype=np.float64)
+    q2 = np.asarray(q2, dtype=np.float64)
+    x1, y1, z1, w1 = np.moveaxis(q1, -1, 0)
+    x2, y2, z2, w2 = np.moveaxis(q2, -1, 0)
+    return np.stack((
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+    ), axis=-1)
+
+
+def quat_rotate(q, v):
+    """Rotate vectors v by unit quaternions q, broadcasting over leading dimensions."""
+    q = np.asarray(q, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    u = q[..., :3]
+    w = q[..., 3:]
+    uv = np.cross(u, v)
+    return v + 2.0 * (w * uv + np.cross(u, uv))
+
+
+def quat_to_matrix(q):
+    """Stack of 3x3 rotation matrices from (x, y, z, w) quaternions."""
+    x, y, z, w = np.moveaxis(quat_normalize(q), -1, 0)
+    return np.stack((
+        np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)), axis=-1),
+        np.stack((2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)), axis=-1),
+        np.stack((2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)), axis=-1),
+    ), axis=-2)
+
+
+def poses_to_matrices(positions, quaternions):
+    """Stack of 4x4 homogeneous transforms, only needed for export/plotting."""
+    positions = np.asarray(positions, dtype=np.float64)
+    T = np.zeros(positions.shape[:-1] + (4, 4))
+    T[..., :3, :3] = quat_to_matrix(quaternions)
+    T[..., :3, 3] = positions
+    T[..., 3, 3] = 1.0
+    return T
+
+
+def transform_poses(positions, quaternions, rotation, translation):
+    """Apply one rigid transform (3x3 rotation, translation) to every pose: T @ Tn."""
+    positions = np.asarray(positions, dtype=np.float64)
+    rotation = np.asarray(rotation, dtype=np.float64)
+    new_positions = np.einsum('ij,nj->ni', rotation, positions) + translation
+    new_quaternions = quat_multiply(matrix_to_quat(rotation), quat_normalize(quaternions))
+    return new_positions, new_quaternions
+
+
+def matrix_to_quat(rotation):
+    """(x, y, z, w) quaternion of a single 3x3 rotation matrix."""
+    m = np.asarray(rotation, dtype=np.float64)
+    trace = np.trace(m)
+    # Pick the numerically stable branch for the largest component
+    if trace > 0:
+        s = 2.0 * np.sqrt(trace + 1.0)
+        q = [(m[2, 1] - m[1, 2]) / s, (m[0, 2] - m[2, 0]) / s, (m[1, 0] - m[0, 1]) / s, 0.25 * s]
+    elif m[0, 0] > m[1, 1] and m[0, 0] > m[2, 2]:
+        s = 2.0 * np.sqrt(1.0 + m[0, 0] - m[1, 1] - m[2, 2])
+        q = [0.25 * s, (m[0, 1] + m[1, 0]) / s, (m[0, 2] + m[2, 0]) / s, (m[2, 1] - m[1, 2]) / s]
+    elif m[1, 1] > m[2, 2]:
+        s = 2.0 * np.sqrt(1.0 + m[1, 1] - m[0, 0] - m[2, 2])
+        q = [(m[0, 1] + m[1, 0]) / s, 0.25 * s, (m[1, 2] + m[2, 1]) / s, (m[0, 2] - m[2, 0]) / s]
+    else:
+        s = 2.0 * np.sqrt(1.0 + m[2, 2] - m[0, 0] - m[1, 1])
+        q = [(m[0, 2] + m[2, 0]) / s, (m[1, 2] + m[2, 1]) / s, 0.25 * s, (m[1, 0] - m[0, 1]) / s]
+    return quat_normalize(np.array(q))
+
+
+def reanchor_poses(positions, quaternions, anchor=0):
+    """Express every pose relative to pose `anchor`: T_anchor^-1 @ Tn for the whole trajectory.
+
+    Returns new (N, 3) positions and (N, 4) quaternions; the anchor pose becomes identity.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    quaternions = quat_normalize(quaternions)
+    q0_inv = quat_conjugate(quaternions[anchor])
+    new_positions = quat_rotate(q0_inv, positions - positions[anchor])
+    new_quaternions = quat_multiply(q0_inv, quaternions)
+    return new_positions, new_quaternions
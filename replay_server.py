@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from batch_evaluation import GT_FILE, PR_FILE
+from coordinate_frames import unit_scale
+from live_ingestion import RECORD, STREAMS, encode_records, end_record
+from motive_csv import body_quaternions, read_motive_csv
+from pose_transforms import pose_arrays
+from timestamp_association import NS_PER_UNIT, read_csv_stamps_ns, to_ns
+
+# Stand-in for the motion-capture rig and the VSLAM node: streams recorded poses to
+# live_ingestion.py at 1x-100x real time (or as fast as the socket takes them). The
+# streams of a take (or any odometry CSV / Motive export) are merged into one array of
+# RECORDs in time order and sent on a schedule of start + (stamp - first stamp) / speed;
+# whatever is due when the loop wakes up goes out in one datagram (or TCP write) of up to
+# `batch` records, so high speeds cost bigger packets rather than more of them.
+
+
+def load_stream(path, body=None, units='m'):
+    """(stamps_ns, positions in `units`, quaternions) of an odometry CSV or a Motive export, in time order.
+
+    Motive exports are recognised by their header; `body` picks the rigid body (the first
+    one by default) and its times are relative to the start of the take.
+    """
+    with open(path) as f:
+        motive = f.readline().startswith('Format Version')
+    if motive:
+        take = read_motive_csv(path, bodies=[body] if body else None)
+        name = body or next(iter(take['bodies']))
+        stamps = to_ns(take['time'])
+        positions = take['bodies'][name]['position'] * unit_scale(take['metadata'].get('Length Units', 'm'), units)
+        quaternions = body_quaternions(take, name)
+        tracked = np.isfinite(positions).all(axis=1) & np.isfinite(quaternions).all(axis=1)
+        stamps, positions, quaternions = stamps[tracked], positions[tracked], quaternions[tracked]
+    else:
+        stamps = read_csv_stamps_ns(path)
+        positions, quaternions = pose_arrays(pd.read_csv(path))
+    order = np.argsort(stamps, kind='stable')
+    return stamps[order], positions[order], quaternions[order]
+
+
+def merge_streams(streams, relative=False):
+    """RECORD array of {stream id: (stamps_ns, positions, quaternions)} in time order.
+
+    With `relative` every stream starts at 0, for recordings made on different clocks.
+    """
+    records = []
+    for stream_id, (stamps, positions, quaternions) in streams.items():
+        if relative and len(stamps):
+            stamps = stamps - stamps[0]
+        records.append(encode_records(stream_id, stamps, positions, quaternions, np.arange(len(stamps))))
+    records = np.concatenate(records) if records else np.zeros(0, dtype=RECORD)
+    return records[np.argsort(records['stamp_ns'], kind='stable')]
+
+
+async def replay(records, send, speed=1.0, batch=512):
+    """Hand `records` to `send` (a coroutine taking a RECORD array) on the recording's schedule.
+
+    speed is the multiple of real time; 0 sends as fast as `send` allows. Returns the
+    wall time the replay took in seconds.
+    """
+    if not len(records):
+        return 0.0
+    offsets = records['stamp_ns'] - records['stamp_ns'][0]
+    start = time.perf_counter()
+    sent = 0
+    while sent < len(records):
+        if speed > 0:
+            elapsed_ns = int((time.perf_counter() - start) * speed * NS_PER_UNIT['s'])
+            due = int(np.searchsorted(offsets, elapsed_ns, side='right'))
+            if due == sent:
+                await asyncio.sleep((offsets[sent] - elapsed_ns) / speed / NS_PER_UNIT['s'])
+                continue
+        else:
+            due = len(records)
+        for first in range(sent, due, batch):
+            chunk = records[first:min(first + batch, due)]
+            chunk['sent_ns'] = time.time_ns()
+            await send(chunk)
+        sent = due
+    return time.perf_counter() - start
+
+
+async def udp_sender(host, port):
+    """(send coroutine, close function) for datagrams to host:port."""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+
+    async def send(records):
+        transport.sendto(records.tobytes())
+        await asyncio.sleep(0)  # let the loop flush before the next batch
+
+    return send, transport.close
+
+
+async def tcp_sender(host, port):
+    """(send coroutine, close function) for a TCP connection to host:port."""
+    _, writer = await asyncio.open_connection(host, port)
+
+    async def send(records):
+        writer.write(records.tobytes())
+        await writer.drain()
+
+    return send, writer.close
+
+
+async def run(records, host='127.0.0.1', port=9870, transport='udp', speed=1.0, batch=512, end=True):
+    send, close = await (udp_sender if transport == 'udp' else tcp_sender)(host, port)
+    try:
+        duration = await replay(records, send, speed, batch)
+        if end:
+            await send(end_record())
+    finally:
+        close()
+    return duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded pose streams to live_ingestion.py in (scaled) real time.')
+    parser.add_argument('take', nargs='?', help=f'take directory with {GT_FILE} and {PR_FILE}')
+    parser.add_argument('--stream', action='append', default=[], metavar='NAME=PATH',
+                        help=f"extra or replacement stream ({'/'.join(STREAMS)}) from an odometry CSV or Motive export")
+    parser.add_argument('--body', help='rigid body to send from Motive exports (default: the first one)')
+    parser.add_argument('--relative', action='store_true', help='start every stream at time 0 (recordings on different clocks)')
+    parser.add_argument('--speed', type=float, default=1.0, help='multiple of real time, 1-100 (0: as fast as possible)')
+    parser.add_argument('--batch', type=int, default=512, help='max records per datagram / write')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9870)
+    parser.add_argument('--transport', choices=['udp', 'tcp'], default='udp')
+    parser.add_argument('--no-end', action='store_true', help="don't send the end-of-stream record")
+    args = parser.parse_args()
+
+    paths = {}
+    if args.take:
+        paths = {'gt': Path(args.take) / GT_FILE, 'pr': Path(args.take) / PR_FILE}
+    for item in args.stream:
+        name, _, path = item.partition('=')
+        if name not in STREAMS or not path:
+            parser.error(f"--stream takes NAME=PATH with NAME one of {', '.join(STREAMS)}")
+        paths[name] = Path(path)
+    if not paths:
+        parser.error('give a take directory or at least one --stream')
+
+    streams = {STREAMS.index(name): load_stream(path, args.body) for name, path in paths.items()}
+    records = merge_streams(streams, args.relative)
+    span = (records['stamp_ns'][-1] - records['stamp_ns'][0]) / NS_PER_UNIT['s'] if len(records) else 0.0
+    print(f"Replaying {len(records)} poses ({span:.1f} s) to {args.transport}://{args.host}:{args.port} "
+          f"at {args.speed:g}x", flush=True)
+    duration = asyncio.run(run(records, args.host, args.port, args.transport, args.speed, args.batch, not args.no_end))
+    print(f"Sent {len(records)} poses in {duration:.2f} s ({len(records) / max(duration, 1e-9):.0f} poses/s)")
+
+
+if __name__ == '__main__':
+    main()
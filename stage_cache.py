@@ -0,0 +1,155 @@
+import hashlib
+import inspect
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+# On-disk memoization of pipeline stages (load -> align -> anchor -> metrics). A stage is
+# declared with its function, its inputs (files, or the outputs of earlier stages) and its
+# parameters; its key is a sha256 of the stage name, version and function source, the
+# parameters, the content hash of every input file and the keys of upstream stages. Keys
+# are known before anything runs, so when a downstream stage is cached its inputs are
+# never loaded or computed at all. Outputs are dicts of arrays stored as <key>.npz; a hit
+# refreshes the file's mtime and the least recently used files are deleted once the cache
+# grows past max_bytes.
+CACHE_DIR = '.stage_cache'
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+def file_digest(path, block_size=1 << 20):
+    """sha256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def function_digest(function):
+    """Hash of a function's source, so editing a stage invalidates its entries (helpers it calls are not covered)."""
+    try:
+        source = inspect.getsource(function)
+    except (OSError, TypeError):
+        source = getattr(function, '__qualname__', repr(function))
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+class StageOutput:
+    """Lazy result of a stage: `key` is known up front, `arrays` loads or computes on first access."""
+
+    def __init__(self, cache, name, function, inputs, params, key):
+        self.cache = cache
+        self.name = name
+        self.function = function
+        self.inputs = inputs
+        self.params = params
+        self.key = key
+        self.seconds = 0.0  # time spent loading or computing this stage
+        self.hit = None     # True when served from disk, False when computed
+        self._arrays = None
+
+    @property
+    def arrays(self):
+        if self._arrays is None:
+            started = time.perf_counter()
+            self._arrays = self.cache.load(self.key)
+            self.hit = self._arrays is not None
+            if not self.hit:
+                args = [item.arrays if isinstance(item, StageOutput) else item for item in self.inputs]
+                # Upstream time is accounted to the upstream stages
+                started += sum(item.seconds for item in self.inputs if isinstance(item, StageOutput))
+                self._arrays = {name: np.asarray(value) for name, value in self.function(*args, **self.params).items()}
+                self.cache.store(self.key, self._arrays)
+            self.seconds = time.perf_counter() - started
+        return self._arrays
+
+
+class StageCache:
+    """Directory of stage outputs with size-bounded LRU eviction; safe to share between processes."""
+
+    def __init__(self, root=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._file_digests = {}  # (path, size, mtime_ns) -> sha256, per process
+
+    def __getstate__(self):
+        return {'root': self.root, 'max_bytes': self.max_bytes, '_file_digests': {}}
+
+    def _input_key(self, item):
+        if isinstance(item, StageOutput):
+            return ['stage', item.key]
+        path = Path(item)
+        stat = path.stat()
+        memo = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+        if memo not in self._file_digests:
+            self._file_digests[memo] = file_digest(path)
+        return ['file', self._file_digests[memo]]
+
+    def stage(self, name, function, inputs=(), params=None, version=1):
+        """Declare a stage; function(*inputs, **params) must return a dict of arrays.
+
+        Inputs that are StageOutputs are passed to the function as their arrays, anything
+        else as given (file paths, hashed by content).
+        """
+        params = dict(params or {})
+        description = {
+            'stage': name,
+            'version': version,
+            'function': function_digest(function),
+            'params': params,
+            'inputs': [self._input_key(item) for item in inputs],
+        }
+        key = hashlib.sha256(json.dumps(description, sort_keys=True, default=repr).encode()).hexdigest()
+        return StageOutput(self, name, function, list(inputs), params, key)
+
+    def _path(self, key):
+        return self.root / f'{key}.npz'
+
+    def load(self, key):
+        """Arrays stored under key (marking them as recently used), or None."""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)
+        except (OSError, ValueError):  # missing, evicted meanwhile, or a torn file
+            return None
+        return arrays
+
+    def store(self, key, arrays):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        temporary = path.with_name(f'{key}.{os.getpid()}.tmp.npz')
+        np.savez(temporary, **arrays)
+        os.replace(temporary, path)
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """Delete the least recently used entries until the cache fits in max_bytes; returns bytes freed."""
+        entries = []
+        for path in self.root.glob('*.npz'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total - freed <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+                freed += size
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def clear(self):
+        for path in self.root.glob('*.npz'):
+            path.unlink(missing_ok=True)
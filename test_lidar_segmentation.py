@@ -0,0 +1,74 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from lidar_segmentation import segment_ragged, segment_scans
+
+# Parity of the NumPy segmentation with lidar_process2 in lidar.cpp, run through the
+# shared library of lidar_binding.py (built on first use, so a C++ compiler is needed).
+lidar_binding = pytest.importorskip('lidar_binding')
+
+SETTINGS = [
+    (segments, vertical_limit, norm)
+    for segments in (8, 36, 72, 73, 360)
+    for vertical_limit in (0.25, 1.0, 10.0)
+    for norm in (True, False)
+]
+
+
+@pytest.fixture(scope='module')
+def library():
+    if not lidar_binding.LIBRARY.exists() and shutil.which('g++') is None:
+        pytest.skip('no g++ to build %s' % lidar_binding.LIBRARY.name)
+    return lidar_binding.load_library()
+
+
+def random_scans(n_scans=20, n_points=500, seed=0):
+    rng = np.random.default_rng(seed)
+    scans = rng.uniform(-8.0, 8.0, size=(n_scans, n_points, 3)).astype(np.float32)
+    scans[..., 2] = rng.normal(0.0, 1.0, size=(n_scans, n_points))
+    return scans
+
+
+def grid_scan(step=0.5, extent=5.0):
+    """Points on an integer-multiple grid, including exact diagonals (x == +-y) and the axes."""
+    values = np.arange(-extent, extent + step, step, dtype=np.float32)
+    x, y = np.meshgrid(values, values)
+    return np.column_stack((x.ravel(), y.ravel(), np.zeros(x.size, dtype=np.float32)))
+
+
+def axis_scan():
+    """Points on the x and y axes in both directions, at several distances."""
+    distances = np.array([0.5, 1.0, 2.5, 7.0], dtype=np.float32)
+    zeros = np.zeros_like(distances)
+    points = [np.column_stack(axes) for axes in ((distances, zeros, zeros), (-distances, zeros, zeros),
+                                                 (zeros, distances, zeros), (zeros, -distances, zeros))]
+    # Repeat each point four times so every one survives the every-4th-point decimation
+    return np.repeat(np.concatenate(points), 4, axis=0)
+
+
+@pytest.mark.parametrize('segments, vertical_limit, norm', SETTINGS)
+def test_segment_scans_matches_cpp(library, segments, vertical_limit, norm):
+    scans = random_scans()
+    expected = lidar_binding.lidar_process(scans, vertical_limit, segments, 6.0, norm, library=library)
+    np.testing.assert_array_equal(segment_scans(scans, vertical_limit, segments, 6.0, norm), expected)
+
+
+@pytest.mark.parametrize('segments, vertical_limit, norm', SETTINGS)
+def test_single_scan_matches_cpp(library, segments, vertical_limit, norm):
+    for scan in (grid_scan(), axis_scan(), random_scans(1, 97, seed=1)[0]):
+        expected = lidar_binding.lidar_process(scan, vertical_limit, segments, 6.0, norm, library=library)
+        np.testing.assert_array_equal(segment_scans(scan, vertical_limit, segments, 6.0, norm), expected)
+
+
+@pytest.mark.parametrize('segments, vertical_limit, norm', SETTINGS)
+def test_segment_ragged_matches_cpp(library, segments, vertical_limit, norm):
+    rng = np.random.default_rng(2)
+    parts = [random_scans(1, n, seed=int(n))[0] for n in rng.integers(0, 300, size=12)]
+    parts += [grid_scan(), axis_scan()]
+    points = np.concatenate(parts)
+    lengths = np.array([len(part) for part in parts])
+    expected = lidar_binding.lidar_process_ragged(points, lengths, vertical_limit, segments, 6.0, norm,
+                                                  library=library)
+    np.testing.assert_array_equal(segment_ragged(points, lengths, vertical_limit, segments, 6.0, norm), expected)
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# Timestamp association on int64 nanoseconds. Epoch seconds around 1.7e9 only keep
+# ~0.2 us of precision as float64, so stamps are converted once and matched with
+# binary search instead of pandas datetime reindexing.
+NS_PER_UNIT = {'s': 1_000_000_000, 'ms': 1_000_000, 'us': 1_000, 'ns': 1}
+
+
+def to_ns(values, unit='s'):
+    """Convert numeric timestamps in `unit` to int64 nanoseconds."""
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu':
+        return values.astype(np.int64) * NS_PER_UNIT[unit]
+    # Split off whole units first so the fractional part keeps full precision
+    whole = np.floor(values)
+    fraction = np.rint((values - whole) * NS_PER_UNIT[unit]).astype(np.int64)
+    return whole.astype(np.int64) * NS_PER_UNIT[unit] + fraction
+
+
+def decimal_seconds_to_ns(text):
+    """Exact int64 nanoseconds from decimal second strings such as '1723185751.5859158'."""
+    text = np.asarray(text, dtype=str)
+    if np.any(np.char.find(text, 'e') >= 0) or np.any(np.char.find(text, 'E') >= 0):
+        return to_ns(text.astype(np.float64))
+    parts = np.char.partition(text, '.')
+    whole = parts[..., 0]
+    negative = np.char.startswith(whole, '-')
+    # Pad/truncate the decimals to exactly nine digits
+    fraction_ns = np.char.ljust(parts[..., 2], 9, '0').astype('U9').astype(np.int64)
+    whole_ns = whole.astype(np.int64) * NS_PER_UNIT['s']
+    return np.where(negative, whole_ns - fraction_ns, whole_ns + fraction_ns)
+
+
+def read_csv_stamps_ns(path, column='sec'):
+    """Read a CSV time column as text and convert it to exact int64 nanoseconds."""
+    text = pd.read_csv(path, usecols=[column], dtype={column: str})[column].to_numpy(dtype=str)
+    return decimal_seconds_to_ns(text)
+
+
+def associate(reference_ns, stream_ns, tolerance_ns):
+    """Index of the nearest `stream_ns` sample for every reference stamp, -1 if none within tolerance.
+
+    Stamps do not need to be sorted or unique; ties resolve to the earliest sample.
+    """
+    reference_ns = np.asarray(reference_ns, dtype=np.int64)
+    stream_ns = np.asarray(stream_ns, dtype=np.int64)
+    if not len(stream_ns):
+        return np.full(len(reference_ns), -1, dtype=np.int64)
+
+    order = None
+    if np.any(stream_ns[1:] < stream_ns[:-1]):
+        order = np.argsort(stream_ns, kind='stable')
+        stream_ns = stream_ns[order]
+
+    right = np.searchsorted(stream_ns, reference_ns, side='left')
+    right_clipped = np.minimum(right, len(stream_ns) - 1)
+    left = np.maximum(right - 1, 0)
+    # For duplicated stamps searchsorted already lands on the first copy
+    left = np.searchsorted(stream_ns, stream_ns[left], side='left')
+
+    left_gap = np.abs(reference_ns - stream_ns[left])
+    right_gap = np.abs(stream_ns[right_clipped] - reference_ns)
+    use_right = right_gap < left_gap
+    nearest = np.where(use_right, right_clipped, left)
+    gap = np.where(use_right, right_gap, left_gap)
+
+    if order is not None:
+        nearest = order[nearest]
+    return np.where(gap <= tolerance_ns, nearest, -1).astype(np.int64)
+
+
+def associate_streams(reference_ns, streams, tolerance_ns, require_all=True):
+    """Match several streams onto a reference timeline.
+
+    `streams` maps a name (e.g. 'gt', 'pr', 'vehicle', 'slam') to its int64 stamps.
+    Returns (reference_index, {name: stream_index}); with `require_all` only reference
+    samples matched in every stream are kept, otherwise unmatched entries are -1.
+    """
+    reference_ns = np.asarray(reference_ns, dtype=np.int64)
+    matches = {name: associate(reference_ns, stamps, tolerance_ns) for name, stamps in streams.items()}
+    reference_index = np.arange(len(reference_ns))
+    if require_all and matches:
+        keep = np.logical_and.reduce([index >= 0 for index in matches.values()])
+        reference_index = reference_index[keep]
+        matches = {name: index[keep] for name, index in matches.items()}
+    return reference_index, matches
+
+
+def overlap_window(*stamps):
+    """[start, end] of the time range covered by every stream."""
+    start = max(int(np.min(s)) for s in stamps)
+    end = min(int(np.max(s)) for s in stamps)
+    return start, end
@@ -0,0 +1,294 @@
+import argparse
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from data_preparation import DEPTH_SUFFIX, is_depth_frame
+from detection_files import IMAGE_SUFFIXES, VIDEO_SUFFIXES, write_detections
+
+# Batch person detection with the ONNX export of the YOLOv8 model (see evaulation_script.py)
+# on CPU. Images or video frames are decoded and letterboxed by a thread pool (OpenCV
+# releases the GIL) while the network runs; a bounded queue of pending frames keeps the
+# decoders ahead of inference without reading a whole session into memory. Frames are
+# grouped into fixed-size batches and the detections of the whole run are written as
+# one .npz of columns (see detection_files.py). Depth frames (<name>_d.png) recorded next
+# to the colour frames are skipped unless asked for; a data_preparation.py split keeps
+# them under depth/<split> instead.
+PAD_VALUE = 114  # grey border used by ultralytics' letterbox
+
+
+def find_sources(path, pattern='*', include_depth=False):
+    """Sorted image and video files under `path` (or `path` itself when it is a file), without depth frames."""
+    path = Path(path)
+    if path.is_file():
+        return [path]
+    suffixes = IMAGE_SUFFIXES | VIDEO_SUFFIXES
+    return sorted(p for p in path.rglob(pattern) if p.is_file() and p.suffix.lower() in suffixes
+                  and (include_depth or p.suffix.lower() not in IMAGE_SUFFIXES or not is_depth_frame(p)))
+
+
+def letterbox(image, size):
+    """Resize keeping the aspect ratio and pad to size x size; returns (CHW RGB uint8, scale, (pad_x, pad_y))."""
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_width, new_height = round(width * scale), round(height * scale)
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (size - new_width) / 2, (size - new_height) / 2
+    left, top = round(pad_x - 0.1), round(pad_y - 0.1)
+    image = cv2.copyMakeBorder(image, top, size - new_height - top, left, size - new_width - left,
+                               cv2.BORDER_CONSTANT, value=(PAD_VALUE, PAD_VALUE, PAD_VALUE))
+    return np.ascontiguousarray(image[:, :, ::-1].transpose(2, 0, 1)), scale, (left, top)
+
+
+def _prepare(image, size):
+    """Letterboxed frame plus what is needed to map boxes back onto the original image."""
+    if image is None:
+        return None
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    tensor, scale, pad = letterbox(image, size)
+    return tensor, scale, pad, image.shape[:2]
+
+
+def _load(path, size):
+    return _prepare(cv2.imread(str(path), cv2.IMREAD_COLOR), size)
+
+
+def _produce(sources, size, pool, pending, stop):
+    """Submit decode jobs in order and queue (source, frame, future); None marks the end."""
+    def put(item):
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    try:
+        for source_index, path in enumerate(sources):
+            if path.suffix.lower() in IMAGE_SUFFIXES:
+                if not put((source_index, 0, pool.submit(_load, path, size))):
+                    return
+                continue
+            # Video frames have to be read in order; only the letterboxing goes to the pool
+            capture = cv2.VideoCapture(str(path))
+            frame_index = 0
+            try:
+                while True:
+                    ok, frame = capture.read()
+                    if not ok:
+                        break
+                    if not put((source_index, frame_index, pool.submit(_prepare, frame, size))):
+                        return
+                    frame_index += 1
+            finally:
+                capture.release()
+    except Exception as error:
+        put(error)
+    put(None)
+
+
+def iter_frames(sources, size, workers=4, prefetch=64):
+    """Yield (source index, frame index, (CHW tensor, scale, pad, (h, w))) in order, decoded in the background.
+
+    At most `prefetch` frames are decoded ahead of the consumer. Unreadable images are skipped.
+    """
+    pending = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        producer = threading.Thread(target=_produce, args=(sources, size, pool, pending, stop), daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                source_index, frame_index, future = item
+                prepared = future.result()
+                if prepared is None:
+                    print(f"Skipping unreadable {sources[source_index]}")
+                    continue
+                yield source_index, frame_index, prepared
+        finally:
+            stop.set()
+            producer.join()
+
+
+def box_iou(a, b):
+    """IoU matrix (N, M) between xyxy boxes a (N, 4) and b (M, 4)."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    lower = np.maximum(a[:, None, :2], b[None, :, :2])
+    upper = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.prod(np.clip(upper - lower, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+
+def non_max_suppression(boxes, scores, classes, iou_threshold=0.45):
+    """Indices of the boxes kept by greedy per-class NMS, highest score first."""
+    if not len(boxes):
+        return np.empty(0, dtype=np.int64)
+    # Shift each class to its own region so a single pass never suppresses across classes
+    offset = boxes + (classes.astype(np.float32) * (boxes.max() + 1))[:, None]
+    order = np.argsort(-scores, kind='stable')
+    overlap = box_iou(offset[order], offset[order]) > iou_threshold
+    suppressed = np.zeros(len(order), dtype=bool)
+    keep = []
+    for rank in range(len(order)):
+        if suppressed[rank]:
+            continue
+        keep.append(order[rank])
+        suppressed |= overlap[rank]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_predictions(output, conf_threshold=0.25, iou_threshold=0.45, max_candidates=3000, max_detections=300):
+    """Per-image (boxes xyxy, scores, classes) from a YOLOv8 output of shape (B, 4 + classes, anchors).
+
+    Boxes are in letterboxed input pixels.
+    """
+    output = np.asarray(output, dtype=np.float32).transpose(0, 2, 1)
+    class_scores = output[:, :, 4:]
+    classes = class_scores.argmax(axis=2)
+    scores = np.take_along_axis(class_scores, classes[:, :, None], axis=2)[:, :, 0]
+    detections = []
+    for image_index in range(len(output)):
+        candidates = np.flatnonzero(scores[image_index] > conf_threshold)
+        if len(candidates) > max_candidates:
+            candidates = candidates[np.argsort(-scores[image_index, candidates])[:max_candidates]]
+        centre_size = output[image_index, candidates, :4]
+        boxes = np.concatenate((centre_size[:, :2] - centre_size[:, 2:] / 2,
+                                centre_size[:, :2] + centre_size[:, 2:] / 2), axis=1)
+        keep = non_max_suppression(boxes, scores[image_index, candidates], classes[image_index, candidates],
+                                   iou_threshold)[:max_detections]
+        detections.append((boxes[keep], scores[image_index, candidates[keep]],
+                           classes[image_index, candidates[keep]]))
+    return detections
+
+
+def create_session(model_path, threads=0):
+    """CPU onnxruntime session with all graph optimizations; threads=0 lets onnxruntime decide."""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = threads
+    return ort.InferenceSession(str(model_path), sess_options=options, providers=['CPUExecutionProvider'])
+
+
+def model_input(session, batch_size, image_size):
+    """(input name, batch size, image size) honouring the static dimensions of the exported model."""
+    model_input = session.get_inputs()[0]
+    batch_dim, _, height, _ = model_input.shape
+    if isinstance(batch_dim, int) and batch_dim != batch_size:
+        print(f"Model was exported with a fixed batch of {batch_dim}; using it instead of {batch_size} "
+              f"(export with dynamic=True or batch={batch_size} to change it)")
+        batch_size = batch_dim
+    if isinstance(height, int):
+        image_size = height
+    return model_input.name, batch_size, image_size
+
+
+def run_inference(session, sources, batch_size=8, image_size=640, conf_threshold=0.25, iou_threshold=0.45,
+                  workers=4, prefetch=64, log_every=500):
+    """Detect on every frame of `sources`; returns the column dict that write_detections stores."""
+    input_name, batch_size, image_size = model_input(session, batch_size, image_size)
+    batch = np.zeros((batch_size, 3, image_size, image_size), dtype=np.float32)
+    frames = {'source': [], 'frame': [], 'height': [], 'width': []}
+    columns = {'frame_id': [], 'box': [], 'score': [], 'class_id': []}
+    geometry = []  # (scale, pad) of each frame in the current batch
+    start = time.perf_counter()
+    next_log = log_every
+
+    def flush():
+        # The tail batch keeps its stale entries past `filled`; their outputs are dropped
+        filled = len(geometry)
+        output = session.run(None, {input_name: batch})[0]
+        first = len(frames['source']) - filled
+        for offset, (boxes, scores, classes) in enumerate(decode_predictions(output[:filled], conf_threshold,
+                                                                             iou_threshold)):
+            scale, (pad_x, pad_y) = geometry[offset]
+            frame_id = first + offset
+            height, width = frames['height'][frame_id], frames['width'][frame_id]
+            boxes = (boxes - np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)) / scale
+            boxes = np.clip(boxes, 0, np.array([width, height, width, height], dtype=np.float32))
+            columns['frame_id'].append(np.full(len(boxes), frame_id, dtype=np.int32))
+            columns['box'].append(boxes.astype(np.float32))
+            columns['score'].append(scores.astype(np.float32))
+            columns['class_id'].append(classes.astype(np.int16))
+        geometry.clear()
+
+    for source_index, frame_index, (tensor, scale, pad, (height, width)) in iter_frames(sources, image_size, workers,
+                                                                                           prefetch):
+        np.multiply(tensor, np.float32(1 / 255), out=batch[len(geometry)])
+        geometry.append((scale, pad))
+        frames['source'].append(source_index)
+        frames['frame'].append(frame_index)
+        frames['height'].append(height)
+        frames['width'].append(width)
+        if len(geometry) == batch_size:
+            flush()
+            n_frames = len(frames['source'])
+            if log_every and n_frames >= next_log:
+                print(f"{n_frames} frames, {n_frames / (time.perf_counter() - start):.1f} fps")
+                next_log += log_every
+    if geometry:
+        flush()
+
+    elapsed = time.perf_counter() - start
+    n_frames = len(frames['source'])
+    print(f"{n_frames} frames in {elapsed:.1f} s ({n_frames / max(elapsed, 1e-9):.1f} fps)")
+    result = {
+        'sources': np.array([str(path) for path in sources]),
+        'source': np.array(frames['source'], dtype=np.int32),
+        'frame': np.array(frames['frame'], dtype=np.int32),
+        'height': np.array(frames['height'], dtype=np.int32),
+        'width': np.array(frames['width'], dtype=np.int32),
+    }
+    result['frame_id'] = np.concatenate(columns['frame_id']) if columns['frame_id'] else np.empty(0, np.int32)
+    result['box'] = np.concatenate(columns['box']) if columns['box'] else np.empty((0, 4), np.float32)
+    result['score'] = np.concatenate(columns['score']) if columns['score'] else np.empty(0, np.float32)
+    result['class_id'] = np.concatenate(columns['class_id']) if columns['class_id'] else np.empty(0, np.int16)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the exported ONNX detector over a directory of images or videos.')
+    parser.add_argument('source', help='image/video file or a directory searched recursively')
+    parser.add_argument('--model', default='yolov8n.onnx', help='ONNX export of the detector')
+    parser.add_argument('--output', default='detections.npz', help='columnar output file')
+    parser.add_argument('--pattern', default='*', help='file name pattern within the directory, e.g. "*[0-9].png"')
+    parser.add_argument('--include-depth', action='store_true',
+                        help=f'also run on the {DEPTH_SUFFIX} depth frames of an image directory')
+    parser.add_argument('--batch', type=int, default=8, help='frames per inference call')
+    parser.add_argument('--imgsz', type=int, default=640, help='input size when the model has dynamic dimensions')
+    parser.add_argument('--conf', type=float, default=0.25, help='score threshold')
+    parser.add_argument('--iou', type=float, default=0.45, help='NMS IoU threshold')
+    parser.add_argument('--workers', type=int, default=4, help='decoding threads')
+    parser.add_argument('--prefetch', type=int, default=64, help='frames decoded ahead of inference')
+    parser.add_argument('--threads', type=int, default=0, help='onnxruntime intra-op threads (0: automatic)')
+    args = parser.parse_args()
+
+    sources = find_sources(args.source, args.pattern, args.include_depth)
+    if not sources:
+        raise SystemExit(f"No images or videos found in {args.source}")
+    session = create_session(args.model, args.threads)
+    detections = run_inference(session, sources, args.batch, args.imgsz, args.conf, args.iou, args.workers,
+                               args.prefetch)
+    write_detections(args.output, detections)
+    print(f"{len(detections['score'])} detections in {len(detections['source'])} frames written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,47 +1,336 @@
+import argparse
+import hashlib
+import json
 import os
-import shutil
 import random
-import glob
-
-# 2.1 Define your dataset paths
-dataset_path = './dataset_path/'
-images_path = os.path.join(dataset_path, 'images')
-labels_path = os.path.join(dataset_path, 'labels')
-
-# Create directories for training and validation data
-os.makedirs(os.path.join(images_path, 'train'), exist_ok=True)
-os.makedirs(os.path.join(images_path, 'val'), exist_ok=True)
-os.makedirs(os.path.join(labels_path, 'train'), exist_ok=True)
-os.makedirs(os.path.join(labels_path, 'val'), exist_ok=True)
-
-# 2.2 Split data into training and validation sets
-# Define split ratio (e.g., 80% training, 20% validation)
-train_ratio = 0.8
-
-# List all image files
-all_images = glob.glob(os.path.join(images_path, '*.jpg'))
-random.shuffle(all_images)
-
-# Calculate split index
-split_index = int(len(all_images) * train_ratio)
-
-# Split images into training and validation sets
-train_images = all_images[:split_index]
-val_images = all_images[split_index:]
-
-# Function to move files to their respective folders
-def move_files(file_list, dest_img_dir, dest_lbl_dir):
-    for img_file in file_list:
-        # Move image file
-        shutil.move(img_file, dest_img_dir)
-        # Move corresponding label file
-        label_file = img_file.replace('images', 'labels').replace('.jpg', '.txt')
-        shutil.move(label_file, dest_lbl_dir)
-
-# Move training data
-move_files(train_images, os.path.join(images_path, 'train'), os.path.join(labels_path, 'train'))
-
-# Move validation data
-move_files(val_images, os.path.join(images_path, 'val'), os.path.join(labels_path, 'val'))
-
-print("Data preparation complete. Training and validation datasets are ready.")
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Train/val split of the YOLO dataset without moving or copying frames. Every colour image
+# under the source directories is hashed (in parallel, cached by path, size and mtime),
+# exact duplicates are collapsed, and each unique frame is linked once into a
+# content-addressed pool (dataset/pool). Depth frames (13_06_30_375467_d.png) are not
+# training images: they travel with their colour frame and are linked under
+# depth/<split>, outside the images/ tree that ultralytics globs for training, val and
+# inference.
+# Frames are grouped into capture sequences by the time of day in their file name
+# (HH_MM_SS_micro): a new sequence starts after more than GROUP_GAP seconds without a
+# frame, so a burst crossing a second or minute boundary stays whole. Whole sequences are
+# assigned to train or val with a seeded shuffle, and images/<split> and labels/<split>
+# are filled with hard or symbolic links into the pool. dataset/manifest.json keeps the
+# hashes and the split, so splitting again only relinks.
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.bmp'}
+DEPTH_SUFFIX = '_d'
+FRAME_TIME = re.compile(r'^(\d{2})_(\d{2})_(\d{2})_(\d{6})')
+GROUP_GAP = 5.0  # seconds without a frame that end a capture sequence
+SPLITS = ('train', 'val')
+MANIFEST_VERSION = 1
+
+
+def file_hash(path, block_size=1 << 20):
+    """sha256 hex digest of a file, read in blocks (hashlib releases the GIL on large updates)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_files(paths, cache=None, workers=8):
+    """{str(path): sha256} for `paths`, reusing entries of `cache` ({path: [size, mtime_ns, sha]}).
+
+    `cache` is updated in place with the new hashes.
+    """
+    cache = {} if cache is None else cache
+    hashes, missing = {}, []
+    for path in paths:
+        key = str(path)
+        stat = os.stat(path)
+        cached = cache.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            hashes[key] = cached[2]
+        else:
+            missing.append((key, stat))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (key, stat), sha in zip(missing, pool.map(file_hash, [key for key, _ in missing])):
+            hashes[key] = sha
+            cache[key] = [stat.st_size, stat.st_mtime_ns, sha]
+    return hashes
+
+
+def label_path(image_path):
+    """YOLO label of an image: the images/ directory swapped for labels/ and a .txt suffix."""
+    parts = list(Path(image_path).parts)
+    for index in range(len(parts) - 1, -1, -1):
+        if parts[index] == 'images':
+            parts[index] = 'labels'
+            break
+    return Path(*parts).with_suffix('.txt')
+
+
+def is_depth_frame(path):
+    """Whether a file is the depth frame recorded with a colour frame (stem ending in DEPTH_SUFFIX)."""
+    return Path(path).stem.endswith(DEPTH_SUFFIX)
+
+
+def depth_frame(image_path):
+    """Depth frame belonging to a colour frame (which may not exist).
+
+    Under images/ that is the file materialize links into depth/ (the images/ directory
+    swapped for depth/), when present; otherwise the file next to the colour frame.
+    """
+    image_path = Path(image_path)
+    name = image_path.stem + DEPTH_SUFFIX + image_path.suffix
+    parts = list(image_path.parent.parts)
+    for index in range(len(parts) - 1, -1, -1):
+        if parts[index] == 'images':
+            parts[index] = 'depth'
+            linked = Path(*parts) / name
+            if linked.is_file():
+                return linked
+            break
+    return image_path.with_name(name)
+
+
+def find_images(sources, exclude=()):
+    """Sorted colour image files (or links to them) under the sources, skipping depth frames and anything below `exclude`."""
+    exclude = [Path(path).absolute() for path in exclude]
+    images = set()
+    for source in sources:
+        for path in Path(source).rglob('*'):
+            if path.suffix.lower() not in IMAGE_SUFFIXES or is_depth_frame(path) or not path.is_file():
+                continue
+            if any(path.absolute().is_relative_to(directory) for directory in exclude):
+                continue
+            images.add(path)
+    return sorted(images)
+
+
+def frame_time(name):
+    """Seconds since midnight of a frame named HH_MM_SS_micro..., or None for other names."""
+    match = FRAME_TIME.match(name)
+    if not match:
+        return None
+    hours, minutes, seconds, micro = (int(group) for group in match.groups())
+    return (hours * 60 + minutes) * 60 + seconds + micro * 1e-6
+
+
+def assign_groups(entries, gap_s=GROUP_GAP):
+    """Set entry['group'] of every entry to its capture sequence and return the entries.
+
+    Timed frames are sorted by time and cut into sequences wherever consecutive frames are
+    more than gap_s apart; a sequence is named after its first frame. Frames without a
+    time in their name are a sequence of their own.
+    """
+    timed = []
+    for sha, entry in entries.items():
+        seconds = frame_time(entry['name'])
+        if seconds is None:
+            entry['group'] = Path(entry['name']).stem
+        else:
+            timed.append((seconds, entry['name'], sha))
+    group, previous = None, None
+    for seconds, name, sha in sorted(timed):
+        if previous is None or seconds - previous > gap_s:
+            group = Path(name).stem
+        entries[sha]['group'] = group
+        previous = seconds
+    return entries
+
+
+def _place(source, target, mode):
+    """Put `source` at `target` as a hard link, symbolic link or copy (hard links fall back to copying)."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.is_symlink() or target.exists():
+        target.unlink()
+    if mode == 'symlink':
+        target.symlink_to(os.path.relpath(source, target.parent))
+        return
+    if mode == 'hardlink':
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            pass  # other filesystem, or links unsupported
+    shutil.copy2(source, target)
+
+
+def collect(dataset, sources, manifest, workers=8):
+    """Hash the source images and labels, add new unique frames to the pool and return the manifest entries.
+
+    Returns {sha: entry} with 'name', 'label' (True when a label file exists),
+    'depth' (True when the depth frame was pooled with it) and 'sources' (every path the
+    frame was found at in this scan).
+    """
+    pool = Path(dataset) / 'pool'
+    images = find_images(sources, exclude=[pool])
+    hashes = hash_files(images, manifest.setdefault('hashes', {}), workers)
+    # Drop cached hashes of files that are gone
+    manifest['hashes'] = {path: entry for path, entry in manifest['hashes'].items() if Path(path).exists()}
+
+    # Frames pooled by earlier runs stay in the dataset even when their source files are gone
+    entries = {}
+    for sha, entry in manifest.get('images', {}).items():
+        if (pool / 'images' / (sha[:16] + Path(entry['name']).suffix.lower())).exists():
+            entries[sha] = dict(entry, sources=[])
+            entries[sha].setdefault('depth', False)
+    for path in images:
+        sha = hashes[str(path)]
+        entry = entries.get(sha)
+        if entry is None:
+            entry = entries[sha] = {
+                'name': path.name,
+                'label': False,
+                'depth': False,
+                'sources': [],
+            }
+        entry['sources'].append(str(path))
+
+        pooled = pool / 'images' / (sha[:16] + path.suffix.lower())
+        if not pooled.exists():
+            _place(path, pooled, 'hardlink')
+        label = label_path(path)
+        pooled_label = pool / 'labels' / (sha[:16] + '.txt')
+        if label.is_file() and not entry['label']:
+            _place(label, pooled_label, 'hardlink')
+            entry['label'] = True
+        elif entry['label'] and not pooled_label.exists():
+            entry['label'] = False  # the pooled label was removed by hand
+        depth = depth_frame(path)
+        pooled_depth = pool / 'images' / (sha[:16] + DEPTH_SUFFIX + path.suffix.lower())
+        if depth.is_file() and not pooled_depth.exists():
+            _place(depth, pooled_depth, 'hardlink')
+        entry['depth'] = pooled_depth.exists()
+    manifest['images'] = entries
+    return entries
+
+
+def split_groups(entries, val_ratio=0.2, seed=0):
+    """{'train': [sha], 'val': [sha]}: whole groups shuffled with `seed` and taken into val until it holds val_ratio."""
+    groups = {}
+    for sha in sorted(entries):
+        groups.setdefault(entries[sha]['group'], []).append(sha)
+    keys = sorted(groups)
+    random.Random(seed).shuffle(keys)
+    target = val_ratio * len(entries)
+    split = {name: [] for name in SPLITS}
+    for key in keys:
+        # Fill val first; a group goes there only if it brings val closer to its target size
+        val_size = len(split['val'])
+        if val_size < target and abs(val_size + len(groups[key]) - target) <= abs(val_size - target):
+            split['val'].extend(groups[key])
+        else:
+            split['train'].extend(groups[key])
+    if val_ratio > 0 and not split['val'] and len(keys) > 1:
+        # Every group is bigger than the target; give val the smallest one
+        smallest = min(keys, key=lambda key: len(groups[key]))
+        split['val'] = groups[smallest]
+        split['train'] = [sha for sha in split['train'] if entries[sha]['group'] != smallest]
+    return split
+
+
+def materialize(dataset, entries, split, mode='hardlink'):
+    """Replace images/, labels/ and depth/<split> with links into the pool; returns {split: frame count}."""
+    dataset = Path(dataset)
+    pool = dataset / 'pool'
+    counts = {}
+    for name in SPLITS:
+        image_dir, label_dir, depth_dir = (dataset / tree / name for tree in ('images', 'labels', 'depth'))
+        for directory in (image_dir, label_dir, depth_dir):
+            if directory.is_dir():
+                for path in directory.iterdir():
+                    if path.is_file() or path.is_symlink():
+                        path.unlink()
+        used = set()
+        for sha in split[name]:
+            entry = entries[sha]
+            stem, suffix = Path(entry['name']).stem, Path(entry['name']).suffix.lower()
+            if stem in used:
+                # Same file name, different content: keep both
+                stem = f"{stem}_{sha[:8]}"
+            used.add(stem)
+            _place(pool / 'images' / (sha[:16] + suffix), image_dir / (stem + suffix), mode)
+            if entry['label']:
+                _place(pool / 'labels' / (sha[:16] + '.txt'), label_dir / (stem + '.txt'), mode)
+            if entry.get('depth'):
+                _place(pool / 'images' / (sha[:16] + DEPTH_SUFFIX + suffix), depth_dir / (stem + DEPTH_SUFFIX + suffix),
+                       mode)
+        counts[name] = len(split[name])
+    # ultralytics' label caches describe the old file lists
+    for name in SPLITS:
+        cache = dataset / 'labels' / (name + '.cache')
+        if cache.exists():
+            cache.unlink()
+    return counts
+
+
+def load_manifest(path):
+    path = Path(path)
+    if path.exists():
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    return {'version': MANIFEST_VERSION}
+
+
+def save_manifest(path, manifest):
+    path = Path(path)
+    temporary = path.with_suffix('.tmp')
+    with open(temporary, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(temporary, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deduplicated, sequence-grouped train/val split of the YOLO dataset.')
+    parser.add_argument('--dataset', default='./dataset', help='dataset root containing images/ and labels/')
+    parser.add_argument('--sources', nargs='+', help='directories with new frames (default: <dataset>/images)')
+    parser.add_argument('--val-ratio', type=float, default=0.2, help='fraction of unique frames for validation')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the group shuffle')
+    parser.add_argument('--group-gap', type=float, default=GROUP_GAP,
+                        help='seconds without a frame that start a new capture sequence')
+    parser.add_argument('--mode', choices=['hardlink', 'symlink', 'copy'], default='hardlink',
+                        help='how frames are placed in images/<split>')
+    parser.add_argument('--workers', type=int, default=8, help='hashing threads')
+    parser.add_argument('--rescan', action='store_true', help='look for new frames even when a manifest exists')
+    parser.add_argument('--dry-run', action='store_true', help='print the split without touching the dataset')
+    args = parser.parse_args()
+
+    dataset = Path(args.dataset)
+    manifest_path = dataset / 'manifest.json'
+    manifest = load_manifest(manifest_path)
+
+    # 2.1 Hash and deduplicate the frames (skipped on a re-split unless asked for)
+    if 'images' not in manifest or args.rescan or args.sources:
+        sources = args.sources or [dataset / 'images']
+        entries = collect(dataset, sources, manifest, args.workers)
+        n_found = sum(len(entry['sources']) for entry in entries.values())
+        print(f"{n_found} image files, {len(entries)} unique frames")
+    else:
+        entries = manifest['images']
+    assign_groups(entries, args.group_gap)
+
+    # 2.2 Split whole capture sequences into training and validation sets
+    split = split_groups(entries, args.val_ratio, args.seed)
+    groups = {name: sorted({entries[sha]['group'] for sha in split[name]}) for name in SPLITS}
+    for name in SPLITS:
+        print(f"{name}: {len(split[name])} frames in {len(groups[name])} sequences {groups[name]}")
+    if args.dry_run:
+        return
+
+    # 2.3 Link the frames into images/<split> and labels/<split>, depth frames into depth/<split>
+    counts = materialize(dataset, entries, split, args.mode)
+    unlabelled = sum(not entries[sha]['label'] for name in SPLITS for sha in split[name])
+    if unlabelled:
+        print(f"{unlabelled} frames have no label file (used as background images)")
+    manifest['split'] = {'seed': args.seed, 'val_ratio': args.val_ratio, 'group_gap': args.group_gap,
+                         **split}
+    save_manifest(manifest_path, manifest)
+    print(f"Data preparation complete: {counts['train']} training and {counts['val']} validation frames.")
+
+
+if __name__ == '__main__':
+    main()
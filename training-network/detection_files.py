@@ -0,0 +1,23 @@
+import numpy as np
+
+# Detection files shared by batch_inference.py (which writes them) and
+# offline_evaluation.py (which only reads them): the source file types and the columnar
+# .npz format. Kept free of OpenCV and onnxruntime so evaluation runs without them.
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff'}
+VIDEO_SUFFIXES = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
+
+
+def write_detections(path, detections):
+    """Store the columns of batch_inference.run_inference in a compressed .npz."""
+    np.savez_compressed(path, **detections)
+
+
+def read_detections(path):
+    """Columns written by write_detections.
+
+    Frame table (one row per processed frame): 'source' (index into 'sources'), 'frame'
+    (frame number within a video, 0 for images), 'height', 'width'. Detection table: 'frame_id'
+    (row of the frame table), 'box' (x1, y1, x2, y2 in original pixels), 'score', 'class_id'.
+    """
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
@@ -9,7 +9,10 @@ model = YOLO('yolov8n.pt')
 metrics = model.val()
 
 # Print evaluation metrics
-print(f"Validation Results:\n Precision: {metrics['precision']}\n Recall: {metrics['recall']}\n mAP50: {metrics['map50']}\n mAP50-95: {metrics['map']}")
+# (metrics is a DetMetrics object, not a dict; the mean box metrics live under metrics.box.
+# To compare checkpoints or confidence thresholds without re-running the network, store
+# detections with batch_inference.py and score them with offline_evaluation.py.)
+print(f"Validation Results:\n Precision: {metrics.box.mp}\n Recall: {metrics.box.mr}\n mAP50: {metrics.box.map50}\n mAP50-95: {metrics.box.map}")
 
 # 4.3 Export the trained model to a format suitable for deployment (e.g., ONNX)
 # This allows you to deploy the model on edge devices or integrate it with other systems.
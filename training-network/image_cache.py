@@ -0,0 +1,261 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+from ultralytics.data import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+
+from data_preparation import IMAGE_SUFFIXES, is_depth_frame, label_path
+
+# Decoded-once image cache for CPU training. Every image of a split is resized the way
+# ultralytics' load_image does (long side to imgsz), letterboxed into an imgsz x imgsz
+# slot of one uint8 .npy file and read back through a memory map, so epochs copy pixels
+# out of the page cache instead of decoding PNGs. Depth frames (13_06_30_375467_d.png)
+# are not training images: data_preparation.py links them under depth/<split>, and for
+# image directories that still hold them next to the colour frames the trainer hands
+# ultralytics a list of the colour frames only. index.npz holds, per row,
+# the image file, original and resized shapes, the letterbox offsets and the YOLO labels
+# (class, x, y, w, h) with their row offsets. Caches live in <dataset>/cache/<key>, keyed
+# on the data_preparation.py manifest (or file sizes and mtimes without one) and the
+# image size.
+CACHE_VERSION = 2
+PAD_VALUE = 114
+
+
+def colour_images(directory):
+    """Sorted image files under a directory, without depth frames (the order ultralytics uses)."""
+    return sorted(str(p) for p in Path(directory).rglob('*')
+                  if p.suffix.lower() in IMAGE_SUFFIXES and not is_depth_frame(p) and p.is_file())
+
+
+def _dataset_root(image_path):
+    """Directory holding images/<split>, or None when the file isn't laid out that way."""
+    parents = Path(image_path).resolve().parents
+    return parents[2] if len(parents) > 2 and parents[1].name == 'images' else None
+
+
+def cache_key(im_files, imgsz):
+    """Hex key of the cache for these files and settings."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([CACHE_VERSION, imgsz]).encode())
+    root = _dataset_root(im_files[0]) if im_files else None
+    manifest_path = root / 'manifest.json' if root is not None else None
+    if manifest_path is not None and manifest_path.exists():
+        # The manifest pins the content of every split by hash; names give the row order
+        with open(manifest_path) as f:
+            split = json.load(f).get('split', {})
+        digest.update(json.dumps(split, sort_keys=True).encode())
+        digest.update(json.dumps([str(Path(f).name) for f in im_files]).encode())
+    else:
+        for f in im_files:
+            stat = os.stat(f)
+            digest.update(f"{Path(f).resolve()}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _resize(image, imgsz):
+    """ultralytics' rect_mode resize: long side to imgsz, keeping the aspect ratio."""
+    h0, w0 = image.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+        image = cv2.resize(image, (w, h), interpolation=cv2.INTER_LINEAR)
+    return image
+
+
+def _read_labels(image_path):
+    """(n, 5) float32 rows of class, x, y, w, h from the YOLO label file of an image."""
+    path = label_path(image_path)
+    if not path.exists() or path.stat().st_size == 0:
+        return np.zeros((0, 5), dtype=np.float32)
+    return np.loadtxt(path, dtype=np.float32, ndmin=2)[:, :5]
+
+
+class ImageCache:
+    """Memory-mapped letterboxed images of one split; see build() and open_or_build()."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        index = np.load(self.path / 'index.npz')
+        self.files = [str(f) for f in index['files']]
+        self.original_shapes = index['original_shapes']
+        self.resized_shapes = index['resized_shapes']
+        self.offsets = index['offsets']
+        self.labels = index['labels']
+        self.label_offsets = index['label_offsets']
+        self.images = np.load(self.path / 'images.npy', mmap_mode='r')
+
+    def __len__(self):
+        return len(self.files)
+
+    def _crop(self, array, i):
+        (h, w), (top, left) = self.resized_shapes[i], self.offsets[i]
+        return array[i, top:top + h, left:left + w]
+
+    def load(self, i):
+        """(BGR image, (h0, w0), (h, w)) of row i as ultralytics' load_image returns it, as a writable copy."""
+        image = np.array(self._crop(self.images, i))
+        return image, tuple(int(v) for v in self.original_shapes[i]), image.shape[:2]
+
+    def letterboxed(self, i):
+        """Row i as stored: imgsz x imgsz BGR with grey padding (read-only view)."""
+        return self.images[i]
+
+    def image_labels(self, i):
+        """(n, 5) class, x, y, w, h labels of row i."""
+        return self.labels[self.label_offsets[i]:self.label_offsets[i + 1]]
+
+    def __getstate__(self):
+        # Dataloader workers reopen the memory maps instead of receiving copies of them
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    @classmethod
+    def build(cls, path, im_files, imgsz, workers=8):
+        """Decode and letterbox im_files into a new cache directory at `path`."""
+        path = Path(path)
+        temporary = path.with_name(path.name + '.tmp')
+        shutil.rmtree(temporary, ignore_errors=True)
+        temporary.mkdir(parents=True)
+        n = len(im_files)
+        images = np.lib.format.open_memmap(temporary / 'images.npy', mode='w+', dtype=np.uint8,
+                                           shape=(n, imgsz, imgsz, 3))
+        original_shapes = np.zeros((n, 2), dtype=np.int32)
+        resized_shapes = np.zeros((n, 2), dtype=np.int32)
+        offsets = np.zeros((n, 2), dtype=np.int32)
+
+        def fill(i):
+            image = cv2.imread(str(im_files[i]), cv2.IMREAD_COLOR)
+            if image is None:
+                raise FileNotFoundError(f"Image Not Found {im_files[i]}")
+            original_shapes[i] = image.shape[:2]
+            image = _resize(image, imgsz)
+            h, w = image.shape[:2]
+            top, left = (imgsz - h) // 2, (imgsz - w) // 2
+            resized_shapes[i], offsets[i] = (h, w), (top, left)
+            images[i] = PAD_VALUE
+            images[i, top:top + h, left:left + w] = image
+            return _read_labels(im_files[i])
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            labels = list(pool.map(fill, range(n)))
+        images.flush()
+        del images
+        label_offsets = np.concatenate(([0], np.cumsum([len(rows) for rows in labels]))).astype(np.int64)
+        np.savez(temporary / 'index.npz', files=np.array([str(Path(f).resolve()) for f in im_files]),
+                 original_shapes=original_shapes, resized_shapes=resized_shapes, offsets=offsets,
+                 labels=np.concatenate(labels) if labels else np.zeros((0, 5), np.float32),
+                 label_offsets=label_offsets, imgsz=imgsz)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temporary, path)
+        return cls(path)
+
+    @classmethod
+    def open_or_build(cls, im_files, imgsz, cache_root=None, workers=8):
+        """Existing cache for these files and settings, built first when there is none."""
+        im_files = [str(f) for f in im_files]
+        if cache_root is None:
+            root = _dataset_root(im_files[0])
+            cache_root = (root if root is not None else Path(im_files[0]).parent) / 'cache'
+        path = Path(cache_root) / cache_key(im_files, imgsz)[:16]
+        if (path / 'index.npz').exists():
+            return cls(path)
+        print(f"Caching {len(im_files)} images at {imgsz} px in {path}")
+        return cls.build(path, im_files, imgsz, workers)
+
+
+def colour_image_list(img_path, cache_root=None):
+    """ultralytics image list file (absolute paths) of the colour frames in an image directory.
+
+    ultralytics globs every image under a directory, so depth frames recorded next to
+    the colour frames would come along; a list file keeps them out while the images/ ->
+    labels/ path mapping still finds the labels (a data_preparation.py split has its
+    depth frames under depth/ already). Anything other than a directory is returned
+    unchanged.
+    """
+    if not isinstance(img_path, (str, Path)) or not Path(img_path).is_dir():
+        return img_path
+    directory = Path(img_path)
+    files = colour_images(directory)
+    if not files:
+        return img_path
+    root = _dataset_root(files[0])
+    list_dir = Path(cache_root) if cache_root is not None else (root if root is not None else directory.parent) / 'cache'
+    list_dir.mkdir(parents=True, exist_ok=True)
+    list_file = list_dir / f'{directory.name}.txt'
+    content = ''.join(str(Path(f).absolute()) + '\n' for f in files)
+    if not list_file.exists() or list_file.read_text() != content:
+        list_file.write_text(content)
+    return str(list_file)
+
+
+class CachedYOLODataset(YOLODataset):
+    """YOLODataset whose load_image reads from an ImageCache (set as image_cache) instead of decoding files."""
+
+    image_cache = None
+
+    def load_image(self, i, rect_mode=True, **kwargs):
+        if self.image_cache is None or self.ims[i] is not None or not rect_mode or kwargs.get('resize_short'):
+            return super().load_image(i, rect_mode, **kwargs)
+        image, original_shape, resized_shape = self.image_cache.load(i)
+        # Same mosaic buffer bookkeeping as BaseDataset.load_image
+        if self.augment and self.cache != 'ram':
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = image, original_shape, resized_shape
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+        return image, original_shape, resized_shape
+
+
+def use_image_cache(dataset, cache_root=None):
+    """Switch a YOLODataset built by ultralytics over to the image cache of its files."""
+    if type(dataset) is not YOLODataset:
+        print(f"Not caching images of a {type(dataset).__name__}")
+        return dataset
+    cache = ImageCache.open_or_build(dataset.im_files, dataset.imgsz, cache_root)
+    if [str(Path(f).resolve()) for f in dataset.im_files] != cache.files:
+        raise ValueError(f"Cache {cache.path} does not match the dataset's image list")
+    # A class swap rather than a bound function, so the dataset still pickles for dataloader workers
+    dataset.__class__ = CachedYOLODataset
+    dataset.image_cache = cache
+    return dataset
+
+
+class CachedDetectionTrainer(DetectionTrainer):
+    """DetectionTrainer whose train and val datasets load images from an ImageCache; use with YOLO.train(trainer=...)."""
+
+    cache_root = None
+
+    def build_dataset(self, img_path, mode='train', batch=None):
+        dataset = super().build_dataset(colour_image_list(img_path, self.cache_root), mode, batch)
+        return use_image_cache(dataset, self.cache_root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the letterboxed image cache of dataset splits ahead of training.')
+    parser.add_argument('--dataset', default='./dataset', help='dataset root containing images/<split>')
+    parser.add_argument('--splits', nargs='+', default=['train', 'val'], help='splits to cache')
+    parser.add_argument('--imgsz', type=int, default=640, help='training image size')
+    parser.add_argument('--workers', type=int, default=8, help='decoding threads')
+    args = parser.parse_args()
+
+    for split in args.splits:
+        directory = Path(args.dataset) / 'images' / split
+        # Same files and order as the trainer's image list, so training reuses the cache
+        cache = ImageCache.open_or_build(colour_images(directory), args.imgsz, workers=args.workers)
+        print(f"{split}: {len(cache)} images, {len(cache.labels)} labels, "
+              f"{cache.images.nbytes / 1e6:.0f} MB in {cache.path}")
+
+
+if __name__ == '__main__':
+    main()
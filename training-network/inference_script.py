@@ -2,6 +2,7 @@ import cv2
 from ultralytics import YOLO
 
 # 5.1 Load the trained model (in .pt format or exported format like .onnx)
+# For whole capture sessions on CPU use batch_inference.py with the ONNX export instead
 model = YOLO('yolov8n.pt')
 
 # 5.2 Load an image or video for inference
@@ -14,7 +15,7 @@ results = model(image)
 
 # 5.3 Display results
 # Draw bounding boxes on the image
-annotated_image = results.render()[0]  # Get the annotated image
+annotated_image = results[0].plot()  # Get the annotated image (BGR, like cv2.imread)
 
 # Show the image using OpenCV
 cv2.imshow("YOLOv8 Inference", annotated_image)
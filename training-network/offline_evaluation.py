@@ -0,0 +1,223 @@
+import argparse
+import csv
+from pathlib import Path
+
+import numpy as np
+
+from data_preparation import label_path
+from detection_files import IMAGE_SUFFIXES, read_detections
+
+# Detector evaluation from stored predictions (batch_inference.py output) against YOLO
+# label files, without running the network. Precision, recall, mAP50 and mAP50-95 follow
+# ultralytics' model.val(): per IoU threshold every detection proposes its best-overlapping
+# ground-truth box of the same class and each box accepts the highest-scoring proposal; AP
+# is the 101-point interpolated area under the precision envelope; precision and recall
+# are taken at the confidence with the best (smoothed) mean F1. Candidate pairs are the
+# same-image detection/label pairs of all frames at once, and all ten IoU thresholds are
+# handled in one pass over them, so a whole session evaluates in a few array operations.
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def load_ground_truth(detections):
+    """Labels of the image frames in a detections file: {'frame_id', 'box' (xyxy px), 'class_id', 'evaluated'}.
+
+    Video frames have no label files and are left out ('evaluated' is False); image frames
+    without a label file count as images with no objects.
+    """
+    sources = detections['sources']
+    frame_ids, boxes, classes = [], [], []
+    evaluated = np.zeros(len(detections['source']), dtype=bool)
+    for frame_id, source_index in enumerate(detections['source']):
+        source = Path(str(sources[source_index]))
+        if source.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        evaluated[frame_id] = True
+        path = label_path(source)
+        if not path.exists() or path.stat().st_size == 0:
+            continue
+        rows = np.loadtxt(path, dtype=np.float32, ndmin=2)
+        width, height = detections['width'][frame_id], detections['height'][frame_id]
+        centre, size = rows[:, 1:3] * (width, height), rows[:, 3:5] * (width, height)
+        boxes.append(np.concatenate((centre - size / 2, centre + size / 2), axis=1))
+        classes.append(rows[:, 0].astype(np.int16))
+        frame_ids.append(np.full(len(rows), frame_id, dtype=np.int32))
+    return {
+        'frame_id': np.concatenate(frame_ids) if frame_ids else np.empty(0, np.int32),
+        'box': np.concatenate(boxes).astype(np.float32) if boxes else np.empty((0, 4), np.float32),
+        'class_id': np.concatenate(classes) if classes else np.empty(0, np.int16),
+        'evaluated': evaluated,
+    }
+
+
+def paired_iou(a, b):
+    """IoU of xyxy boxes a[i] and b[i], row by row."""
+    lower = np.maximum(a[:, :2], b[:, :2])
+    upper = np.minimum(a[:, 2:], b[:, 2:])
+    intersection = np.prod(np.clip(upper - lower, 0, None), axis=1)
+    union = np.prod(a[:, 2:] - a[:, :2], axis=1) + np.prod(b[:, 2:] - b[:, :2], axis=1) - intersection
+    return intersection / np.maximum(union, 1e-9)
+
+
+def frame_pairs(pred_frame, gt_frame, n_frames):
+    """(prediction index, label index) of every prediction/label pair within the same frame.
+
+    This is the block diagonal of the all-to-all pair matrix, built without materializing the rest.
+    """
+    pred_order = np.argsort(pred_frame, kind='stable')
+    gt_order = np.argsort(gt_frame, kind='stable')
+    pred_count = np.bincount(pred_frame, minlength=n_frames)
+    gt_count = np.bincount(gt_frame, minlength=n_frames)
+    pred_start = np.cumsum(pred_count) - pred_count
+    gt_start = np.cumsum(gt_count) - gt_count
+    pair_count = pred_count * gt_count
+    frame = np.repeat(np.arange(n_frames), pair_count)
+    local = np.arange(pair_count.sum()) - np.repeat(np.cumsum(pair_count) - pair_count, pair_count)
+    pred_index = pred_order[pred_start[frame] + local // gt_count[frame]]
+    gt_index = gt_order[gt_start[frame] + local % gt_count[frame]]
+    return pred_index, gt_index
+
+
+def match_predictions(pred, gt, n_frames, iou_thresholds=IOU_THRESHOLDS):
+    """(N, T) bool: whether each prediction is a true positive at each IoU threshold.
+
+    `pred` and `gt` are dicts with 'frame_id', 'box' and 'class_id' (pred also 'score').
+    """
+    tp = np.zeros((len(pred['score']), len(iou_thresholds)), dtype=bool)
+    pred_index, gt_index = frame_pairs(pred['frame_id'], gt['frame_id'], n_frames)
+    same_class = pred['class_id'][pred_index] == gt['class_id'][gt_index]
+    pred_index, gt_index = pred_index[same_class], gt_index[same_class]
+    iou = paired_iou(pred['box'][pred_index], gt['box'][gt_index])
+    # Sorted by falling IoU, the pairs above any threshold are a prefix of the list
+    order = np.argsort(-iou, kind='stable')
+    order = order[iou[order] >= iou_thresholds.min()]
+    pred_index, gt_index, iou = pred_index[order], gt_index[order], iou[order]
+    rank = np.empty(len(pred['score']), dtype=np.int64)
+    rank[np.lexsort((np.arange(len(rank)), -pred['score']))] = np.arange(len(rank))
+    for column, threshold in enumerate(iou_thresholds):
+        count = np.searchsorted(-iou, -threshold, side='right')
+        # Each prediction proposes its highest-IoU label (first occurrence in the prefix)...
+        proposers, first = np.unique(pred_index[:count], return_index=True)
+        proposed = gt_index[:count][first]
+        # ...and each label accepts the highest-scoring of its proposers
+        accepted = np.lexsort((rank[proposers], proposed))
+        keep = np.concatenate(([True], proposed[accepted][1:] != proposed[accepted][:-1])) if len(accepted) else []
+        tp[proposers[accepted[keep]], column] = True
+    return tp
+
+
+def interpolated_ap(recall, precision):
+    """101-point interpolated AP of every column of (N, T) recall/precision curves; returns (T,)."""
+    n, n_thresholds = recall.shape
+    recall = np.vstack((np.zeros(n_thresholds), recall, np.ones(n_thresholds)))
+    precision = np.vstack((np.ones(n_thresholds), precision, np.zeros(n_thresholds)))
+    envelope = np.flip(np.maximum.accumulate(np.flip(precision, axis=0), axis=0), axis=0)
+    x = np.linspace(0, 1, 101)
+    # Linear interpolation of all columns at once: shift column j by 2j so they sort as one array
+    shift = 2.0 * np.arange(n_thresholds)
+    flat_recall = (recall + shift).T.ravel()
+    flat_envelope = envelope.T.ravel()
+    queries = (x[None, :] + shift[:, None]).ravel()
+    right = np.clip(np.searchsorted(flat_recall, queries, side='right'), 1, len(flat_recall) - 1)
+    left = right - 1
+    span = flat_recall[right] - flat_recall[left]
+    weight = np.where(span > 0, (queries - flat_recall[left]) / np.where(span > 0, span, 1), 0.0)
+    values = flat_envelope[left] + weight * (flat_envelope[right] - flat_envelope[left])
+    # Queries exactly on a column's last point (recall 1) take its value
+    values = np.where(queries >= flat_recall[right], flat_envelope[right], values).reshape(n_thresholds, -1)
+    return np.trapezoid(values, x, axis=1)
+
+
+def _smooth(y, fraction=0.1):
+    """Box filter over a fraction of the curve, as ultralytics smooths the F1 curve."""
+    n = round(len(y) * fraction * 2) // 2 + 1
+    padded = np.concatenate((np.full(n // 2, y[0]), y, np.full(n // 2, y[-1])))
+    return np.convolve(padded, np.ones(n) / n, mode='valid')
+
+
+def ap_per_class(tp, conf, pred_class, target_class, eps=1e-16):
+    """Per-class AP at every IoU threshold plus precision/recall at the best mean-F1 confidence.
+
+    Returns {'classes', 'ap' (C, T), 'precision' (C,), 'recall' (C,), 'f1' (C,), 'confidence'}.
+    """
+    order = np.argsort(-conf, kind='stable')
+    tp, conf, pred_class = tp[order], conf[order], pred_class[order]
+    classes, n_labels = np.unique(target_class, return_counts=True)
+    grid = np.linspace(0, 1, 1000)
+    ap = np.zeros((len(classes), tp.shape[1]))
+    p_curve, r_curve = np.zeros((len(classes), len(grid))), np.zeros((len(classes), len(grid)))
+    for index, (cls, n_cls) in enumerate(zip(classes, n_labels)):
+        mask = pred_class == cls
+        if not mask.any():
+            continue
+        tpc = np.cumsum(tp[mask], axis=0)
+        fpc = np.cumsum(~tp[mask], axis=0)
+        recall = tpc / (n_cls + eps)
+        precision = tpc / (tpc + fpc)
+        r_curve[index] = np.interp(-grid, -conf[mask], recall[:, 0], left=0)
+        p_curve[index] = np.interp(-grid, -conf[mask], precision[:, 0], left=1)
+        ap[index] = interpolated_ap(recall, precision)
+    f1_curve = 2 * p_curve * r_curve / (p_curve + r_curve + eps)
+    best = _smooth(f1_curve.mean(axis=0)).argmax() if len(classes) else 0
+    return {
+        'classes': classes,
+        'ap': ap,
+        'precision': p_curve[:, best],
+        'recall': r_curve[:, best],
+        'f1': f1_curve[:, best],
+        'confidence': float(grid[best]),
+    }
+
+
+def evaluate(detections, ground_truth, conf=0.0, iou_thresholds=IOU_THRESHOLDS):
+    """Metrics of the detections with score >= conf on the evaluated frames.
+
+    Returns a dict with 'precision', 'recall', 'map50', 'map50_95' (means over classes),
+    the per-class arrays of ap_per_class, 'images' and 'labels'.
+    """
+    evaluated = ground_truth['evaluated']
+    keep = (detections['score'] >= conf) & evaluated[detections['frame_id']]
+    pred = {key: detections[key][keep] for key in ('frame_id', 'box', 'score', 'class_id')}
+    tp = match_predictions(pred, ground_truth, len(evaluated), iou_thresholds)
+    result = ap_per_class(tp, pred['score'], pred['class_id'], ground_truth['class_id'])
+    result.update({
+        'precision_mean': float(result['precision'].mean()) if len(result['classes']) else 0.0,
+        'recall_mean': float(result['recall'].mean()) if len(result['classes']) else 0.0,
+        'map50': float(result['ap'][:, 0].mean()) if len(result['classes']) else 0.0,
+        'map50_95': float(result['ap'].mean()) if len(result['classes']) else 0.0,
+        'images': int(evaluated.sum()),
+        'labels': len(ground_truth['class_id']),
+        'detections': len(pred['score']),
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate stored detections against YOLO label files.')
+    parser.add_argument('detections', nargs='+', help='.npz files written by batch_inference.py (e.g. one per checkpoint)')
+    parser.add_argument('--conf', type=float, nargs='+', default=[0.001],
+                        help='confidence thresholds to evaluate (detections below the one used at inference are absent)')
+    parser.add_argument('--output', help='also write the table to this CSV file')
+    args = parser.parse_args()
+
+    fields = ['detections_file', 'conf', 'images', 'labels', 'detections', 'precision', 'recall', 'map50', 'map50_95']
+    rows = []
+    print(f"{'file':<32} {'conf':>6} {'images':>7} {'labels':>7} {'P':>6} {'R':>6} {'mAP50':>6} {'mAP50-95':>8}")
+    for path in args.detections:
+        detections = read_detections(path)
+        ground_truth = load_ground_truth(detections)
+        for conf in args.conf:
+            result = evaluate(detections, ground_truth, conf)
+            rows.append([path, conf, result['images'], result['labels'], result['detections'],
+                         result['precision_mean'], result['recall_mean'], result['map50'], result['map50_95']])
+            print(f"{Path(path).name:<32} {conf:>6.3f} {result['images']:>7} {result['labels']:>7} "
+                  f"{result['precision_mean']:>6.3f} {result['recall_mean']:>6.3f} {result['map50']:>6.3f} "
+                  f"{result['map50_95']:>8.3f}")
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 from ultralytics import YOLO
 
+from image_cache import CachedDetectionTrainer
+
 # 3.1 Load a pre-trained YOLOv8 model
 # Here, 'yolov8n.pt' is the small, fast model variant. You can change this to 'yolov8s.pt', etc., for larger models.
 model = YOLO('yolov8n.pt')
@@ -8,8 +10,12 @@ model = YOLO('yolov8n.pt')
 # You will need to specify the path to your 'data.yaml' file, which contains information about your dataset.
 # Adjust the 'epochs', 'batch', and 'imgsz' parameters as needed.
 
+# Images are decoded and letterboxed once into a memory-mapped cache (dataset/cache, see image_cache.py)
+# that both the training and validation loaders read from, instead of decoding every PNG each epoch.
+# Depth frames (_d.png) are linked under dataset/depth by data_preparation.py, outside the image folders.
 model.train(
     data='data.yaml',  
+    trainer=CachedDetectionTrainer,
     epochs=50,                      # Number of training epochs
     imgsz=640,                       # Image size (pixels)
     batch=8,                        # Batch size
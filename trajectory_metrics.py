@@ -0,0 +1,142 @@
+import numpy as np
+
+from pose_transforms import quat_conjugate, quat_multiply, quat_normalize, quat_rotate, matrix_to_quat
+
+# Trajectory error metrics on associated pose arrays (row i of gt matches row i of pr).
+# Positions are Nx3, quaternions Nx4 in (x, y, z, w) order.
+
+
+def umeyama_alignment(source, target, with_scale=False):
+    """Least-squares rigid (SE3) or similarity (Sim3) transform mapping source onto target.
+
+    Returns (rotation, translation, scale) so that target ~ scale * rotation @ source + translation.
+    """
+    source = np.asarray(source, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    if source.shape != target.shape or len(source) < 3:
+        raise ValueError('Umeyama alignment needs two matching Nx3 arrays with N >= 3')
+
+    mu_s = source.mean(axis=0)
+    mu_t = target.mean(axis=0)
+    source_c = source - mu_s
+    target_c = target - mu_t
+    cov = target_c.T @ source_c / len(source)
+    var_s = np.einsum('ij,ij->', source_c, source_c) / len(source)
+    return _umeyama_from_moments(mu_s, mu_t, cov, var_s, with_scale)
+
+
+def _umeyama_from_moments(mu_s, mu_t, cov, var_s, with_scale):
+    """Closed-form Umeyama solution from means, cross-covariance and source variance."""
+    U, D, Vt = np.linalg.svd(cov)
+    S = np.eye(3)
+    if np.linalg.det(U) * np.linalg.det(Vt) < 0:
+        S[2, 2] = -1
+    rotation = U @ S @ Vt
+    scale = float(np.trace(np.diag(D) @ S) / var_s) if with_scale and var_s > 0 else 1.0
+    translation = mu_t - scale * rotation @ mu_s
+    return rotation, translation, scale
+
+
+def apply_alignment(positions, rotation, translation, scale=1.0):
+    """Apply an alignment returned by umeyama_alignment to Nx3 positions."""
+    return scale * np.einsum('ij,nj->ni', rotation, positions) + translation
+
+
+def rotation_angles(q):
+    """Rotation angle in radians of each (x, y, z, w) quaternion."""
+    q = np.asarray(q, dtype=np.float64)
+    return 2.0 * np.arctan2(np.linalg.norm(q[..., :3], axis=-1), np.abs(q[..., 3]))
+
+
+def error_statistics(errors):
+    """Summary statistics of an error array, in the same units."""
+    errors = np.asarray(errors, dtype=np.float64)
+    if not len(errors):
+        return {'rmse': np.nan, 'mean': np.nan, 'median': np.nan, 'std': np.nan, 'min': np.nan, 'max': np.nan}
+    return {
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'mean': float(np.mean(errors)),
+        'median': float(np.median(errors)),
+        'std': float(np.std(errors)),
+        'min': float(np.min(errors)),
+        'max': float(np.max(errors)),
+    }
+
+
+def absolute_trajectory_error(gt_positions, pr_positions, alignment='se3'):
+    """Per-pose translation error after aligning pr onto gt.
+
+    alignment is 'se3', 'sim3' or None (compare as-is, e.g. after first-pose anchoring).
+    Returns (errors, (rotation, translation, scale)).
+    """
+    gt_positions = np.asarray(gt_positions, dtype=np.float64)
+    pr_positions = np.asarray(pr_positions, dtype=np.float64)
+    if alignment is None:
+        transform = (np.eye(3), np.zeros(3), 1.0)
+    elif alignment in ('se3', 'sim3'):
+        transform = umeyama_alignment(pr_positions, gt_positions, with_scale=alignment == 'sim3')
+    else:
+        raise ValueError("alignment must be 'se3', 'sim3' or None, got %r" % (alignment,))
+    aligned = apply_alignment(pr_positions, *transform)
+    return np.linalg.norm(aligned - gt_positions, axis=1), transform
+
+
+def absolute_rotation_error(gt_quaternions, pr_quaternions, rotation=None):
+    """Per-pose rotation error in degrees, optionally after rotating pr by an alignment."""
+    pr_quaternions = quat_normalize(pr_quaternions)
+    if rotation is not None:
+        pr_quaternions = quat_multiply(matrix_to_quat(rotation), pr_quaternions)
+    delta = quat_multiply(quat_conjugate(quat_normalize(gt_quaternions)), pr_quaternions)
+    return np.degrees(rotation_angles(delta))
+
+
+def path_length(positions):
+    """Cumulative distance travelled along a trajectory, starting at 0."""
+    steps = np.linalg.norm(np.diff(positions, axis=0), axis=1)
+    return np.concatenate(([0.0], np.cumsum(steps)))
+
+
+def delta_pairs(gt_positions, delta, unit='frames'):
+    """Index pairs (i, j) separated by `delta` frames or `delta` metres of gt path length."""
+    n = len(gt_positions)
+    if unit == 'frames':
+        first = np.arange(max(n - int(delta), 0))
+        return first, first + int(delta)
+    if unit == 'meters':
+        distance = path_length(gt_positions)
+        second = np.searchsorted(distance, distance + delta, side='left')
+        first = np.flatnonzero(second < n)
+        return first, second[first]
+    raise ValueError("unit must be 'frames' or 'meters', got %r" % (unit,))
+
+
+def relative_pose_error(gt_positions, gt_quaternions, pr_positions, pr_quaternions,
+                        deltas=(1,), unit='frames'):
+    """Relative pose error for each delta: {delta: {'translation': m, 'rotation': deg, 'pairs': (i, j)}}.
+
+    For every pair (i, j) the error is (Gi^-1 Gj)^-1 (Pi^-1 Pj), computed for all pairs at once.
+    """
+    gt_positions = np.asarray(gt_positions, dtype=np.float64)
+    pr_positions = np.asarray(pr_positions, dtype=np.float64)
+    gt_quaternions = quat_normalize(gt_quaternions)
+    pr_quaternions = quat_normalize(pr_quaternions)
+
+    results = {}
+    for delta in deltas:
+        i, j = delta_pairs(gt_positions, delta, unit)
+        gt_inv = quat_conjugate(gt_quaternions[i])
+        pr_inv = quat_conjugate(pr_quaternions[i])
+        gt_rel_q = quat_multiply(gt_inv, gt_quaternions[j])
+        pr_rel_q = quat_multiply(pr_inv, pr_quaternions[j])
+        gt_rel_t = quat_rotate(gt_inv, gt_positions[j] - gt_positions[i])
+        pr_rel_t = quat_rotate(pr_inv, pr_positions[j] - pr_positions[i])
+
+        gt_rel_inv = quat_conjugate(gt_rel_q)
+        error_q = quat_multiply(gt_rel_inv, pr_rel_q)
+        error_t = quat_rotate(gt_rel_inv, pr_rel_t - gt_rel_t)
+        results[delta] = {
+            'translation': np.linalg.norm(error_t, axis=1),
+            'rotation': np.degrees(rotation_angles(error_q)),
+            'pairs': (i, j),
+        }
+    return results
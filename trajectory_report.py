@@ -0,0 +1,180 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')  # reports never open a window
+import matplotlib.pyplot as plt
+import numpy as np
+
+from batch_evaluation import discover_takes, prepare_take
+from stage_cache import CACHE_DIR, DEFAULT_MAX_BYTES, StageCache
+from timestamp_association import NS_PER_UNIT
+from trajectory_metrics import absolute_trajectory_error
+
+# Headless figure generation for evaluated takes. Long trajectories are decimated with
+# Largest-Triangle-Three-Buckets before drawing and every figure is rendered in its own
+# worker process straight to PNG/SVG.
+FIGURES = ['top_down', 'flu', '3d', 'error']
+
+
+def lttb_indices(points, n_out):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets decimation.
+
+    `points` is (N, D); the triangle area is measured in all D dimensions, so the same
+    routine works for (time, value) series, 2D projections and 3D paths.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if points.ndim == 1:
+        points = np.column_stack((np.arange(len(points)), points))
+    n = len(points)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # First and last points are always kept; the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = points[0]
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            following = points[edges[bucket + 1]:edges[bucket + 2]].mean(axis=0)
+        else:
+            following = points[-1]
+        a = points[start:end] - previous
+        b = following - previous
+        # Squared triangle area up to a constant, valid in any dimension
+        area = np.einsum('ij,ij->i', a, a) * (b @ b) - (a @ b) ** 2
+        choice = start + int(np.argmax(area))
+        selected[bucket + 1] = choice
+        previous = points[choice]
+    return selected
+
+
+def _decimate(max_points, *series):
+    """Apply one LTTB selection (computed on the stacked series) to every series."""
+    stacked = np.column_stack(series)
+    keep = lttb_indices(stacked, max_points)
+    return [np.asarray(s)[keep] for s in series]
+
+
+def _mark_ends(ax, *coordinates):
+    """Green start / red end markers, matching the evaluation scripts."""
+    ax.scatter(*[[c[0]] for c in coordinates], color='green', marker='x', s=100, label='Start Point')
+    ax.scatter(*[[c[-1]] for c in coordinates], color='red', marker='x', s=100, label='End Point')
+
+
+def render_figure(kind, data, path, max_points=2000, title=''):
+    """Draw one figure of the report set to `path` and return the path."""
+    gt = data['gt_positions']
+    pr = data['pr_positions']
+
+    if kind == 'top_down':
+        fig, ax = plt.subplots(figsize=(8, 8))
+        for positions, label in ((gt, 'Ground Truth'), (pr, 'Prediction')):
+            x, y = _decimate(max_points, positions[:, 0], positions[:, 1])
+            ax.plot(x, y, label=label)
+        _mark_ends(ax, gt[:, 0], gt[:, 1])
+        ax.set_title(f'Top-Down View {title}')
+        ax.set_xlabel('X Coordinate')
+        ax.set_ylabel('Y Coordinate')
+        ax.axis('equal')
+        ax.legend()
+    elif kind == 'flu':
+        fig, axs = plt.subplots(2, 1, figsize=(12, 9))
+        for ax, (i, j, xlabel, ylabel) in zip(axs, ((0, 2, 'Forward', 'Up'), (1, 2, 'Left', 'Up'))):
+            for positions, label in ((gt, 'Ground Truth'), (pr, 'Prediction')):
+                u, v = _decimate(max_points, positions[:, i], positions[:, j])
+                ax.plot(u, v, label=label)
+            _mark_ends(ax, gt[:, i], gt[:, j])
+            ax.set_title(f'FLU {xlabel} vs {ylabel} {title}')
+            ax.set_xlabel(xlabel)
+            ax.set_ylabel(ylabel)
+            ax.legend()
+    elif kind == '3d':
+        fig = plt.figure(figsize=(9, 8))
+        ax = fig.add_subplot(111, projection='3d')
+        for positions, label, color in ((gt, 'Ground Truth', 'blue'), (pr, 'Prediction', 'orange')):
+            x, y, z = _decimate(max_points, positions[:, 0], positions[:, 1], positions[:, 2])
+            ax.plot(x, y, z, label=label, color=color)
+        ax.set_title(f'3D Trajectory {title}')
+        ax.set_xlabel('pos_x')
+        ax.set_ylabel('pos_y')
+        ax.set_zlabel('pos_z')
+        ax.legend()
+    elif kind == 'error':
+        fig, ax = plt.subplots(figsize=(12, 5))
+        seconds = (data['timeline_ns'] - data['timeline_ns'][0]) / NS_PER_UNIT['s']
+        for errors, label in ((data['anchored_error'], 'First-pose anchored'), (data['ate'], 'SE3 aligned')):
+            t, e = _decimate(max_points, seconds, errors)
+            ax.plot(t, e, label=label)
+        ax.set_title(f'Distance Error Over Time {title}')
+        ax.set_xlabel('Time (s)')
+        ax.set_ylabel('Error (m)')
+        ax.legend()
+    else:
+        raise ValueError('Unknown figure %r, expected one of %s' % (kind, FIGURES))
+
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def report_data(take_dir, rate_hz=10.0, cache=None):
+    """Arrays needed by every figure of a take (the aligned trajectories come from `cache` when it has them)."""
+    arrays, _ = prepare_take(take_dir, rate_hz=rate_hz, cache=cache)
+    arrays['anchored_error'], _ = absolute_trajectory_error(arrays['gt_positions'], arrays['pr_positions'],
+                                                            alignment=None)
+    arrays['ate'], _ = absolute_trajectory_error(arrays['gt_positions'], arrays['pr_positions'], alignment='se3')
+    return arrays
+
+
+def render_reports(take_dirs, output_dir, figures=FIGURES, fmt='png', max_points=2000, rate_hz=10.0,
+                   workers=None, cache=None):
+    """Render the figure set of every take in parallel; returns the written paths."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for take_dir in take_dirs:
+            take_dir = Path(take_dir)
+            data = report_data(take_dir, rate_hz=rate_hz, cache=cache)
+            name = '_'.join(take_dir.parts[-2:])
+            for kind in figures:
+                path = output_dir / f'{name}_{kind}.{fmt}'
+                futures.append(pool.submit(render_figure, kind, data, path, max_points, f'({name})'))
+        return [future.result() for future in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render trajectory report figures without a display.')
+    parser.add_argument('root', nargs='?', default='isaacVslam', help='take directory or directory of takes')
+    parser.add_argument('--output-dir', default='reports', help='where figures are written')
+    parser.add_argument('--format', default='png', choices=['png', 'svg'], help='figure file format')
+    parser.add_argument('--figures', nargs='+', default=FIGURES, choices=FIGURES, help='figures to draw')
+    parser.add_argument('--max-points', type=int, default=2000, help='LTTB points kept per line')
+    parser.add_argument('--rate', type=float, default=10.0, help='common resampling rate in Hz')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='stage cache shared with batch_evaluation.py')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / 2 ** 20,
+                        help='stage cache size limit in MiB')
+    parser.add_argument('--no-cache', action='store_true', help='reload and realign every take')
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else StageCache(args.cache_dir, int(args.cache_size * 2 ** 20))
+    take_dirs = discover_takes(args.root)
+    started = time.perf_counter()
+    paths = render_reports(take_dirs, args.output_dir, figures=args.figures, fmt=args.format,
+                           max_points=args.max_points, rate_hz=args.rate, workers=args.workers,
+                           cache=cache)
+    print(f"Wrote {len(paths)} figures for {len(take_dirs)} takes to {args.output_dir} "
+          f"in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
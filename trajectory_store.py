@@ -0,0 +1,374 @@
+import argparse
+import csv
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from motive_csv import CAPTURE_TIME_FORMAT, body_quaternions, read_motive_csv
+from pose_transforms import POSITION_COLUMNS, QUATERNION_COLUMNS, pose_arrays, quat_normalize
+from timestamp_association import NS_PER_UNIT, decimal_seconds_to_ns, read_csv_stamps_ns, to_ns
+
+# Chunked binary container for pose streams (.traj). Layout:
+#   magic | u8 header length | JSON header | chunk index | chunk 0 | chunk 1 | ...
+# The header holds the pose count, encodings and metadata (frame, units, source, ...);
+# the index has one row per chunk with its first/last stamp, first row, row count and
+# byte offset. A chunk stores its stamps as deltas from the chunk's first stamp (int32
+# when every gap fits, else int64), positions as float32 or float64 and quaternions either
+# as floats or "smallest three" (largest component dropped, the other three as int16,
+# ~1e-5 per component). Every section is 8-byte aligned, so a reader memory-maps the file,
+# finds the chunks overlapping [t0, t1] by binary search on the index and decodes only
+# those as views of the mapping.
+MAGIC = b'TRAJPOS1'
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_SIZE = 4096
+QUATERNION_ENCODINGS = ('smallest3', 'float32', 'float64')
+INDEX_DTYPE = np.dtype([
+    ('start_ns', '<i8'),
+    ('end_ns', '<i8'),
+    ('first_row', '<i8'),
+    ('count', '<i8'),
+    ('offset', '<i8'),
+    ('delta_bytes', '<i8'),
+])
+SMALLEST3_RANGE = 1 / np.sqrt(2)  # the three smaller components of a unit quaternion lie in +-1/sqrt(2)
+INVALID_QUATERNION = 4            # dropped-component index of a NaN (occluded) quaternion
+MOTIVE_UNITS = {'m': 'Meters', 'cm': 'Centimeters', 'mm': 'Millimeters'}
+
+
+def _pad(size, alignment=8):
+    return -size % alignment
+
+
+def encode_smallest3(quaternions):
+    """(N, 3) int16 components and (N,) uint8 index of the dropped (largest) one."""
+    quaternions = np.asarray(quaternions, dtype=np.float64)
+    valid = np.isfinite(quaternions).all(axis=1)
+    q = quat_normalize(np.where(valid[:, None], quaternions, (0.0, 0.0, 0.0, 1.0)))
+    largest = np.abs(q).argmax(axis=1)
+    # q and -q are the same rotation; make the dropped component positive
+    q = q * np.where(np.take_along_axis(q, largest[:, None], axis=1) < 0, -1.0, 1.0)
+    keep = np.array([[j for j in range(4) if j != i] for i in range(4)])[largest]
+    small = np.take_along_axis(q, keep, axis=1)
+    packed = np.rint(np.clip(small / SMALLEST3_RANGE, -1, 1) * 32767).astype(np.int16)
+    return packed, np.where(valid, largest, INVALID_QUATERNION).astype(np.uint8)
+
+
+def decode_smallest3(packed, largest):
+    """Unit quaternions (x, y, z, w) from encode_smallest3 output; NaN rows for invalid ones."""
+    small = packed.astype(np.float64) / 32767 * SMALLEST3_RANGE
+    valid = largest != INVALID_QUATERNION
+    index = np.where(valid, largest, 0).astype(np.int64)
+    dropped = np.sqrt(np.clip(1.0 - np.einsum('ij,ij->i', small, small), 0.0, None))
+    q = np.empty((len(small), 4))
+    keep = np.array([[j for j in range(4) if j != i] for i in range(4)])[index]
+    np.put_along_axis(q, keep, small, axis=1)
+    np.put_along_axis(q, index[:, None], dropped[:, None], axis=1)
+    q[~valid] = np.nan
+    return q
+
+
+def _chunk_layout(count, delta_bytes, position_dtype, quaternion_encoding):
+    """Byte offsets and sizes of the sections of one chunk: {name: (offset, dtype, shape)}."""
+    sections = [('deltas', np.dtype(f'<i{delta_bytes}'), (count,)),
+                ('positions', np.dtype(position_dtype).newbyteorder('<'), (count, 3))]
+    if quaternion_encoding == 'smallest3':
+        sections += [('quaternions', np.dtype('<i2'), (count, 3)), ('largest', np.dtype('u1'), (count,))]
+    else:
+        sections += [('quaternions', np.dtype(quaternion_encoding).newbyteorder('<'), (count, 4))]
+    layout, offset = {}, 0
+    for name, dtype, shape in sections:
+        layout[name] = (offset, dtype, shape)
+        offset += int(np.prod(shape)) * dtype.itemsize
+        offset += _pad(offset)
+    return layout, offset
+
+
+def write_trajectory(path, stamps_ns, positions, quaternions, metadata=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                     position_dtype='float64', quaternion_encoding='smallest3'):
+    """Write a pose stream to a .traj file (rows are put in time order first).
+
+    `metadata` is stored as given (JSON-serializable: frame, units, source, ...).
+    """
+    if quaternion_encoding not in QUATERNION_ENCODINGS:
+        raise ValueError('Unknown quaternion encoding %r, expected one of %s' % (quaternion_encoding, QUATERNION_ENCODINGS))
+    stamps_ns = np.asarray(stamps_ns, dtype=np.int64)
+    order = np.argsort(stamps_ns, kind='stable')
+    stamps_ns = stamps_ns[order]
+    positions = np.asarray(positions, dtype=np.float64)[order]
+    quaternions = np.asarray(quaternions, dtype=np.float64)[order]
+    n = len(stamps_ns)
+    n_chunks = -(-n // chunk_size)
+
+    index = np.zeros(n_chunks, dtype=INDEX_DTYPE)
+    chunks = []
+    for chunk in range(n_chunks):
+        rows = slice(chunk * chunk_size, min((chunk + 1) * chunk_size, n))
+        deltas = stamps_ns[rows] - stamps_ns[rows.start]
+        delta_bytes = 4 if deltas[-1] <= np.iinfo(np.int32).max else 8
+        layout, size = _chunk_layout(len(deltas), delta_bytes, position_dtype, quaternion_encoding)
+        values = {'deltas': deltas, 'positions': positions[rows]}
+        if quaternion_encoding == 'smallest3':
+            values['quaternions'], values['largest'] = encode_smallest3(quaternions[rows])
+        else:
+            values['quaternions'] = quaternions[rows]
+        data = bytearray(size)
+        for name, (offset, dtype, shape) in layout.items():
+            block = np.ascontiguousarray(values[name], dtype=dtype).tobytes()
+            data[offset:offset + len(block)] = block
+        chunks.append(data)
+        index[chunk] = (stamps_ns[rows.start], stamps_ns[rows.stop - 1], rows.start, len(deltas), 0, delta_bytes)
+
+    header = {
+        'version': FORMAT_VERSION,
+        'count': n,
+        'chunk_size': chunk_size,
+        'chunks': n_chunks,
+        'position_dtype': np.dtype(position_dtype).name,
+        'quaternion_encoding': quaternion_encoding,
+        'metadata': metadata or {},
+    }
+    header_bytes = json.dumps(header, sort_keys=True).encode()
+    header_bytes += b' ' * _pad(len(header_bytes))
+    offset = len(MAGIC) + 8 + len(header_bytes) + index.nbytes
+    for chunk, data in enumerate(chunks):
+        index[chunk]['offset'] = offset
+        offset += len(data)
+
+    path = Path(path)
+    temporary = path.with_name(path.name + '.tmp')
+    with open(temporary, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.array(len(header_bytes), dtype='<u8').tobytes())
+        f.write(header_bytes)
+        f.write(index.tobytes())
+        for data in chunks:
+            f.write(data)
+    temporary.replace(path)
+    return header
+
+
+class TrajectoryFile:
+    """Memory-mapped .traj file; `read(t0_ns, t1_ns)` decodes only the chunks overlapping the window."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._map = np.memmap(self.path, dtype=np.uint8, mode='r')
+        if bytes(self._map[:len(MAGIC)]) != MAGIC:
+            raise ValueError('%s is not a trajectory file' % self.path)
+        header_length = int(np.frombuffer(self._map, dtype='<u8', count=1, offset=len(MAGIC))[0])
+        start = len(MAGIC) + 8
+        self.header = json.loads(bytes(self._map[start:start + header_length]))
+        if self.header['version'] != FORMAT_VERSION:
+            raise ValueError('%s has format version %s, expected %s' % (self.path, self.header['version'], FORMAT_VERSION))
+        self.index = np.frombuffer(self._map, dtype=INDEX_DTYPE, count=self.header['chunks'],
+                                   offset=start + header_length)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.index = None
+        self._map = None
+
+    def __len__(self):
+        return self.header['count']
+
+    @property
+    def metadata(self):
+        return self.header['metadata']
+
+    @property
+    def start_ns(self):
+        return int(self.index['start_ns'][0]) if len(self.index) else None
+
+    @property
+    def end_ns(self):
+        return int(self.index['end_ns'][-1]) if len(self.index) else None
+
+    def chunk(self, number):
+        """(stamps_ns, positions, quaternions) of one chunk; positions stay in their stored dtype."""
+        entry = self.index[number]
+        layout, _ = _chunk_layout(int(entry['count']), int(entry['delta_bytes']), self.header['position_dtype'],
+                                  self.header['quaternion_encoding'])
+        sections = {}
+        for name, (offset, dtype, shape) in layout.items():
+            sections[name] = np.frombuffer(self._map, dtype=dtype, count=int(np.prod(shape)),
+                                           offset=int(entry['offset']) + offset).reshape(shape)
+        stamps = entry['start_ns'] + sections['deltas'].astype(np.int64)
+        if self.header['quaternion_encoding'] == 'smallest3':
+            quaternions = decode_smallest3(sections['quaternions'], sections['largest'])
+        else:
+            quaternions = sections['quaternions']
+        return stamps, sections['positions'], quaternions
+
+    def chunks_between(self, t0_ns=None, t1_ns=None):
+        """Numbers of the chunks holding samples in [t0_ns, t1_ns]."""
+        first = 0 if t0_ns is None else int(np.searchsorted(self.index['end_ns'], t0_ns, side='left'))
+        last = len(self.index) if t1_ns is None else int(np.searchsorted(self.index['start_ns'], t1_ns, side='right'))
+        return range(first, last)
+
+    def read(self, t0_ns=None, t1_ns=None):
+        """(stamps_ns, positions, quaternions) of every sample with t0_ns <= stamp <= t1_ns (None: open end)."""
+        parts = [self.chunk(number) for number in self.chunks_between(t0_ns, t1_ns)]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty((0, 3)), np.empty((0, 4))
+        stamps, positions, quaternions = (np.concatenate(arrays) for arrays in zip(*parts))
+        inside = np.ones(len(stamps), dtype=bool)
+        if t0_ns is not None:
+            inside &= stamps >= t0_ns
+        if t1_ns is not None:
+            inside &= stamps <= t1_ns
+        return stamps[inside], positions[inside].astype(np.float64), quaternions[inside].astype(np.float64)
+
+
+def read_trajectory(path, t0_ns=None, t1_ns=None):
+    """(stamps_ns, positions, quaternions, metadata) of a .traj file, optionally only [t0_ns, t1_ns]."""
+    with TrajectoryFile(path) as trajectory:
+        return (*trajectory.read(t0_ns, t1_ns), trajectory.metadata)
+
+
+def ns_to_decimal_seconds(stamps_ns):
+    """Exact decimal second strings ('1723185751.585915800') of int64 nanosecond stamps."""
+    stamps_ns = np.asarray(stamps_ns, dtype=np.int64)
+    whole, fraction = np.divmod(np.abs(stamps_ns), NS_PER_UNIT['s'])
+    text = np.char.add(np.char.add(whole.astype(str), '.'), np.char.zfill(fraction.astype(str), 9))
+    return np.where(stamps_ns < 0, np.char.add('-', text), text)
+
+
+def is_motive_csv(path):
+    with open(path) as f:
+        return f.readline().startswith('Format Version')
+
+
+def odometry_csv_to_trajectory(csv_path, path, frame='FLU', units='m', **options):
+    """Convert an odometry CSV (sec, pos_x, pos_y, pos_z, x, y, z, w in any column order); returns the header."""
+    stamps = read_csv_stamps_ns(csv_path)
+    positions, quaternions = pose_arrays(pd.read_csv(csv_path))
+    metadata = {'frame': frame, 'units': units, 'source': Path(csv_path).name}
+    return write_trajectory(path, stamps, positions, quaternions, metadata, **options)
+
+
+def motive_csv_to_trajectory(motive_path, path, body=None, frame='FUR', **options):
+    """Convert one rigid body of a Motive export (occluded frames are kept as NaN); returns the header.
+
+    Stamps are the export's time column (relative to the take start); the capture start
+    time, frame rate and length units are kept in the metadata.
+    """
+    take = read_motive_csv(motive_path, bodies=[body] if body else None)
+    body = body or next(iter(take['bodies']))
+    info = take['metadata']
+    units = str(info.get('Length Units', 'Meters')).lower()
+    start = info.get('Capture Start Time', '')
+    metadata = {
+        'frame': frame,
+        'units': next((short for short, name in MOTIVE_UNITS.items() if name.lower() == units), units),
+        'source': Path(motive_path).name,
+        'body': body,
+        'capture_start': start if isinstance(start, str) else start.strftime(CAPTURE_TIME_FORMAT),
+        'frame_rate': info.get('Export Frame Rate', info.get('Capture Frame Rate')),
+        'take_name': info.get('Take Name', ''),
+    }
+    return write_trajectory(path, to_ns(take['time']), take['bodies'][body]['position'],
+                            body_quaternions(take, body), metadata, **options)
+
+
+def trajectory_to_odometry_csv(path, csv_path, t0_ns=None, t1_ns=None):
+    """Write (a window of) a .traj file as sec, pos_x, pos_y, pos_z, x, y, z, w; returns the row count."""
+    stamps, positions, quaternions, _ = read_trajectory(path, t0_ns, t1_ns)
+    table = pd.DataFrame({'sec': ns_to_decimal_seconds(stamps)})
+    table[POSITION_COLUMNS] = positions
+    table[QUATERNION_COLUMNS] = quaternions
+    table.to_csv(csv_path, index=False)
+    return len(table)
+
+
+def trajectory_to_motive_csv(path, csv_path, body=None, t0_ns=None, t1_ns=None):
+    """Write (a window of) a .traj file as a single-rigid-body Motive export that read_motive_csv can load.
+
+    Times and frame numbers count from the take start, also for a window: files converted
+    from a Motive export already hold take-relative stamps (matching the stored capture
+    start time), other files count from their first stamp.
+    """
+    with TrajectoryFile(path) as trajectory:
+        stamps, positions, quaternions = trajectory.read(t0_ns, t1_ns)
+        metadata = dict(trajectory.metadata)
+        origin_ns = 0 if 'capture_start' in metadata else (trajectory.start_ns or 0)
+    body = body or metadata.get('body', 'drone')
+    seconds = (stamps - origin_ns) / NS_PER_UNIT['s']
+    rate = metadata.get('frame_rate') or (1.0 / np.median(np.diff(seconds)) if len(seconds) > 1 else 120.0)
+    info = ['Format Version', '1.23', 'Take Name', metadata.get('take_name') or Path(path).stem, 'Take Notes', '',
+            'Capture Frame Rate', f'{rate:.6f}', 'Export Frame Rate', f'{rate:.6f}',
+            'Capture Start Time', metadata.get('capture_start', ''),
+            'Total Frames in Take', str(len(stamps)), 'Total Exported Frames', str(len(stamps)),
+            'Rotation Type', 'Quaternion', 'Length Units', MOTIVE_UNITS.get(metadata.get('units', 'm'), 'Meters'),
+            'Coordinate Space', 'Global']
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(info)
+        writer.writerow([])
+        writer.writerow(['', 'Type'] + ['Rigid Body'] * 7)
+        writer.writerow(['', 'Name'] + [body] * 7)
+        writer.writerow(['', 'ID'] + ['1'] * 7)
+        writer.writerow(['', ''] + ['Rotation'] * 4 + ['Position'] * 3)
+        writer.writerow(['Frame', 'Time (Seconds)', 'X', 'Y', 'Z', 'W', 'X', 'Y', 'Z'])
+        data = pd.DataFrame(np.column_stack((quaternions, positions)))
+        data.insert(0, 'time', seconds)
+        data.insert(0, 'frame', np.rint(seconds * rate).astype(np.int64))
+        data.to_csv(f, header=False, index=False, float_format='%.6f', na_rep='')
+    return len(stamps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert pose streams between CSV / Motive exports and .traj files.')
+    parser.add_argument('input', help='odometry CSV, Motive export or .traj file')
+    parser.add_argument('output', nargs='?', help='.traj, .csv (odometry) or .motive.csv; omit to print the index')
+    parser.add_argument('--start', help='window start in seconds (exact decimal), when reading a .traj')
+    parser.add_argument('--end', help='window end in seconds, when reading a .traj')
+    parser.add_argument('--frame', help='axis convention of the poses (default FLU, FUR for Motive exports)')
+    parser.add_argument('--units', default='m', help='length units of odometry CSV positions')
+    parser.add_argument('--body', help='rigid body of a Motive export (default: the first one)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='poses per chunk')
+    parser.add_argument('--positions', choices=['float32', 'float64'], default='float64', help='stored position type')
+    parser.add_argument('--quaternions', choices=QUATERNION_ENCODINGS, default='smallest3',
+                        help='stored quaternion encoding')
+    args = parser.parse_args()
+
+    source = Path(args.input)
+    t0_ns = int(decimal_seconds_to_ns(args.start)) if args.start else None
+    t1_ns = int(decimal_seconds_to_ns(args.end)) if args.end else None
+    options = {'chunk_size': args.chunk_size, 'position_dtype': args.positions,
+               'quaternion_encoding': args.quaternions}
+
+    if source.suffix == '.traj':
+        if args.output is None:
+            with TrajectoryFile(source) as trajectory:
+                print(json.dumps(trajectory.header, indent=1))
+                for number in trajectory.chunks_between(t0_ns, t1_ns):
+                    entry = trajectory.index[number]
+                    print(f"chunk {number}: {entry['count']} poses, {ns_to_decimal_seconds(entry['start_ns'])} - "
+                          f"{ns_to_decimal_seconds(entry['end_ns'])} s")
+            return
+        if args.output.endswith('.motive.csv'):
+            count = trajectory_to_motive_csv(source, args.output, args.body, t0_ns, t1_ns)
+        else:
+            count = trajectory_to_odometry_csv(source, args.output, t0_ns, t1_ns)
+        print(f"Wrote {count} poses to {args.output}")
+        return
+
+    output = args.output or source.with_suffix('.traj')
+    if is_motive_csv(source):
+        header = motive_csv_to_trajectory(source, output, args.body, args.frame or 'FUR', **options)
+    else:
+        header = odometry_csv_to_trajectory(source, output, args.frame or 'FLU', args.units, **options)
+    size = Path(output).stat().st_size
+    print(f"Wrote {header['count']} poses in {header['chunks']} chunks to {output} "
+          f"({size / 1e6:.2f} MB, {source.stat().st_size / max(size, 1):.1f}x smaller than {source.name})")
+
+
+if __name__ == '__main__':
+    main()
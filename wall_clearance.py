@@ -0,0 +1,479 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from coordinate_frames import convert_points, unit_scale
+from marker_estimation import robust_marker_centres
+from motive_csv import body_markers, read_motive_csv, read_motive_header
+from wall_points import WallPointSet, complete_walls
+from wall_scene import convex_hull_mesh
+
+# Distance from trajectory poses to the reconstructed walls. Wall meshes (RUB, mm, as
+# built in shimonWallCode.py) are converted once into the trajectory frame (FLU, m). A
+# uniform grid around the walls stores, per cell, the few triangles that can be nearest
+# to any point in it, so a pose inside the grid costs one lookup and one exact distance
+# pass over its cell's list; a coarser grid further out catches most of the rest and the
+# remaining poses walk a bounding volume hierarchy. Whole trajectories are queried at
+# once (about 2-3 s per million poses on wall_data_2.csv).
+
+
+def _dot(u, v):
+    return np.einsum('...i,...i', u, v)
+
+
+def _closest_parameters(d1, d2, ab_ab, ab_ac, ac_ac):
+    """Coordinates (s, t) of the closest point a + s*ab + t*ac on a triangle.
+
+    d1 = ab.ap and d2 = ac.ap; the other dot products of Ericson's Voronoi-region test
+    (Real-Time Collision Detection 5.1.5) follow from the edge Gram terms, so only these
+    two depend on the query point.
+    """
+    d3 = d1 - ab_ab
+    d4 = d2 - ab_ac
+    d5 = d1 - ab_ac
+    d6 = d2 - ac_ac
+    vc = d1 * d4 - d3 * d2
+    vb = d5 * d2 - d1 * d6
+    va = d3 * d6 - d5 * d4
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        on_ab = d1 / (d1 - d3)
+        on_ac = d2 / (d2 - d6)
+        on_bc = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        denominator = va + vb + vc
+        inside_s = vb / denominator
+        inside_t = vc / denominator
+
+    # Regions in the order they are tested; the first match wins as in the scalar version
+    conditions = [
+        (d1 <= 0) & (d2 <= 0),                       # vertex a
+        (d3 >= 0) & (d4 <= d3),                      # vertex b
+        (vc <= 0) & (d1 >= 0) & (d3 <= 0),           # edge ab
+        (d6 >= 0) & (d5 <= d6),                      # vertex c
+        (vb <= 0) & (d2 >= 0) & (d6 <= 0),           # edge ac
+        (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0),  # edge bc
+    ]
+    s = np.select(conditions, [0.0, 1.0, on_ab, 0.0, 0.0, 1 - on_bc], inside_s)
+    t = np.select(conditions, [0.0, 0.0, 0.0, 1.0, on_ac, on_bc], inside_t)
+    return s, t
+
+
+def closest_points_on_triangles(points, a, b, c):
+    """Closest point on triangle (a, b, c) to each point; all inputs broadcast over (..., 3)."""
+    ab = b - a
+    ac = c - a
+    ap = points - a
+    s, t = _closest_parameters(_dot(ab, ap), _dot(ac, ap), _dot(ab, ab), _dot(ab, ac), _dot(ac, ac))
+    return a + s[..., None] * ab + t[..., None] * ac
+
+
+def _bounding_radius(corners):
+    """Centroid and distance from the centroid to the furthest corner of each (T, 3, 3) triangle."""
+    centroids = corners.mean(axis=1)
+    return centroids, np.linalg.norm(corners - centroids[:, None], axis=-1).max(axis=1)
+
+
+def split_triangles(corners, max_radius):
+    """Bisect the longest edge of every triangle until all bounding radii are <= max_radius.
+
+    Returns the new (T', 3, 3) corners and the index of the original triangle of each.
+    """
+    source = np.arange(len(corners))
+    done_corners, done_source = [], []
+    while len(corners):
+        _, radius = _bounding_radius(corners)
+        small = radius <= max_radius
+        done_corners.append(corners[small])
+        done_source.append(source[small])
+        corners, source = corners[~small], source[~small]
+        if not len(corners):
+            break
+        # Rotate each triangle so its longest edge runs from corner 0 to corner 1
+        edges = np.linalg.norm(corners - np.roll(corners, -1, axis=1), axis=-1)
+        start = np.argmax(edges, axis=1)
+        order = (start[:, None] + np.arange(3)) % 3
+        corners = np.take_along_axis(corners, order[..., None], axis=1)
+        middle = (corners[:, 0] + corners[:, 1]) / 2
+        first = np.stack((corners[:, 0], middle, corners[:, 2]), axis=1)
+        second = np.stack((middle, corners[:, 1], corners[:, 2]), axis=1)
+        corners = np.concatenate((first, second))
+        source = np.concatenate((source, source))
+    return np.concatenate(done_corners), np.concatenate(done_source)
+
+
+def _triangle_terms(corners, centre):
+    """Per-triangle terms of _squared_distances, one row per term so gathered columns stay contiguous.
+
+    Corner a is taken relative to `centre`; points are shifted the same way.
+    """
+    a = corners[:, 0] - centre
+    ab = corners[:, 1] - corners[:, 0]
+    ac = corners[:, 2] - corners[:, 0]
+    normal = np.cross(ab, ac)
+    normal /= np.linalg.norm(normal, axis=1)[:, None]
+    ab_ab, ab_ac, ac_ac = _dot(ab, ab), _dot(ab, ac), _dot(ac, ac)
+    bc_bc = ac_ac - 2 * ab_ac + ab_ab
+    return np.stack((*ab.T, *ac.T, *a.T, *normal.T, ab_ab, ab_ac, ac_ac,
+                     1 / (ab_ab * ac_ac - ab_ac * ab_ac), 1 / ab_ab, 1 / ac_ac, 1 / bc_bc))
+
+
+def _squared_distances(points, terms):
+    """Squared distance from each of n points to its triangles, given as (19, n, k) gathered terms.
+
+    The closest point is the projection onto the plane when that falls inside the triangle
+    and otherwise the nearest point on one of the three edges; the edge terms are expanded
+    in ab.ap, ac.ap and ap.ap, so there is no branching per pair. The plane distance uses
+    the unit normal, which stays accurate for sliver triangles.
+    """
+    abx, aby, abz, acx, acy, acz, ax, ay, az, nx, ny, nz = terms[:12]
+    ab_ab, ab_ac, ac_ac, inv_det, inv_ab, inv_ac, inv_bc = terms[12:]
+    apx, apy, apz = points[:, 0, None] - ax, points[:, 1, None] - ay, points[:, 2, None] - az
+    d1 = abx * apx + aby * apy + abz * apz
+    d2 = acx * apx + acy * apy + acz * apz
+    ap_ap = apx * apx + apy * apy + apz * apz
+    s = (ac_ac * d1 - ab_ac * d2) * inv_det
+    t = (ab_ab * d2 - ab_ac * d1) * inv_det
+    inside = (s >= 0) & (t >= 0) & (s + t <= 1)
+    plane = nx * apx + ny * apy + nz * apz
+    plane *= plane
+    u = np.clip(d1 * inv_ab, 0, 1)
+    edge_ab = ap_ap - u * (2 * d1 - u * ab_ab)
+    v = np.clip(d2 * inv_ac, 0, 1)
+    edge_ac = ap_ap - v * (2 * d2 - v * ac_ac)
+    bc_bp = d2 - d1 - ab_ac + ab_ab           # (c - b).(p - b)
+    w = np.clip(bc_bp * inv_bc, 0, 1)
+    edge_bc = (ap_ap - 2 * d1 + ab_ab) - w * (2 * bc_bp - w * (ac_ac - 2 * ab_ac + ab_ab))
+    return np.where(inside, plane, np.minimum(np.minimum(edge_ab, edge_ac), edge_bc))
+
+
+def _box_distance(points, lower, upper):
+    """Distance from each point to the matching axis-aligned box (0 inside)."""
+    gap = np.maximum(np.maximum(lower - points, points - upper), 0.0)
+    return np.sqrt(np.einsum('ij,ij->i', gap, gap))
+
+
+class ClearanceIndex:
+    """Nearest-wall queries for batches of points against a set of named triangle meshes.
+
+    `meshes` maps a wall name to (vertices, triangles) already in the query frame and units.
+    Points within `margin` of the walls' bounding box are answered from a grid of
+    `cell_size` cells (enlarged so there are at most max_cells) holding each cell's
+    candidate triangles; each further grid level has 4x the cell size and margin. Points
+    outside all of them walk a bounding volume hierarchy of axis-aligned boxes level by
+    level, a whole chunk at once, dropping every (point, box) pair whose box is further
+    away than the best triangle found for that point so far. With max_radius, triangles
+    are split until they fit in spheres of that radius.
+    """
+
+    def __init__(self, meshes, max_radius=None, leaf_size=8, cell_size=0.25, margin=1.0, grid_levels=2,
+                 max_cells=1 << 18):
+        self.wall_names = list(meshes)
+        corners, walls = [], []
+        for index, (vertices, triangles) in enumerate(meshes.values()):
+            triangle_corners = np.asarray(vertices, dtype=np.float64)[np.asarray(triangles)]
+            # Zero-area triangles have no well-defined closest point and add nothing
+            area = np.linalg.norm(np.cross(triangle_corners[:, 1] - triangle_corners[:, 0],
+                                           triangle_corners[:, 2] - triangle_corners[:, 0]), axis=1)
+            triangle_corners = triangle_corners[area > 0]
+            corners.append(triangle_corners)
+            walls.append(np.full(len(triangle_corners), index, dtype=np.int32))
+        if not sum(len(c) for c in corners):
+            raise ValueError('No wall triangles to index')
+        self.corners = np.concatenate(corners)
+        self.wall_index = np.concatenate(walls)
+        if max_radius is not None:
+            self.corners, source = split_triangles(self.corners, max_radius)
+            self.wall_index = self.wall_index[source]
+        self.centroids = self.corners.mean(axis=1)
+        self._centre = (self.corners.reshape(-1, 3).min(axis=0) + self.corners.reshape(-1, 3).max(axis=0)) / 2
+        self._terms = _triangle_terms(self.corners, self._centre)
+        self._build(leaf_size)
+        self.tree = cKDTree(self.centroids)
+        self.grids = [self._build_grid(cell_size * 4 ** level, margin * 4 ** level, max_cells)
+                      for level in range(grid_levels)]
+
+    def _build(self, leaf_size):
+        """Median-split hierarchy; leaves hold up to leaf_size triangles (padded with -1)."""
+        order = np.arange(len(self.corners))
+        lower_corner = self.corners.min(axis=1)
+        upper_corner = self.corners.max(axis=1)
+        lower, upper, children, leaves = [], [], [], []
+        stack = [(0, len(order), -1, 0)]
+        while stack:
+            start, end, parent, side = stack.pop()
+            node = len(lower)
+            if parent >= 0:
+                children[parent][side] = node
+            members = order[start:end]
+            lower.append(lower_corner[members].min(axis=0))
+            upper.append(upper_corner[members].max(axis=0))
+            if end - start <= leaf_size:
+                children.append([-1, -1])
+                leaves.append((node, members))
+                continue
+            children.append([0, 0])
+            centres = self.centroids[members]
+            axis = np.argmax(np.ptp(centres, axis=0))
+            middle = (end - start) // 2
+            order[start:end] = members[np.argpartition(centres[:, axis], middle)]
+            stack.append((start + middle, end, node, 1))
+            stack.append((start, start + middle, node, 0))
+
+        self.node_lower = np.array(lower)
+        self.node_upper = np.array(upper)
+        self.node_children = np.array(children, dtype=np.int64)
+        self.node_triangles = np.full((len(lower), leaf_size), -1, dtype=np.int64)
+        for node, members in leaves:
+            self.node_triangles[node, :len(members)] = members
+
+    def _distances(self, points, block=1 << 18):
+        """Exact (n, T) distances from points to every triangle."""
+        distances = np.empty((len(points), len(self.corners)))
+        a, b, c = self.corners[:, 0], self.corners[:, 1], self.corners[:, 2]
+        step = max(1, block // len(self.corners))
+        for start in range(0, len(points), step):
+            chunk = points[start:start + step, None]
+            closest = closest_points_on_triangles(chunk, a, b, c)
+            distances[start:start + step] = np.linalg.norm(closest - chunk, axis=-1)
+        return distances
+
+    def _build_grid(self, cell_size, margin, max_cells):
+        """Grid of the candidate triangles of every cell (padded with -1), built one x slab at a time.
+
+        A triangle is a candidate when its lower bound over the cell (distance from the cell
+        centre less the half diagonal, or from the cell to the triangle's box) is within the
+        smallest upper bound: a triangle's largest distance to the cell's eight corners, as
+        the distance to a triangle is convex and peaks at a corner of the box.
+        """
+        vertices = self.corners.reshape(-1, 3)
+        lower = vertices.min(axis=0) - margin
+        extent = vertices.max(axis=0) + margin - lower
+        cell_size = max(cell_size, float(np.cbrt(np.prod(extent) / max_cells)))
+        shape = np.maximum(np.ceil(extent / cell_size).astype(np.int64), 1)
+        edges = [lower[axis] + cell_size * np.arange(shape[axis] + 1) for axis in range(3)]
+        half = cell_size / 2
+        box_lower, box_upper = self.corners.min(axis=1), self.corners.max(axis=1)
+        corner_yz = np.stack(np.meshgrid(edges[1], edges[2], indexing='ij'), axis=-1).reshape(-1, 2)
+        centre_yz = np.stack(np.meshgrid(edges[1][:-1] + half, edges[2][:-1] + half, indexing='ij'),
+                             axis=-1).reshape(-1, 2)
+
+        def corner_distances(x):
+            plane = np.column_stack((np.full(len(corner_yz), x), corner_yz))
+            return self._distances(plane).reshape(shape[1] + 1, shape[2] + 1, -1)
+
+        keep = []
+        following = corner_distances(edges[0][0])
+        for i in range(shape[0]):
+            preceding, following = following, corner_distances(edges[0][i + 1])
+            upper = np.maximum(preceding, following)
+            upper = np.maximum(upper[:-1], upper[1:])
+            upper = np.maximum(upper[:, :-1], upper[:, 1:]).reshape(-1, len(self.corners))
+            centres = np.column_stack((np.full(len(centre_yz), edges[0][i] + half), centre_yz))
+            gap = np.maximum(np.maximum(box_lower - (centres[:, None] + half),
+                                        (centres[:, None] - half) - box_upper), 0)
+            bound = np.maximum(self._distances(centres) - np.sqrt(3) * half, np.sqrt(_dot(gap, gap)))
+            # The slack covers rounding in the cell lookup of points on a cell boundary
+            keep.append(bound <= upper.min(axis=1, keepdims=True) + 1e-9 * cell_size)
+        keep = np.concatenate(keep)
+        count = keep.sum(axis=1)
+        order = np.argsort(~keep, axis=1, kind='stable')[:, :count.max()]
+        candidates = np.where(np.take_along_axis(keep, order, axis=1), order, -1)
+        return {'lower': lower, 'cell_size': cell_size, 'shape': shape, 'candidates': candidates, 'count': count}
+
+    @staticmethod
+    def _cells(grid, points):
+        """Flat grid cell of each point, -1 outside the grid."""
+        ijk = np.floor((points - grid['lower']) / grid['cell_size']).astype(np.int64)
+        inside = ((ijk >= 0) & (ijk < grid['shape'])).all(axis=1)
+        cells = np.full(len(points), -1, dtype=np.int64)
+        cells[inside] = np.ravel_multi_index(ijk[inside].T, grid['shape'])
+        return cells
+
+    @classmethod
+    def from_wall_meshes(cls, meshes, source='RUB', source_units='mm', target='FLU', target_units='m',
+                         **kwargs):
+        """Index meshes given in the wall frame (RUB, mm by default), converted to the query frame."""
+        converted = {name: (convert_points(vertices, source, target, source_units, target_units), triangles)
+                     for name, (vertices, triangles) in meshes.items()}
+        return cls(converted, **kwargs)
+
+    def _nearest(self, points, candidates):
+        """(clearance, triangle, closest point) of each point over its (n, k) candidate triangles (-1 = none)."""
+        squared = _squared_distances(points - self._centre, self._terms[:, np.maximum(candidates, 0)])
+        squared[candidates < 0] = np.inf
+        best = np.argmin(squared, axis=1)
+        triangle = candidates[np.arange(len(points)), best]
+        # Exact distance for the winners; the expanded form above only ranks candidates
+        corners = self.corners[triangle]
+        closest = closest_points_on_triangles(points, corners[:, 0], corners[:, 1], corners[:, 2])
+        clearance = np.linalg.norm(closest - points, axis=1)
+        clearance[triangle < 0] = np.inf
+        return clearance, triangle, closest
+
+    def _consider(self, points, rows, candidates, state):
+        """Exact distances from points[rows] to their (len(rows), k) candidate triangles (-1 = none).
+
+        A point may appear in several rows; the closest triangle over all of them is kept.
+        """
+        clearance, triangle, closest = state
+        distance, chosen, point = self._nearest(points[rows], candidates)
+        # Closest pair per point: sort by (point, distance) and take the first of each point
+        order = np.lexsort((distance, rows))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = rows[order][1:] != rows[order][:-1]
+        order = order[first]
+        order = order[distance[order] < clearance[rows[order]]]
+        target = rows[order]
+        clearance[target] = distance[order]
+        triangle[target] = chosen[order]
+        closest[target] = point[order]
+
+    def _query_chunk(self, points, k, workers, max_pairs):
+        n = len(points)
+        state = (np.full(n, np.inf), np.zeros(n, dtype=np.int64), np.full((n, 3), np.nan))
+        clearance = state[0]
+
+        # Upper bound from the triangles with the nearest centroids
+        k = min(k, len(self.corners))
+        _, candidates = self.tree.query(points, k=k, workers=workers)
+        self._consider(points, np.arange(n), candidates.reshape(n, k), state)
+
+        # Walk (point, node) pairs one tree level at a time, pruned by each point's current bound
+        pending = [(np.arange(n), np.zeros(n, dtype=np.int64))]
+        while pending:
+            rows, nodes = pending.pop()
+            if len(rows) > max_pairs:
+                pending.extend((rows[i:i + max_pairs], nodes[i:i + max_pairs])
+                               for i in range(0, len(rows), max_pairs))
+                continue
+            near = _box_distance(points[rows], self.node_lower[nodes], self.node_upper[nodes]) < clearance[rows]
+            rows, nodes = rows[near], nodes[near]
+            leaf = self.node_children[nodes, 0] < 0
+            if leaf.any():
+                self._consider(points, rows[leaf], self.node_triangles[nodes[leaf]], state)
+            rows, nodes = rows[~leaf], nodes[~leaf]
+            if len(rows):
+                pending.append((np.repeat(rows, 2), self.node_children[nodes].ravel()))
+        return state
+
+    def query(self, points, k=4, chunk_size=4096, max_pairs=1 << 18, workers=-1):
+        """Minimum distance from each Nx3 point to the walls.
+
+        Returns (clearance (N,), wall index (N,) into wall_names, closest wall point (N, 3)).
+        NaN points get NaN clearance and wall index -1. Points are handled chunk_size at a
+        time in the grids and 16 times that in the hierarchy, where max_pairs bounds the
+        number of (point, node) pairs handled at once.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        clearance = np.full(len(points), np.nan)
+        wall = np.full(len(points), -1, dtype=np.int32)
+        closest = np.full((len(points), 3), np.nan)
+        outside = np.flatnonzero(np.isfinite(points).all(axis=1))
+        for grid in self.grids:
+            cells = self._cells(grid, points[outside])
+            gridded, outside, cells = outside[cells >= 0], outside[cells < 0], cells[cells >= 0]
+            # Points with similar candidate counts go together, so little of each chunk is padding
+            widths = -(-grid['count'][cells] // 4) * 4
+            for width in np.unique(widths):
+                group = np.flatnonzero(widths == width)
+                for start in range(0, len(group), chunk_size):
+                    part = group[start:start + chunk_size]
+                    rows = gridded[part]
+                    clearance[rows], triangle, closest[rows] = self._nearest(
+                        points[rows], grid['candidates'][cells[part], :width])
+                    wall[rows] = self.wall_index[triangle]
+        for start in range(0, len(outside), 16 * chunk_size):
+            rows = outside[start:start + 16 * chunk_size]
+            clearance[rows], triangle, closest[rows] = self._query_chunk(points[rows], k, workers, max_pairs)
+            wall[rows] = self.wall_index[triangle]
+        return clearance, wall, closest
+
+
+def marker_wall_meshes(path, wall_names=None):
+    """Convex hull (RUB, mm) of each wall surveyed in a Motive export, built as in shimonWallCode.py.
+
+    The marker centres get the same fix-ups (wall_points.complete_walls): wall_2 extended
+    down to the floor and the shared wall_3 / wall_4 corner points.
+    """
+    if wall_names is None:
+        _, columns, _ = read_motive_header(path)
+        wall_names = [name for (entity_type, name) in columns if entity_type == 'Rigid Body']
+    take = read_motive_csv(path, bodies=wall_names, markers=[f'{name}:*' for name in wall_names])
+    units = take['metadata'].get('Length Units', 'Meters')
+    walls = {}
+    for name in wall_names:
+        block = np.concatenate([take['bodies'][name]['position'][:, None, :], body_markers(take, name)], axis=1)
+        centres = robust_marker_centres(block)['centre']
+        locations = convert_points(centres, 'NUE', 'RUB', source_units=units, target_units='mm')
+        walls[name] = WallPointSet.from_locations(locations)
+    complete_walls(walls)
+    return {name: convex_hull_mesh(points.locations) for name, points in walls.items() if len(points) >= 4}
+
+
+def load_trajectory(path, body=None, units='m', frame=None, origin=None):
+    """(positions (N, 3) in the walls' FLU metre frame, time (N,) s) from a Motive export or an odometry CSV.
+
+    Motive exports carry their own frame and length units. An odometry CSV only lines up
+    with the walls when it is expressed in the Motive room: `frame` names its axes (e.g.
+    'FUR' for Motive's Y-up global frame), `units` its length units and `origin` the
+    position of the Motive origin in its coordinates (subtracted before the conversion).
+    """
+    try:
+        metadata, columns, _ = read_motive_header(path)
+    except (ValueError, StopIteration):
+        if frame is None:
+            raise ValueError(f"{path} is not a Motive export; give the frame of its positions in the Motive "
+                             "room (e.g. 'FUR') to compare it with the walls")
+        odometry = pd.read_csv(path)
+        time = odometry['sec'].to_numpy(dtype=np.float64)
+        positions = odometry[['pos_x', 'pos_y', 'pos_z']].to_numpy(dtype=np.float64)
+        return convert_points(positions, frame, 'FLU', source_units=units, origin=origin), time
+    if body is None:
+        body = next(name for (entity_type, name) in columns if entity_type == 'Rigid Body')
+    take = read_motive_csv(path, bodies=[body])
+    scale = unit_scale(metadata.get('Length Units', 'Meters'))
+    positions = convert_points(take['bodies'][body]['position'], 'FUR', 'FLU') * scale
+    return positions, take['time']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-pose clearance between a trajectory and the surveyed walls.')
+    parser.add_argument('walls', help='Motive export with the wall rigid bodies and their markers')
+    parser.add_argument('trajectory', help='Motive export or odometry CSV (pos_x, pos_y, pos_z)')
+    parser.add_argument('--body', help='rigid body to read from a Motive trajectory (default: first)')
+    parser.add_argument('--units', default='m', help='length units of an odometry CSV trajectory')
+    parser.add_argument('--frame', help="axes of an odometry CSV trajectory in the Motive room, e.g. FUR "
+                                        "(required for odometry CSVs)")
+    parser.add_argument('--origin', type=float, nargs=3, metavar=('X', 'Y', 'Z'),
+                        help='position of the Motive origin in the odometry CSV coordinates (default: 0 0 0)')
+    parser.add_argument('--near-miss', type=float, default=0.3, help='clearance threshold in metres')
+    parser.add_argument('--output', help='optional CSV with time, clearance and closest wall per pose')
+    args = parser.parse_args()
+
+    index = ClearanceIndex.from_wall_meshes(marker_wall_meshes(args.walls))
+    try:
+        positions, time = load_trajectory(args.trajectory, args.body, args.units, args.frame, args.origin)
+    except ValueError as error:
+        parser.error(str(error))
+    clearance, wall, _ = index.query(positions)
+
+    names = np.asarray(index.wall_names + [''], dtype=object)[wall]
+    valid = np.isfinite(clearance)
+    near = valid & (clearance < args.near_miss)
+    print(f"{valid.sum()} poses against {len(index.wall_names)} walls ({len(index.corners)} triangles)")
+    if valid.any():
+        closest = np.nanargmin(clearance)
+        print(f"Minimum clearance {clearance[closest]:.3f} m to {names[closest]} at t={time[closest]:.3f} s")
+    print(f"{near.sum()} poses closer than {args.near_miss} m")
+    for name in index.wall_names:
+        count = np.sum(near & (names == name))
+        if count:
+            print(f"  {name}: {count}")
+    if args.output:
+        pd.DataFrame({'time': time, 'clearance': clearance, 'wall': names}).to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
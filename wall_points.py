@@ -0,0 +1,131 @@
+import numpy as np
+
+# Columnar storage for wall survey points (RUB frame, millimetres). A set holds one Nx3
+# location array and a uint8 type code per point instead of one object per marker, so
+# classification, marker offsets and translation are single array operations.
+
+# Type codes index POINT_TYPES, TYPE_OFFSETS and TYPE_COLORS
+POINT_TYPES = ('bottom', 'middle', 'top')
+BOTTOM, MIDDLE, TOP = range(len(POINT_TYPES))
+
+# Heights (y, mm) separating bottom / middle / top markers
+TYPE_BOUNDARIES = np.array([50.0, 1200.0])
+
+# Marker centre to panel surface offsets for each type
+TYPE_OFFSETS = np.array([
+    [0, -20, -12.5],   # bottom
+    [0, -20, 0],       # middle
+    [20, -12.5, -20],  # top
+])
+
+# Visualization colours: bottom blue, middle green, top red
+TYPE_COLORS = np.array([
+    [0, 0, 1],
+    [0, 1, 0],
+    [1, 0, 0],
+], dtype=np.float64)
+
+
+def classify_points(locations):
+    """uint8 type code of every point from its height (y < 50 bottom, y < 1200 middle, else top)."""
+    locations = np.asarray(locations, dtype=np.float64).reshape(-1, 3)
+    return np.digitize(locations[:, 1], TYPE_BOUNDARIES).astype(np.uint8)
+
+
+class WallPointSet:
+    """Nx3 point locations with their type codes."""
+
+    def __init__(self, locations=None, types=None):
+        if locations is None:
+            locations = np.empty((0, 3))
+        self.locations = np.array(locations, dtype=np.float64).reshape(-1, 3)
+        self.types = classify_points(self.locations) if types is None else np.asarray(types, dtype=np.uint8)
+        if len(self.types) != len(self.locations):
+            raise ValueError('Got %d types for %d locations' % (len(self.types), len(self.locations)))
+
+    @classmethod
+    def from_locations(cls, locations):
+        """Classify raw marker locations by height and apply the per-type marker offsets."""
+        points = cls(locations)
+        points.locations += TYPE_OFFSETS[points.types]
+        return points
+
+    @classmethod
+    def concatenate(cls, point_sets):
+        """One set holding the points of all the given sets, in order."""
+        point_sets = list(point_sets)
+        if not point_sets:
+            return cls()
+        return cls(np.concatenate([p.locations for p in point_sets]),
+                   np.concatenate([p.types for p in point_sets]))
+
+    def __len__(self):
+        return len(self.locations)
+
+    def extend(self, other):
+        """Append the points of another set in place."""
+        self.locations = np.concatenate([self.locations, other.locations])
+        self.types = np.concatenate([self.types, other.types])
+
+    def translate(self, vector):
+        """Move every point by a 3-vector (or one vector per point)."""
+        self.locations += np.asarray(vector, dtype=np.float64)
+
+    def copy(self):
+        return WallPointSet(self.locations.copy(), self.types.copy())
+
+    def select(self, point_type):
+        """Locations of the points of one type ('bottom', 'middle' or 'top')."""
+        return self.locations[self.types == POINT_TYPES.index(point_type)]
+
+    @property
+    def type_names(self):
+        return np.asarray(POINT_TYPES)[self.types]
+
+    @property
+    def colors(self):
+        """Nx3 RGB colour of every point by type."""
+        return TYPE_COLORS[self.types]
+
+    def bounds(self):
+        """(min, max) corners of the axis-aligned bounding box."""
+        return self.locations.min(axis=0), self.locations.max(axis=0)
+
+
+# Survey fix-ups of the wall_data_2 room, shared by shimonWallCode.py (display) and
+# wall_clearance.py (distances) so both see the same hulls: wall_2's markers stop above
+# the floor, so its hull is extended down by LOWER_EXTENSION, and wall_3 / wall_4 share
+# two points on their common corner so their hulls meet.
+LOWER_EXTENSION = 500.0  # mm below wall_2's lowest marker
+CORNER_HALF_HEIGHT = 1000.0  # mm above and below the mean marker height
+
+
+def temporary_lower_points(points, drop=LOWER_EXTENSION):
+    """Two points `drop` mm below the lowest point of a set, at its x extremes and minimum z."""
+    (min_x, min_y, min_z), (max_x, _, _) = points.bounds()
+    return WallPointSet.from_locations([
+        [min_x, min_y - drop, min_z],
+        [max_x, min_y - drop, min_z],
+    ])
+
+
+def intersection_points(wall_3, wall_4, half_height=CORNER_HALF_HEIGHT):
+    """Two points on the corner where wall_3 (a constant-z wall) meets wall_4 (a constant-x wall)."""
+    wall_3_z = wall_3.locations[:, 2].mean()
+    wall_4_x = wall_4.locations[:, 0].mean()
+    common_y = np.concatenate([wall_3.locations[:, 1], wall_4.locations[:, 1]]).mean()
+    return WallPointSet.from_locations([
+        [wall_4_x, common_y + half_height, wall_3_z],
+        [wall_4_x, common_y - half_height, wall_3_z],
+    ])
+
+
+def complete_walls(walls):
+    """Apply the survey fix-ups in place to {wall name: WallPointSet}; walls that are missing are skipped."""
+    if 'wall_2' in walls and len(walls['wall_2']):
+        walls['wall_2'].extend(temporary_lower_points(walls['wall_2']))
+    if len(walls.get('wall_3', ())) and len(walls.get('wall_4', ())):
+        corner = intersection_points(walls['wall_3'], walls['wall_4'])
+        walls['wall_3'].extend(corner)
+        walls['wall_4'].extend(corner)
+    return walls
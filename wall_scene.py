@@ -0,0 +1,232 @@
+import hashlib
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from scipy.spatial import ConvexHull, QhullError
+
+# Scene assembly for the wall visualizations. Geometry is gathered as plain vertex /
+# triangle / colour arrays (panels are instances of a cached STL, markers are instances
+# of one sphere template) and merged into a single Open3D mesh and point cloud at the
+# end, so the visualizer receives a handful of geometries instead of one per marker.
+# open3d is only imported when the Open3D objects are built; everything else is numpy.
+
+# Binary STL: 80 byte header, uint32 triangle count, then one 50 byte record per triangle
+STL_RECORD = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attribute', '<u2'),
+])
+
+PANEL_COLOR = (0.5, 0.5, 0.5)
+HULL_COLOR = (0.8, 0.8, 0.8)
+
+
+def _parse_stl(data):
+    """Triangle corner coordinates (T, 3, 3) from the bytes of a binary or ASCII STL file."""
+    if len(data) >= 84:
+        count = int(np.frombuffer(data, dtype='<u4', count=1, offset=80)[0])
+        if len(data) == 84 + count * STL_RECORD.itemsize:
+            return np.frombuffer(data, dtype=STL_RECORD, count=count, offset=84)['vertices']
+    # ASCII files start with 'solid' (binary headers may too, hence the size check above)
+    values = re.findall(rb'vertex\s+(\S+)\s+(\S+)\s+(\S+)', data)
+    if not values:
+        raise ValueError('Not an STL file')
+    return np.array(values, dtype=np.float64).reshape(-1, 3, 3)
+
+
+def read_stl(path):
+    """(vertices (3T, 3), triangles (T, 3)) of an STL file, one vertex per triangle corner."""
+    corners = _parse_stl(Path(path).read_bytes())
+    vertices = np.ascontiguousarray(corners, dtype=np.float64).reshape(-1, 3)
+    triangles = np.arange(len(vertices), dtype=np.int32).reshape(-1, 3)
+    return vertices, triangles
+
+
+@lru_cache(maxsize=32)
+def _cached_stl(path, size, mtime_ns, cache_dir):
+    cache_file = None
+    if cache_dir is not None:
+        key = hashlib.sha1(f'{path}:{size}:{mtime_ns}'.encode()).hexdigest()[:16]
+        cache_file = Path(cache_dir) / f'{Path(path).stem}-{key}.npz'
+        if cache_file.exists():
+            with np.load(cache_file) as cached:
+                vertices, triangles = cached['vertices'], cached['triangles']
+            cache_file = None
+    if cache_file is not None or cache_dir is None:
+        vertices, triangles = read_stl(path)
+    if cache_file is not None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(cache_file, vertices=vertices, triangles=triangles)
+    vertices.setflags(write=False)
+    triangles.setflags(write=False)
+    return vertices, triangles
+
+
+def load_stl(path, cache_dir=None):
+    """read_stl memoized per process, and optionally in cache_dir as .npz across runs.
+
+    Entries are keyed on the file's size and modification time, so an edited STL is
+    re-read. The returned arrays are shared and read-only.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    return _cached_stl(str(path), stat.st_size, stat.st_mtime_ns,
+                       None if cache_dir is None else str(cache_dir))
+
+
+def pivot_transforms(pivots, rotation, offset=(0, 0, 0)):
+    """(K, 4, 4) placements that shift a mesh by offset, then rotate it about each pivot.
+
+    Equivalent to mesh.translate(offset); mesh.translate(pivot);
+    mesh.rotate(rotation, center=pivot) for each pivot.
+    """
+    pivots = np.asarray(pivots, dtype=np.float64).reshape(-1, 3)
+    rotation = np.asarray(rotation, dtype=np.float64)
+    transforms = np.tile(np.eye(4), (len(pivots), 1, 1))
+    transforms[:, :3, :3] = rotation
+    transforms[:, :3, 3] = pivots + rotation @ np.asarray(offset, dtype=np.float64)
+    return transforms
+
+
+def instance_mesh(vertices, triangles, transforms):
+    """Place copies of one mesh with (K, 4, 4) transforms; returns merged (vertices, triangles)."""
+    transforms = np.asarray(transforms, dtype=np.float64).reshape(-1, 4, 4)
+    placed = np.einsum('kij,vj->kvi', transforms[:, :3, :3], vertices) + transforms[:, None, :3, 3]
+    offsets = np.arange(len(transforms), dtype=np.int32) * len(vertices)
+    merged = np.asarray(triangles, dtype=np.int32)[None] + offsets[:, None, None]
+    return placed.reshape(-1, 3), merged.reshape(-1, 3)
+
+
+@lru_cache(maxsize=8)
+def sphere_template(radius=10.0, resolution=10):
+    """(vertices, triangles) of a UV sphere centred on the origin."""
+    polar = np.linspace(0, np.pi, resolution + 1)[1:-1]
+    azimuth = np.linspace(0, 2 * np.pi, 2 * resolution, endpoint=False)
+    ring = np.stack(np.meshgrid(polar, azimuth, indexing='ij'), axis=-1).reshape(-1, 2)
+    vertices = np.vstack([
+        [0, 0, radius],
+        radius * np.column_stack((np.sin(ring[:, 0]) * np.cos(ring[:, 1]),
+                                  np.sin(ring[:, 0]) * np.sin(ring[:, 1]),
+                                  np.cos(ring[:, 0]))),
+        [0, 0, -radius],
+    ])
+
+    n_rings, n_around = len(polar), len(azimuth)
+    index = 1 + np.arange(n_rings * n_around).reshape(n_rings, n_around)
+    following = np.roll(index, -1, axis=1)
+    top = np.column_stack((np.zeros(n_around, dtype=np.int64), index[0], following[0]))
+    bottom_pole = len(vertices) - 1
+    bottom = np.column_stack((np.full(n_around, bottom_pole), following[-1], index[-1]))
+    upper = np.stack((index[:-1], index[1:], following[1:]), axis=-1).reshape(-1, 3)
+    lower = np.stack((index[:-1], following[1:], following[:-1]), axis=-1).reshape(-1, 3)
+    triangles = np.vstack((top, upper, lower, bottom)).astype(np.int32)
+    vertices.setflags(write=False)
+    triangles.setflags(write=False)
+    return vertices, triangles
+
+
+def box_mesh(width, height, depth, origin=(0, 0, 0)):
+    """(vertices, triangles) of an axis-aligned box spanning origin to origin + size."""
+    corners = np.array([[x, y, z] for x in (0, width) for y in (0, height) for z in (0, depth)], dtype=np.float64)
+    triangles = np.array([
+        [0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5],  # x = 0, x = width
+        [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6],  # y = 0, y = height
+        [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3],  # z = 0, z = depth
+    ], dtype=np.int32)
+    return corners + np.asarray(origin, dtype=np.float64), triangles
+
+
+def convex_hull_mesh(points):
+    """(vertices, triangles) of the convex hull of Nx3 points, with outward-facing triangles.
+
+    Nearly planar point sets (a wall's markers) are joggled rather than rejected.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    try:
+        hull = ConvexHull(points)
+    except QhullError:
+        hull = ConvexHull(points, qhull_options='QJ')
+    triangles = hull.simplices.astype(np.int32)
+    corners = points[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    inward = np.einsum('ij,ij->i', normals, corners.mean(axis=1) - points[hull.vertices].mean(axis=0)) < 0
+    triangles[inward] = triangles[inward][:, ::-1]
+    return points, triangles
+
+
+class SceneBuilder:
+    """Collects meshes and marker glyphs as arrays and builds them as one Open3D mesh."""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self._vertices = []
+        self._triangles = []
+        self._colors = []
+        self._count = 0
+        self._points = []
+        self._point_colors = []
+        self._extra = []
+
+    def add_mesh(self, vertices, triangles, color=HULL_COLOR):
+        """Add a mesh with one colour, or one colour per vertex."""
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        colors = np.broadcast_to(np.asarray(color, dtype=np.float64), vertices.shape)
+        self._vertices.append(vertices)
+        self._triangles.append(np.asarray(triangles, dtype=np.int32) + self._count)
+        self._colors.append(colors)
+        self._count += len(vertices)
+
+    def add_markers(self, locations, colors, radius=10.0, resolution=10, as_points=False):
+        """Add a sphere (or a single point) per marker location, coloured per marker."""
+        locations = np.asarray(locations, dtype=np.float64).reshape(-1, 3)
+        colors = np.broadcast_to(np.asarray(colors, dtype=np.float64), locations.shape)
+        if as_points:
+            self._points.append(locations)
+            self._point_colors.append(colors)
+            return
+        vertices, triangles = sphere_template(radius, resolution)
+        placed = (vertices[None] + locations[:, None]).reshape(-1, 3)
+        offsets = np.arange(len(locations), dtype=np.int32) * len(vertices)
+        merged = (triangles[None] + offsets[:, None, None]).reshape(-1, 3)
+        self.add_mesh(placed, merged, np.repeat(colors, len(vertices), axis=0))
+
+    def add_panels(self, stl_path, transforms, color=PANEL_COLOR):
+        """Add one instance of an STL panel per (4, 4) transform."""
+        vertices, triangles = load_stl(stl_path, cache_dir=self.cache_dir)
+        self.add_mesh(*instance_mesh(vertices, triangles, transforms), color=color)
+
+    def add_geometry(self, geometry):
+        """Pass an Open3D geometry through to the scene unchanged."""
+        self._extra.append(geometry)
+
+    def build(self):
+        """The collected scene as a list of Open3D geometries."""
+        import open3d as o3d
+
+        geometries = []
+        if self._vertices:
+            mesh = o3d.geometry.TriangleMesh()
+            mesh.vertices = o3d.utility.Vector3dVector(np.concatenate(self._vertices))
+            mesh.triangles = o3d.utility.Vector3iVector(np.concatenate(self._triangles))
+            mesh.vertex_colors = o3d.utility.Vector3dVector(np.concatenate(self._colors))
+            mesh.compute_vertex_normals()
+            geometries.append(mesh)
+        if self._points:
+            cloud = o3d.geometry.PointCloud()
+            cloud.points = o3d.utility.Vector3dVector(np.concatenate(self._points))
+            cloud.colors = o3d.utility.Vector3dVector(np.concatenate(self._point_colors))
+            geometries.append(cloud)
+        return geometries + self._extra
+
+    def show(self, window_name='Open3D'):
+        """Open a visualizer window with the scene and block until it is closed."""
+        import open3d as o3d
+
+        vis = o3d.visualization.Visualizer()
+        vis.create_window(window_name=window_name)
+        for geometry in self.build():
+            vis.add_geometry(geometry)
+        vis.run()
+        vis.destroy_window()